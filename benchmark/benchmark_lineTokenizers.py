@@ -0,0 +1,26 @@
+from timeit import timeit
+
+from src.model import FinancialActivityFileLineParser, CharacterScanningLineTokenizer, SplittingLineTokenizer
+
+
+def sampleLines(linesQuantity):
+    plainLine = '09-27-2024,AMAZON MKTP US*2K4LP0XY3 AMZN.COM/BILL WA,Name LastName,-12345,23.47'
+    boundedLine = '09-27-2024,"AMAZON MKTP US*2K4LP0XY3, AMZN.COM/BILL WA",Name LastName,-12345,23.47'
+    return [plainLine if index % 2 else boundedLine for index in range(linesQuantity)]
+
+
+def secondsToParse(tokenizerClass, lines, repetitions):
+    parser = FinancialActivityFileLineParser.commaSeparatedValues(boundingCharacter='"', tokenizerClass=tokenizerClass)
+    return timeit(lambda: [parser.parse(aLine) for aLine in lines], number=repetitions)
+
+
+def main(linesQuantity=100000, repetitions=3):
+    lines = sampleLines(linesQuantity)
+    for tokenizerClass in [CharacterScanningLineTokenizer, SplittingLineTokenizer]:
+        seconds = secondsToParse(tokenizerClass, lines, repetitions)
+        linesPerSecond = linesQuantity * repetitions / seconds
+        print('{0:<32} {1:>12,.0f} lines/s'.format(tokenizerClass.__name__, linesPerSecond))
+
+
+if __name__ == '__main__':
+    main()
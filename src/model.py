@@ -1,39 +1,67 @@
+import heapq
+import os
+import pickle
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from datetime import date
+from itertools import chain, islice
+from operator import methodcaller
 
 
 class Dollars():
+
+    __slots__ = ('_cents',)
+
     @classmethod
     def zero(cls):
-        return cls.withAmount(0)
+        return cls.withCents(0)
 
     @classmethod
     def withAmount(cls,amount):
-        return cls(amount)
+        return cls.withCents(round(amount * 100))
+
+    @classmethod
+    def withCents(cls, cents):
+        return cls(cents)
+
+    @classmethod
+    def sum(cls, dollarsCollection):
+        return cls.withCents(sum(someDollars._cents for someDollars in dollarsCollection))
+
+    @classmethod
+    def sumOfTotals(cls, activities):
+        return cls.withCents(sum(anActivity.totalInCents() for anActivity in activities))
     
-    def __init__(self,amount):
-        self._amount = amount
+    def __init__(self, cents):
+        self._cents = cents
     
     def __eq__(self, value):
-        return isinstance(value, type(self)) and self._amount == value._amount
+        return isinstance(value, type(self)) and self._cents == value._cents
     
     def __hash__(self):
-        return hash((self._amount, type(self)))
+        return hash((self._cents, type(self)))
     
     def __str__(self):
-        amountString = '{0:.2f}'.format(self._amount)
+        sign = '-' if self._cents < 0 else ''
+        units, cents = divmod(abs(self._cents), 100)
+        amountString = '{0}{1}.{2:02d}'.format(sign, units, cents)
         return amountString + ' ' + 'USD'
     
     def __add__(self, value):
-        return Dollars.withAmount(self._amount + value._amount)
+        return Dollars.withCents(self._cents + value._cents)
     
     def __sub__(self, value):
-        return Dollars.withAmount(self._amount - value._amount)
+        return Dollars.withCents(self._cents - value._cents)
 
     def currency(self):
         return 'USD'
 
     def amount(self):
-        return self._amount
+        return self._cents / 100
+
+    def cents(self):
+        return self._cents
 
 
 class FinancialActivityStatement():
@@ -43,15 +71,26 @@ class FinancialActivityStatement():
 
     def __init__(self, aSource):
         self._source = aSource 
+        self._memoizedResults = {}
+        self._memoizedSourceVersion = None
     
     def totalExpenses(self):
-        return self.sumActivitiesTotal(self.expenses())
+        return self._memoized('totalExpenses', lambda: self.sumActivitiesTotal(self.expenses()))
   
     def totalIncome(self):
-        return self.sumActivitiesTotal(self.incomes())
+        return self._memoized('totalIncome', lambda: self.sumActivitiesTotal(self.incomes()))
+
+    def totalStreamedExpenses(self):
+        return self.sumActivitiesTotal(self._source.iterExpenses())
+
+    def totalStreamedIncome(self):
+        return self.sumActivitiesTotal(self._source.iterIncomes())
     
     def activityAggregationBasedOnSpec(self, aggregationSpec):
         return aggregationSpec.aggregatedResultsFromActivities(self.allActivities())
+
+    def streamedActivityAggregationBasedOnSpec(self, aggregationSpec):
+        return aggregationSpec.streamedResultsFromActivities(self._source.iterActivities())
     
     def expenses(self):
         return self._source.expenses()
@@ -60,16 +99,24 @@ class FinancialActivityStatement():
         return self._source.incomes()
 
     def allActivities(self):
-        return self.expenses() + self.incomes()
+        return self._memoized('allActivities', lambda: tuple(chain(self.expenses(), self.incomes())))
+
+    def _memoized(self, resultName, computation):
+        sourceVersion = self._source.version()
+        if sourceVersion != self._memoizedSourceVersion:
+            self._memoizedResults = {}
+            self._memoizedSourceVersion = sourceVersion
+        if resultName not in self._memoizedResults: self._memoizedResults[resultName] = computation()
+        return self._memoizedResults[resultName]
     
     def sumActivitiesTotal(self, activities):
-        total = Dollars.zero()
-        for anActivity in activities:
-            total = total + anActivity.total()
-        return total
+        return Dollars.sumOfTotals(activities)
 
 
 class FinancialActivityFileSource():
+
+    ENRICHMENT_BATCH_SIZE = 1024
+
     @classmethod
     def fromFile(cls, name, file, amountColumnSpec, activityLineParser, activityEnrichmentSpec):
         cls.assertName(name)
@@ -82,60 +129,250 @@ class FinancialActivityFileSource():
     def __init__(self, name, file, amountColumnSpec, activityLineParser,activityEnrichmentSpec):
         self._name = name
         self._file = file
+        self._fileStart = self._startPositionOf(file)
+        self._openedFilePath = self._absolutePathOf(file) if self._fileStart is not None else None
         self._amountColumnSpec = amountColumnSpec
         self._activityLineParser = activityLineParser
         self._activityEnrichmentSpec = activityEnrichmentSpec
         self._loadedExpenses = []
         self._loadedIncomes = []
+        self._isLoaded = False
+        self._loadedFileSignature = None
+        self._version = 0
 
     def expenses(self):
-        if not self._loadedExpenses: self._loadActivityFromFile()
+        self._loadActivityIfNeeded()
         return self._loadedExpenses
     
     def incomes(self):
-        if not self._loadedIncomes: self._loadActivityFromFile()
+        self._loadActivityIfNeeded()
         return self._loadedIncomes
     
     def name(self):
         return self._name
 
+    def isLoaded(self):
+        return self._isLoaded
+
+    def version(self):
+        self._loadActivityIfNeeded()
+        return self._version
+
+    def _loadActivityIfNeeded(self):
+        if self._isLoaded and not self._fileChangedSinceLoad(): return
+        fileSignature = self._fileSignature()
+        self._loadActivityFromFile()
+        self._markLoadedWithFileSignature(fileSignature)
+
+    def _markLoadedWithFileSignature(self, fileSignature):
+        self._isLoaded = True
+        self._loadedFileSignature = fileSignature
+        self._version = self._version + 1
+
+    def activityRowsLoad(self):
+        # What another process needs to read this source's rows, or None when it can only be loaded here.
+        filePath = self._filePath()
+        if filePath is None: return None
+        aLoad = FileActivityRowsLoad.forFile(filePath, self._fileEncoding(), self._fileStart, self._fileSignature(), self._activityRowsReader())
+        try:
+            pickle.dumps(aLoad)
+        except (pickle.PicklingError, AttributeError, TypeError):
+            return None
+        return aLoad
+
+    def loadActivityRows(self, activityRows, fileSignature):
+        self._storeActivities(FinancialActivity.fromActivityRowsInCents(activityRows, self))
+        self._markLoadedWithFileSignature(fileSignature)
+
+    def _fileChangedSinceLoad(self):
+        # A file that went missing after loading, e.g. while it is rotated, keeps serving what was loaded.
+        try:
+            return self._fileSignature() != self._loadedFileSignature
+        except OSError:
+            return False
+
+    def _fileSignature(self):
+        filePath = self._filePath()
+        if filePath is None: return None
+        fileStatus = os.stat(filePath)
+        return (fileStatus.st_dev, fileStatus.st_ino, fileStatus.st_size, fileStatus.st_mtime_ns)
+
+    def _startPositionOf(self, file):
+        # Streams start where the caller left the file, e.g. after skipping a preamble.
+        if not getattr(file, 'seekable', lambda: False)(): return None
+        try:
+            return file.tell()
+        except OSError:
+            return None
+
+    def _absolutePathOf(self, file):
+        fileName = getattr(file, 'name', None)
+        return os.path.abspath(fileName) if isinstance(fileName, str) else None
+
+    def _filePath(self):
+        return self._openedFilePath
+
+    def _fileEncoding(self):
+        return getattr(self._file, 'encoding', None)
+
+    def iterActivities(self):
+        return self._activitiesFromLines(self._linesFromFileStart())
+
+    def _linesFromFileStart(self):
+        # Every stream gets its own reader from the file start: files opened by path are reopened, other seekable files repositioned.
+        filePath = self._filePath()
+        if filePath is not None: return self._linesFromPath(filePath, self._fileEncoding(), self._fileStart)
+        if self._fileStart is not None: self._file.seek(self._fileStart)
+        return iter(self._file)
+
+    def _linesFromPath(self, filePath, encoding, fileStart):
+        with open(filePath, encoding=encoding) as aFile:
+            if fileStart: aFile.seek(fileStart)
+            yield from aFile
+
+    def _activitiesFromLines(self, lines):
+        return self._activitiesFromRows(self._activityRowsReader().rowsFromLines(lines))
+
+    def _activitiesFromRecordsInBatches(self, recordPlan, lineRecords):
+        return self._activitiesFromRows(self._activityRowsReader().rowsFromRecords(recordPlan, lineRecords))
+
+    def _activitiesFromRows(self, activityRows):
+        for activityRow in activityRows: yield FinancialActivity.fromActivityRowInCents(activityRow, self)
+
+    def _activityRowsReader(self):
+        return FileActivityRowsReader.withSpecs(self._amountColumnSpec, self._activityLineParser, self._activityEnrichmentSpec, self.ENRICHMENT_BATCH_SIZE)
+
+    def iterExpenses(self):
+        return (activity for activity in self.iterActivities() if activity.isExpense())
+
+    def iterIncomes(self):
+        return (activity for activity in self.iterActivities() if not activity.isExpense())
+
     def _loadActivityFromFile(self):
+        self._storeActivities(self.iterActivities())
+
+    def _storeActivities(self, activities):
         expenses = []
         incomes = []
-        lines = self._file.readlines()
-        if lines:
-            header = self._activityLineParser.parse(lines[0])
-            for line in lines[1:]:
-                lineRecord = self._activityLineParser.parse(line)
-                activity = self._activityFromRecord(header, lineRecord)
-                if activity.isExpense():
-                    expenses.append(activity)
-                else:
-                    incomes.append(activity)
+        for activity in activities:
+            if activity.isExpense():
+                expenses.append(activity)
+            else:
+                incomes.append(activity)
         self._loadedExpenses = expenses
         self._loadedIncomes = incomes
-    
-    def _activityFromRecord(self, header, lineRecord):
-        rawDescription = self._amountColumnSpec.descriptionFromLine(header, lineRecord)
+
+
+class PathFinancialActivityFileSource(FinancialActivityFileSource):
+
+    @classmethod
+    def fromPath(cls, name, path, amountColumnSpec, activityLineParser, activityEnrichmentSpec, encoding = 'utf-8'):
+        cls.assertName(name)
+        return cls(name, path, amountColumnSpec, activityLineParser, activityEnrichmentSpec, encoding)
+
+    def __init__(self, name, path, amountColumnSpec, activityLineParser, activityEnrichmentSpec, encoding):
+        super().__init__(name, None, amountColumnSpec, activityLineParser, activityEnrichmentSpec)
+        self._path = path
+        self._encoding = encoding
+
+    def _filePath(self):
+        return self._path
+
+    def _fileEncoding(self):
+        return self._encoding
+
+
+class FileActivityRowsReader():
+
+    @classmethod
+    def withSpecs(cls, amountColumnSpec, activityLineParser, activityEnrichmentSpec, enrichmentBatchSize):
+        return cls(amountColumnSpec, activityLineParser, activityEnrichmentSpec, enrichmentBatchSize)
+
+    def __init__(self, amountColumnSpec, activityLineParser, activityEnrichmentSpec, enrichmentBatchSize):
+        self._amountColumnSpec = amountColumnSpec
+        self._activityLineParser = activityLineParser
+        self._activityEnrichmentSpec = activityEnrichmentSpec
+        self._enrichmentBatchSize = enrichmentBatchSize
+
+    def rowsFromLines(self, lines):
+        headerLine = next(lines, None)
+        if headerLine is None: return
+        header = self._activityLineParser.parse(headerLine)
+        recordPlan = self._amountColumnSpec.recordPlanForHeader(header)
+        lineRecords = (self._activityLineParser.parse(line) for line in lines)
+        yield from self.rowsFromRecords(recordPlan, lineRecords)
+
+    def rowsFromRecords(self, recordPlan, lineRecords):
+        # Batching delays parsing of lines nobody consumed yet, so it is only worth it for batch conditions.
+        if not self._activityEnrichmentSpec.evaluatesInBatches():
+            for lineRecord in lineRecords: yield self._rowFromRecord(recordPlan, lineRecord)
+            return
+        batch = []
+        for lineRecord in lineRecords:
+            batch.append(lineRecord)
+            if len(batch) == self._enrichmentBatchSize:
+                yield from self._rowsFromRecords(recordPlan, batch)
+                batch = []
+        yield from self._rowsFromRecords(recordPlan, batch)
+
+    def _rowFromRecord(self, recordPlan, lineRecord):
+        rawDescription = sys.intern(recordPlan.descriptionFromRecord(lineRecord))
         rawRecord = FileRawActivityRecord.withDescription(rawDescription)
-        activityDate = self._amountColumnSpec.dateFromLine(header, lineRecord)
         enrichmentDefinition = self._activityEnrichmentSpec.enrichmentDefinitionForActivity(rawRecord)
-        expenseAmount = self._amountColumnSpec.expenseAmountFromLine(header, lineRecord)
+        return self._rowFromRecordAndDefinition(recordPlan, lineRecord, rawDescription, enrichmentDefinition)
+
+    def _rowsFromRecords(self, recordPlan, lineRecords):
+        rawRecords = [FileRawActivityRecord.withDescription(sys.intern(recordPlan.descriptionFromRecord(lineRecord))) for lineRecord in lineRecords]
+        enrichmentDefinitions = self._activityEnrichmentSpec.enrichmentDefinitionsForActivities(rawRecords)
+        return [self._rowFromRecordAndDefinition(recordPlan, lineRecord, rawRecord.description(), enrichmentDefinition)
+                for lineRecord, rawRecord, enrichmentDefinition in zip(lineRecords, rawRecords, enrichmentDefinitions)]
+
+    def _rowFromRecordAndDefinition(self, recordPlan, lineRecord, rawDescription, enrichmentDefinition):
+        activityDate = recordPlan.dateFromRecord(lineRecord)
+        expenseAmount, incomeAmount = recordPlan.amountsInCentsFromRecord(lineRecord)
         if expenseAmount:
-            activity = self._newExpense(rawDescription, enrichmentDefinition, expenseAmount, activityDate)
-        incomeAmount = self._amountColumnSpec.incomeAmountFromLine(header, lineRecord)
+            activityRow = (FinancialActivity.EXPENSE_TYPE, enrichmentDefinition.descriptionOverride(), rawDescription, enrichmentDefinition.bucket(), expenseAmount, activityDate)
         if incomeAmount:
-            activity = self._newIncome(rawDescription, enrichmentDefinition, incomeAmount, activityDate)
-        return activity
+            activityRow = (FinancialActivity.INCOME_TYPE, enrichmentDefinition.descriptionOverride(), rawDescription, enrichmentDefinition.bucket(), incomeAmount, activityDate)
+        return activityRow
+
+
+class FileActivityRowsLoad():
+
+    @classmethod
+    def forFile(cls, filePath, encoding, fileStart, fileSignature, activityRowsReader):
+        return cls(filePath, encoding, fileStart, fileSignature, activityRowsReader)
+
+    def __init__(self, filePath, encoding, fileStart, fileSignature, activityRowsReader):
+        self._filePath = filePath
+        self._encoding = encoding
+        self._fileStart = fileStart
+        self._fileSignature = fileSignature
+        self._activityRowsReader = activityRowsReader
 
-    def _newIncome(self, rawDescription, enrichmentDefinition, incomeAmount, activityDate):
-        return FinancialActivity.incomeWithDescriptionAndTotal(enrichmentDefinition.descriptionOverride(), rawDescription, enrichmentDefinition.bucket(), Dollars.withAmount(incomeAmount), self, activityDate)
+    def fileSignature(self):
+        return self._fileSignature
 
-    def _newExpense(self, rawDescription, enrichmentDefinition, expenseAmount, activityDate):
-        return FinancialActivity.expenseWithDescriptionAndTotal(enrichmentDefinition.descriptionOverride(), rawDescription, enrichmentDefinition.bucket(), Dollars.withAmount(expenseAmount), self, activityDate)
+    def transferableActivityRows(self):
+        # Dates travel back from worker processes as ordinals, which pickle in about half the time.
+        with open(self._filePath, encoding=self._encoding) as aFile:
+            if self._fileStart: aFile.seek(self._fileStart)
+            return [activityRow[:5] + (activityRow[5].toordinal(),) for activityRow in self._activityRowsReader.rowsFromLines(aFile)]
+
+    @classmethod
+    def activityRowsFromTransferred(cls, transferredRows):
+        datesByOrdinal = {}
+        activityRows = []
+        for activityType, description, rawDescription, category, cents, dateOrdinal in transferredRows:
+            activityDate = datesByOrdinal.get(dateOrdinal)
+            if activityDate is None: activityDate = datesByOrdinal.setdefault(dateOrdinal, date.fromordinal(dateOrdinal))
+            activityRows.append((activityType, description, rawDescription, category, cents, activityDate))
+        return activityRows
 
 
 class FileRawActivityRecord():
+
+    __slots__ = ('_description',)
     
     @classmethod
     def withDescription(cls, description):
@@ -152,36 +389,191 @@ class FileRawActivityRecord():
 class CompositeFinancialActivitiesSource():
     @classmethod
     def withAllSources(cls, sources):
-        return cls(sources)
+        return cls(sources, False)
+
+    @classmethod
+    def withAllSourcesInDateOrder(cls, sources):
+        return cls(sources, True)
     
-    def __init__(self, sources):
+    @classmethod
+    def activitiesLoadedBy(cls, aSource):
+        return aSource.expenses(), aSource.incomes()
+
+    @classmethod
+    def activityRowsLoadOf(cls, aSource):
+        activityRowsLoad = getattr(aSource, 'activityRowsLoad', None)
+        return activityRowsLoad() if activityRowsLoad else None
+    
+    def __init__(self, sources, mergeInDateOrder = False):
         self._sources = sources
+        self._mergeInDateOrder = mergeInDateOrder
+        self._expensesView = CombinedActivitiesView.empty()
+        self._incomesView = CombinedActivitiesView.empty()
+
+    def preloadConcurrently(self, workers = None):
+        # Sources that can describe how to read their rows are parsed in worker processes, since parsing and
+        # enrichment hold the GIL; the rest load in threads, as do all sources when there is a single worker. Sources keep what they loaded, so later queries
+        # are served by them, follow their reloads and raise again for sources that still fail.
+        failuresBySource = {}
+        processLoads = []
+        threadSources = []
+        processWorkers = workers if workers else (os.cpu_count() or 1)
+        for aSource in self._sources:
+            try:
+                activityRowsLoad = self.activityRowsLoadOf(aSource) if processWorkers > 1 else None
+            except Exception as error:
+                failuresBySource[id(aSource)] = SourceLoadFailure.forSourceAndError(aSource, error)
+                continue
+            if activityRowsLoad is None:
+                threadSources.append(aSource)
+            else:
+                processLoads.append((aSource, activityRowsLoad))
+        with ThreadPoolExecutor(max_workers=workers) as threadExecutor:
+            threadFutures = [(aSource, threadExecutor.submit(self.activitiesLoadedBy, aSource)) for aSource in threadSources]
+            if processLoads: self._loadInWorkerProcesses(processLoads, processWorkers, failuresBySource)
+            for aSource, aFuture in threadFutures:
+                try:
+                    aFuture.result()
+                except Exception as error:
+                    failuresBySource[id(aSource)] = SourceLoadFailure.forSourceAndError(aSource, error)
+        return [failuresBySource[id(aSource)] for aSource in self._sources if id(aSource) in failuresBySource]
+
+    def _loadInWorkerProcesses(self, processLoads, workers, failuresBySource):
+        with ProcessPoolExecutor(max_workers=workers) as processExecutor:
+            processFutures = [(aSource, activityRowsLoad, processExecutor.submit(activityRowsLoad.transferableActivityRows)) for aSource, activityRowsLoad in processLoads]
+            for aSource, activityRowsLoad, aFuture in processFutures:
+                try:
+                    aSource.loadActivityRows(FileActivityRowsLoad.activityRowsFromTransferred(aFuture.result()), activityRowsLoad.fileSignature())
+                except Exception as error:
+                    failuresBySource[id(aSource)] = SourceLoadFailure.forSourceAndError(aSource, error)
+
+    def version(self):
+        return tuple(aSource.version() for aSource in self._sources)
+
+    def iterActivities(self):
+        for aSource in self._sources: yield from aSource.iterActivities()
+
+    def iterExpenses(self):
+        for aSource in self._sources: yield from aSource.iterExpenses()
+
+    def iterIncomes(self):
+        for aSource in self._sources: yield from aSource.iterIncomes()
+
+    def iterExpensesInDateOrder(self):
+        return CombinedActivitiesView.mergedInDateOrder(self._expensesBySource())
+
+    def iterIncomesInDateOrder(self):
+        return CombinedActivitiesView.mergedInDateOrder(self._incomesBySource())
 
     def expenses(self):
-        allExpenses = []
-        for aSource in self._sources: allExpenses = allExpenses + aSource.expenses()
-        return allExpenses
+        expensesBySource = self._expensesBySource()
+        if not self._expensesView.combines(expensesBySource):
+            self._expensesView = CombinedActivitiesView.combining(expensesBySource, self._mergeInDateOrder)
+        return self._expensesView.activities()
     
     def incomes(self):
-        allIncomes = []
-        for aSource in self._sources: allIncomes = allIncomes + aSource.incomes()
-        return allIncomes
+        incomesBySource = self._incomesBySource()
+        if not self._incomesView.combines(incomesBySource):
+            self._incomesView = CombinedActivitiesView.combining(incomesBySource, self._mergeInDateOrder)
+        return self._incomesView.activities()
+
+    def _expensesBySource(self):
+        return [aSource.expenses() for aSource in self._sources]
+
+    def _incomesBySource(self):
+        return [aSource.incomes() for aSource in self._sources]
+
+
+class CombinedActivitiesView():
+
+    @classmethod
+    def empty(cls):
+        return cls(None, [])
+
+    @classmethod
+    def combining(cls, activitiesBySource, mergeInDateOrder):
+        combinedActivities = cls.mergedInDateOrder(activitiesBySource) if mergeInDateOrder else chain.from_iterable(activitiesBySource)
+        return cls(cls.keyFor(activitiesBySource), list(combinedActivities))
+
+    @classmethod
+    def mergedInDateOrder(cls, activitiesBySource):
+        # Exports are expected in date order and are merged as they are; a source only gets
+        # sorted when a linear check finds it out of order.
+        activityDate = methodcaller('date')
+        return heapq.merge(*[cls.inDateOrder(activities) for activities in activitiesBySource], key=activityDate)
+
+    @classmethod
+    def inDateOrder(cls, activities):
+        if all(anActivity.date() <= nextActivity.date() for anActivity, nextActivity in zip(activities, islice(activities, 1, None))): return activities
+        return sorted(activities, key=methodcaller('date'))
+
+    @classmethod
+    def keyFor(cls, activitiesBySource):
+        return [(activities, len(activities)) for activities in activitiesBySource]
+
+    def __init__(self, key, activities):
+        self._key = key
+        self._activities = activities
+
+    def combines(self, activitiesBySource):
+        if self._key is None or len(self._key) != len(activitiesBySource): return False
+        return all(combinedActivities is activities and combinedSize == len(activities)
+                   for (combinedActivities, combinedSize), activities in zip(self._key, activitiesBySource))
+
+    def activities(self):
+        return self._activities
+
+
+class SourceLoadFailure():
+
+    @classmethod
+    def forSourceAndError(cls, aSource, error):
+        return cls(aSource, error)
+
+    def __init__(self, aSource, error):
+        self._source = aSource
+        self._error = error
+
+    def source(self):
+        return self._source
+
+    def sourceName(self):
+        return self._source.name()
+
+    def error(self):
+        return self._error
 
 
 class FinancialActivity():
+
+    __slots__ = ('_description', '_rawDescription', '_category', '_total', '_type', '_source', '_date')
+
+    EXPENSE_TYPE = 'Expense'
+    INCOME_TYPE = 'Income'
        
     @classmethod
     def expenseWithDescriptionAndTotal(cls, aDescription, aRawDescription, aCategory, total, source, aDate):
-        return cls.withDescriptionAndTotal(aDescription, aRawDescription, aCategory,'Expense', total, source, aDate)
+        return cls.withDescriptionAndTotal(aDescription, aRawDescription, aCategory, cls.EXPENSE_TYPE, total, source, aDate)
    
     @classmethod
     def incomeWithDescriptionAndTotal(cls, aDescription, aRawDescription, aCategory, total, source, aDate):
-        return cls.withDescriptionAndTotal(aDescription, aRawDescription, aCategory, 'Income', total, source, aDate)
+        return cls.withDescriptionAndTotal(aDescription, aRawDescription, aCategory, cls.INCOME_TYPE, total, source, aDate)
     
     @classmethod
     def withDescriptionAndTotal(cls,description, rawDescription, aCategory , type, total, source, aDate):
         return cls(description, rawDescription, aCategory, type, total, source, aDate)
 
+    @classmethod
+    def fromActivityRowInCents(cls, activityRow, source):
+        activityType, description, rawDescription, category, cents, activityDate = activityRow
+        return cls(description, sys.intern(rawDescription), category, activityType, Dollars.withCents(cents), source, activityDate)
+
+    @classmethod
+    def fromActivityRowsInCents(cls, activityRows, source):
+        intern = sys.intern
+        return [cls(description, intern(rawDescription), category, activityType, Dollars.withCents(cents), source, activityDate)
+                for activityType, description, rawDescription, category, cents, activityDate in activityRows]
+
     def __init__(self, description, rawDescription, aCategory, type, total, source, aDate):
         self._description = description
         self._rawDescription = rawDescription 
@@ -193,6 +585,9 @@ class FinancialActivity():
     
     def total(self):
         return self._total
+
+    def totalInCents(self):
+        return self._total.cents()
     
     def description(self):
         return self._description
@@ -201,7 +596,7 @@ class FinancialActivity():
         return self._category
     
     def isExpense(self):
-        return self._type == 'Expense'
+        return self._type == self.EXPENSE_TYPE
 
     def sourceName(self):
         return self._source.name()
@@ -223,21 +618,50 @@ class FileRecordSpec():
         self._amountSpec = amountSpec
         self._dateSpec = dateSpec
     
-    def descriptionFromLine(self, header, lineRecord):
-        descriptionIndex = header.index(self._descriptionColumn)
-        return lineRecord[descriptionIndex]
-    
-    def dateFromLine(self, header, lineRecord):
-        return self._dateSpec.dateFromLine(header, lineRecord)
+    def fingerprint(self):
+        return (type(self).__name__, self._descriptionColumn, self._dateSpec.fingerprint(), self._amountSpec.fingerprint())
+
+    def recordPlanForHeader(self, header):
+        descriptionIndex = FileRecordPlan.columnIndexInHeader(self._descriptionColumn, header)
+        datePlan = self._dateSpec.recordPlanForHeader(header)
+        amountPlan = self._amountSpec.recordPlanForHeader(header)
+        return FileRecordPlan.withDescriptionIndexAndPlans(descriptionIndex, datePlan, amountPlan)
+
+
+class FileRecordPlan():
+
+    @classmethod
+    def withDescriptionIndexAndPlans(cls, descriptionIndex, datePlan, amountPlan):
+        return cls(descriptionIndex, datePlan, amountPlan)
+
+    @classmethod
+    def columnIndexInHeader(cls, columnName, header):
+        if columnName not in header: raise Exception('Column ' + str(columnName) + ' not found in file header')
+        return header.index(columnName)
+
+    def __init__(self, descriptionIndex, datePlan, amountPlan):
+        self._descriptionIndex = descriptionIndex
+        self._datePlan = datePlan
+        self._amountPlan = amountPlan
+
+    def columnIndexes(self):
+        return [self._descriptionIndex] + self._datePlan.columnIndexes() + self._amountPlan.columnIndexes()
+
+    def descriptionFromRecord(self, lineRecord):
+        return lineRecord[self._descriptionIndex]
+
+    def dateFromRecord(self, lineRecord):
+        return self._datePlan.dateFromRecord(lineRecord)
 
-    def expenseAmountFromLine(self, header, lineRecord):
-        return self._amountSpec.expenseAmountFromLine(header, lineRecord)
+    def amountsInCentsFromRecord(self, lineRecord):
+        return self._amountPlan.amountsInCentsFromRecord(lineRecord)
 
-    def incomeAmountFromLine(self, header, lineRecord):
-        return self._amountSpec.incomeAmountFromLine(header, lineRecord)
 
 class DateFileRecordSpec():
 
+    DATE_PART_WIDTHS = {'Year': 4, 'Month': 2, 'Day': 2}
+    DATE_CACHE_SIZE = 4096
+
     @classmethod
     def withSeparatorAndSequence(cls, column, separator, sequence):
         return cls( column, separator, sequence)
@@ -246,76 +670,232 @@ class DateFileRecordSpec():
         self._column = column
         self._separator = separator
         self._sequence = sequence
+        self._yearPosition = sequence.index('Year')
+        self._monthPosition = sequence.index('Month')
+        self._dayPosition = sequence.index('Day')
+        self._isIsoLayout = separator == '-' and sequence == ['Year', 'Month', 'Day']
+        self._initializeFixedWidthSlices()
+        self._dateCache = {}
+
+    def _initializeFixedWidthSlices(self):
+        partSlices = {}
+        partStart = 0
+        for aPart in self._sequence:
+            partEnd = partStart + self.DATE_PART_WIDTHS[aPart]
+            partSlices[aPart] = slice(partStart, partEnd)
+            partStart = partEnd + len(self._separator)
+        self._fixedWidth = partEnd
+        self._yearSlice = partSlices['Year']
+        self._monthSlice = partSlices['Month']
+        self._daySlice = partSlices['Day']
     
-    def dateFromLine(self, header, lineRecord):
-        rawDate = self._dateStringFromLine(header, lineRecord)
+    def fingerprint(self):
+        return (type(self).__name__, self._column, self._separator, tuple(self._sequence))
+
+    def recordPlanForHeader(self, header):
+        dateIndex = FileRecordPlan.columnIndexInHeader(self._column, header)
+        return DateFileRecordPlan.forSpecAndIndex(self, dateIndex)
+
+    def dateFromString(self, rawDate):
+        cachedDate = self._dateCache.get(rawDate)
+        if cachedDate is None:
+            cachedDate = self._parsedDate(rawDate)
+            if len(self._dateCache) >= self.DATE_CACHE_SIZE: self._dateCache.clear()
+            self._dateCache[rawDate] = cachedDate
+        return cachedDate
+
+    def _parsedDate(self, rawDate):
+        if len(rawDate) == self._fixedWidth:
+            if self._isIsoLayout: return date.fromisoformat(rawDate)
+            return date(int(rawDate[self._yearSlice]), int(rawDate[self._monthSlice]), int(rawDate[self._daySlice]))
         #NOT YET AVAILABLE - date.strptime(rawDate, '%m-%d-%y')
         dateParts = rawDate.split(self._separator)
-        year = dateParts[self._sequence.index('Year')]
-        month = dateParts[self._sequence.index('Month')]
-        day = dateParts[self._sequence.index('Day')]
-        return date(int(year), int(month), int(day))
+        return date(int(dateParts[self._yearPosition]), int(dateParts[self._monthPosition]), int(dateParts[self._dayPosition]))
+
+
+class DateFileRecordPlan():
+
+    @classmethod
+    def forSpecAndIndex(cls, dateSpec, dateIndex):
+        return cls(dateSpec, dateIndex)
+
+    def __init__(self, dateSpec, dateIndex):
+        self._dateSpec = dateSpec
+        self._dateIndex = dateIndex
+
+    def columnIndexes(self):
+        return [self._dateIndex]
+
+    def dateFromRecord(self, lineRecord):
+        return self._dateSpec.dateFromString(lineRecord[self._dateIndex])
+
+
+class DecimalAmountParser():
+
+    CURRENCY_MARKS = ('US$', 'A$', 'C$', 'R$', 'USD', 'EUR', 'GBP', 'CAD', 'AUD', 'ARS', 'BRL', 'MXN', 'CLP', 'UYU', 'CHF', 'JPY', '$', '€', '£', '¥')
+
+    @classmethod
+    def default(cls):
+        return cls.withSeparators(decimalSeparator = '.', thousandsSeparator = ',')
+
+    @classmethod
+    def withSeparators(cls, decimalSeparator, thousandsSeparator):
+        cls.assertSeparators(decimalSeparator, thousandsSeparator)
+        return cls(decimalSeparator, thousandsSeparator)
+
+    @classmethod
+    def assertSeparators(cls, decimalSeparator, thousandsSeparator):
+        if decimalSeparator == thousandsSeparator: raise Exception('Decimal and thousands separators must be different')
+
+    def __init__(self, decimalSeparator, thousandsSeparator):
+        self._decimalSeparator = decimalSeparator
+        self._thousandsSeparator = thousandsSeparator
+        currencyMark = '(?:' + '|'.join(re.escape(aMark) for aMark in self.CURRENCY_MARKS) + ')'
+        number = '[0-9' + re.escape(thousandsSeparator) + ']*(?:' + re.escape(decimalSeparator) + '[0-9]*)?'
+        self._amountFormat = re.compile(r'\s*(?P<sign>[-+])?\s*(?:' + currencyMark + r'\s*)?(?P<signAfterCurrency>-)?\s*(?P<number>' + number + ')'
+                                        + r'\s*(?P<trailingSign>-)?\s*(?:' + currencyMark + r')?\s*')
+
+    def fingerprint(self):
+        return (type(self).__name__, self._decimalSeparator, self._thousandsSeparator)
+
+    def centsFromString(self, rawAmount):
+        # Only whitespace, one sign or enclosing parentheses and a known currency mark may surround the number.
+        if not rawAmount: return 0
+        amount = rawAmount.strip()
+        isNegative = amount.startswith('(') and amount.endswith(')')
+        aMatch = self._amountFormat.fullmatch(amount[1:-1] if isNegative else amount)
+        if not aMatch: raise Exception('Invalid amount: ' + rawAmount)
+        signs = [aSign for aSign in aMatch.group('sign', 'signAfterCurrency', 'trailingSign') if aSign]
+        if len(signs) > 1 or (signs and isNegative): raise Exception('Invalid amount: ' + rawAmount)
+        if signs == ['-']: isNegative = True
+        units, _, fraction = aMatch.group('number').replace(self._thousandsSeparator, '').partition(self._decimalSeparator)
+        if not (units + fraction).isdigit(): raise Exception('Invalid amount: ' + rawAmount)
+        cents = int(units or '0') * 100 + int(fraction[:2].ljust(2, '0'))
+        if fraction[2:3] >= '5': cents = cents + 1
+        return -cents if isNegative else cents
 
-    def _dateStringFromLine(self, header, lineRecord):
-        dateIndex = header.index(self._column)
-        return lineRecord[dateIndex]
 
 class SingleAmountColumnFileRecordSpec():
     
     @classmethod
-    def forSpecificColumn(cls, amountColumn):
-        return cls(amountColumn)
+    def forSpecificColumn(cls, amountColumn, amountParser = None):
+        return cls(amountColumn, amountParser if amountParser else DecimalAmountParser.default())
     
-    def __init__(self, amountColumn):
+    def __init__(self, amountColumn, amountParser):
         self._amountColumn = amountColumn
+        self._amountParser = amountParser
     
-    def expenseAmountFromLine(self, header, lineRecord):
-        amount = self._amountAtColumn(header, lineRecord, self._amountColumn)
-        return amount if amount > 0 else 0
-    
-    def incomeAmountFromLine(self, header, lineRecord):
-        amount = self._amountAtColumn(header, lineRecord, self._amountColumn)
-        return abs(amount) if amount < 0 else 0
-    
-    def _amountAtColumn(self, header, lineRecord, columnName):
-        amountIndex = header.index(columnName)
-        amount = lineRecord[amountIndex]
-        return float(amount) if amount else 0
+    def fingerprint(self):
+        return (type(self).__name__, self._amountColumn, self._amountParser.fingerprint())
+
+    def recordPlanForHeader(self, header):
+        amountIndex = FileRecordPlan.columnIndexInHeader(self._amountColumn, header)
+        return SingleAmountColumnFileRecordPlan.forIndexAndParser(amountIndex, self._amountParser)
+
+
+class SingleAmountColumnFileRecordPlan():
+
+    @classmethod
+    def forIndexAndParser(cls, amountIndex, amountParser):
+        return cls(amountIndex, amountParser)
+
+    def __init__(self, amountIndex, amountParser):
+        self._amountIndex = amountIndex
+        self._amountParser = amountParser
+
+    def columnIndexes(self):
+        return [self._amountIndex]
+
+    def amountsInCentsFromRecord(self, lineRecord):
+        amount = self._amountParser.centsFromString(lineRecord[self._amountIndex])
+        return (amount, 0) if amount > 0 else (0, -amount)
 
 
 class TwoAmountColumnsFileRecordSpec():
 
     @classmethod
-    def forColumns(cls, expenseColumn, incomeColumn):
-        return cls(expenseColumn, incomeColumn)
+    def forColumns(cls, expenseColumn, incomeColumn, amountParser = None):
+        return cls(expenseColumn, incomeColumn, amountParser if amountParser else DecimalAmountParser.default())
 
-    def __init__(self, expenseColumn, incomeColumn):
+    def __init__(self, expenseColumn, incomeColumn, amountParser):
         self._expenseColumn = expenseColumn
         self._incomeColumn = incomeColumn
+        self._amountParser = amountParser
     
-    def expenseAmountFromLine(self, header, lineRecord):
-        return self._amountAtColumn(header, lineRecord, self._expenseColumn)
+    def fingerprint(self):
+        return (type(self).__name__, self._expenseColumn, self._incomeColumn, self._amountParser.fingerprint())
 
-    def incomeAmountFromLine(self, header, lineRecord):
-        return self._amountAtColumn(header, lineRecord, self._incomeColumn)
-    
-    def _amountAtColumn(self, header, lineRecord, columnName):
-        amountIndex = header.index(columnName)
-        amount = lineRecord[amountIndex]
-        return float(amount) if amount else 0
+    def recordPlanForHeader(self, header):
+        expenseIndex = FileRecordPlan.columnIndexInHeader(self._expenseColumn, header)
+        incomeIndex = FileRecordPlan.columnIndexInHeader(self._incomeColumn, header)
+        return TwoAmountColumnsFileRecordPlan.forIndexesAndParser(expenseIndex, incomeIndex, self._amountParser)
+
+
+class TwoAmountColumnsFileRecordPlan():
+
+    @classmethod
+    def forIndexesAndParser(cls, expenseIndex, incomeIndex, amountParser):
+        return cls(expenseIndex, incomeIndex, amountParser)
+
+    def __init__(self, expenseIndex, incomeIndex, amountParser):
+        self._expenseIndex = expenseIndex
+        self._incomeIndex = incomeIndex
+        self._amountParser = amountParser
+
+    def columnIndexes(self):
+        return [self._expenseIndex, self._incomeIndex]
+
+    def amountsInCentsFromRecord(self, lineRecord):
+        expenseAmount = self._amountParser.centsFromString(lineRecord[self._expenseIndex])
+        incomeAmount = self._amountParser.centsFromString(lineRecord[self._incomeIndex])
+        return expenseAmount, incomeAmount
 
 
 class FinancialActivityFileLineParser():
 
     @classmethod
-    def commaSeparatedValues(cls,boundingCharacter = None):
-        return cls(',', boundingCharacter)
+    def commaSeparatedValues(cls, boundingCharacter = None, tokenizerClass = None):
+        return cls.withSeparator(',', boundingCharacter, tokenizerClass)
+
+    @classmethod
+    def withSeparator(cls, separator, boundingCharacter = None, tokenizerClass = None):
+        lineTokenizerClass = tokenizerClass if tokenizerClass else SplittingLineTokenizer
+        lineTokenizer = lineTokenizerClass.withSeparatorAndBoundingCharacter(separator, boundingCharacter)
+        return cls(lineTokenizer)
     
+    def __init__(self, lineTokenizer):
+        self._lineTokenizer = lineTokenizer
+
+    def parse(self, line):
+        return self._lineTokenizer.tokenize(line)
+
+    def separator(self):
+        return self._lineTokenizer.separator()
+
+    def boundingCharacter(self):
+        return self._lineTokenizer.boundingCharacter()
+
+    def fingerprint(self):
+        return (type(self).__name__, self.separator(), self.boundingCharacter())
+
+
+class CharacterScanningLineTokenizer():
+
+    @classmethod
+    def withSeparatorAndBoundingCharacter(cls, separator, boundingCharacter):
+        return cls(separator, boundingCharacter)
+
     def __init__(self, separator, boundingCharacter):
         self._separator = separator
         self._boundingCharacter = boundingCharacter
 
-    def parse(self, line):
+    def separator(self):
+        return self._separator
+
+    def boundingCharacter(self):
+        return self._boundingCharacter
+
+    def tokenize(self, line):
         parsedValues = []
         currentValue = ''
         ignoreSeparator = False
@@ -328,6 +908,45 @@ class FinancialActivityFileLineParser():
             else: currentValue = currentValue + character
         parsedValues.append(currentValue)
         return [ parsedValue.strip() for parsedValue in parsedValues ]
+
+
+class SplittingLineTokenizer():
+
+    @classmethod
+    def withSeparatorAndBoundingCharacter(cls, separator, boundingCharacter):
+        return cls(separator, boundingCharacter)
+
+    def __init__(self, separator, boundingCharacter):
+        self._separator = separator
+        self._boundingCharacter = boundingCharacter
+
+    def separator(self):
+        return self._separator
+
+    def boundingCharacter(self):
+        return self._boundingCharacter
+
+    def tokenize(self, line):
+        if not self._boundingCharacter or self._boundingCharacter not in line:
+            return [ parsedValue.strip() for parsedValue in line.split(self._separator) ]
+        return self._tokenizeBoundedLine(line)
+
+    def _tokenizeBoundedLine(self, line):
+        # Splitting on the bounding character alternates unbounded and bounded sections,
+        # so only the even sections can contain separators that end a value.
+        parsedValues = []
+        currentValueParts = []
+        for sectionIndex, section in enumerate(line.split(self._boundingCharacter)):
+            if sectionIndex % 2:
+                currentValueParts.append(section)
+                continue
+            sectionValues = section.split(self._separator)
+            currentValueParts.append(sectionValues[0])
+            for sectionValue in sectionValues[1:]:
+                parsedValues.append(''.join(currentValueParts))
+                currentValueParts = [sectionValue]
+        parsedValues.append(''.join(currentValueParts))
+        return [ parsedValue.strip() for parsedValue in parsedValues ]
     
 
 class FinancialActivityStatementExporter():
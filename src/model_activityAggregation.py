@@ -1,6 +1,11 @@
-from src.model import Dollars, FinancialActivity
+from datetime import date
+from itertools import islice
+
+from src.model import Dollars
 
 class ActivityBucketedAggregation:
+
+    BUCKETING_BATCH_SIZE = 1024
     
     @classmethod
     def fromActivityCategories(cls):
@@ -40,13 +45,25 @@ class ActivityBucketedAggregation:
         self._spec = spec
 
     def aggregatedResultsFromActivities(self, activities):
-        aggregatedActivities = self.aggregatedActivitiesBasedOnSpec(activities)
-        return self.totalsFromAggregatedActivities(aggregatedActivities)
+        return self.streamedResultsFromActivities(activities)
+
+    def streamedResultsFromActivities(self, activities):
+        # Activities are bucketed a batch at a time and only running totals are kept per bucket.
+        accumulators = { bucket:ActivityBucketAccumulator.empty() for bucket in self.specBuckets() }
+        activitiesIterator = iter(activities)
+        batch = list(islice(activitiesIterator, self.BUCKETING_BATCH_SIZE))
+        while batch:
+            for anActivity, bucketDefinition in zip(batch, self.bucketDefinitionsForActivities(batch)):
+                accumulator = accumulators.get(bucketDefinition.bucket())
+                if accumulator is None: accumulator = accumulators.setdefault(bucketDefinition.bucket(), ActivityBucketAccumulator.empty())
+                accumulator.addTotalInCents(anActivity.totalInCents())
+            batch = list(islice(activitiesIterator, self.BUCKETING_BATCH_SIZE))
+        return { bucket:accumulator.bucket() for bucket, accumulator in accumulators.items() }
 
     def aggregatedActivitiesBasedOnSpec(self, activities):
         aggregation = { bucket:[] for bucket in self.specBuckets() }
-        for anActivity in activities:
-            bucketDefinition = self.bucketDefinitionForActivity(anActivity)
+        activities = list(activities)
+        for anActivity, bucketDefinition in zip(activities, self.bucketDefinitionsForActivities(activities)):
             targetBucket = bucketDefinition.bucket()
             if targetBucket in aggregation:
                 aggregation[targetBucket].append(anActivity)
@@ -59,27 +76,160 @@ class ActivityBucketedAggregation:
     def bucketDefinitionForActivity(self, anActivity):
         return self._spec.bucketDefinitionForActivity(anActivity)
 
+    def bucketDefinitionsForActivities(self, activities):
+        return self._spec.bucketDefinitionsForActivities(activities)
+
     def totalsFromAggregatedActivities(self, aggregatedActivities):
         totalsAggregation = {}
         for category, activities in aggregatedActivities.items():
-            totalForCategory = Dollars.zero()
-            for anActivity in activities: totalForCategory = totalForCategory + anActivity.total()
-            totalsAggregation[category] = ActivityBucket.withTotal(totalForCategory)
+            accumulator = ActivityBucketAccumulator.empty()
+            for anActivity in activities: accumulator.addTotalInCents(anActivity.totalInCents())
+            totalsAggregation[category] = accumulator.bucket()
         return totalsAggregation
 
 
+class ActivityPeriodicBucketedAggregation:
+
+    @classmethod
+    def withPeriodAndBucketedAggregation(cls, timePeriod, bucketedAggregation):
+        return cls(timePeriod, bucketedAggregation)
+
+    def __init__(self, timePeriod, bucketedAggregation):
+        self._timePeriod = timePeriod
+        self._bucketedAggregation = bucketedAggregation
+
+    def aggregatedResultsFromActivities(self, activities):
+        return self.streamedResultsFromActivities(activities)
+
+    def streamedResultsFromActivities(self, activities):
+        # One scan fills every (period, bucket) accumulator; periods come back in chronological order.
+        specBuckets = self._bucketedAggregation.specBuckets()
+        accumulatorsByPeriod = {}
+        batchSize = self._bucketedAggregation.BUCKETING_BATCH_SIZE
+        activitiesIterator = iter(activities)
+        batch = list(islice(activitiesIterator, batchSize))
+        while batch:
+            for anActivity, bucketDefinition in zip(batch, self._bucketedAggregation.bucketDefinitionsForActivities(batch)):
+                periodStart = self._timePeriod.periodStartForOrdinal(anActivity.date().toordinal())
+                accumulators = accumulatorsByPeriod.get(periodStart)
+                if accumulators is None: accumulators = accumulatorsByPeriod.setdefault(periodStart, { bucket:ActivityBucketAccumulator.empty() for bucket in specBuckets })
+                accumulator = accumulators.get(bucketDefinition.bucket())
+                if accumulator is None: accumulator = accumulators.setdefault(bucketDefinition.bucket(), ActivityBucketAccumulator.empty())
+                accumulator.addTotalInCents(anActivity.totalInCents())
+            batch = list(islice(activitiesIterator, batchSize))
+        return { periodStart:{ bucket:accumulator.bucket() for bucket, accumulator in accumulatorsByPeriod[periodStart].items() }
+                 for periodStart in sorted(accumulatorsByPeriod) }
+
+
+class ActivityTimePeriod:
+
+    @classmethod
+    def daily(cls):
+        return DailyTimePeriod()
+
+    @classmethod
+    def weekly(cls):
+        return WeeklyTimePeriod()
+
+    @classmethod
+    def monthly(cls):
+        return MonthlyTimePeriod()
+
+    @classmethod
+    def yearly(cls):
+        return YearlyTimePeriod()
+
+    def __init__(self):
+        self._periodStartsByOrdinal = {}
+
+    def periodStartForDate(self, aDate):
+        return self.periodStartForOrdinal(aDate.toordinal())
+
+    def periodStartForOrdinal(self, dateOrdinal):
+        periodStart = self._periodStartsByOrdinal.get(dateOrdinal)
+        if periodStart is None: periodStart = self._periodStartsByOrdinal.setdefault(dateOrdinal, self._periodStartFromOrdinal(dateOrdinal))
+        return periodStart
+
+
+class DailyTimePeriod(ActivityTimePeriod):
+
+    def _periodStartFromOrdinal(self, dateOrdinal):
+        return date.fromordinal(dateOrdinal)
+
+
+class WeeklyTimePeriod(ActivityTimePeriod):
+
+    def _periodStartFromOrdinal(self, dateOrdinal):
+        # Ordinal 1 is a Monday, so weeks start on Mondays as in ISO weeks.
+        return date.fromordinal(dateOrdinal - (dateOrdinal - 1) % 7)
+
+
+class MonthlyTimePeriod(ActivityTimePeriod):
+
+    def _periodStartFromOrdinal(self, dateOrdinal):
+        return date.fromordinal(dateOrdinal).replace(day=1)
+
+
+class YearlyTimePeriod(ActivityTimePeriod):
+
+    def _periodStartFromOrdinal(self, dateOrdinal):
+        return date.fromordinal(dateOrdinal).replace(month=1, day=1)
+
+
 class ActivityBucket():
 
     @classmethod
     def withTotal(cls,total):
-        return cls(total)
+        return cls(total, None, None, None)
+
+    @classmethod
+    def withTotalCountMinimumAndMaximum(cls, total, count, minimum, maximum):
+        return cls(total, count, minimum, maximum)
     
-    def __init__(self, total):
+    def __init__(self, total, count, minimum, maximum):
         self._total = total
+        self._count = count
+        self._minimum = minimum
+        self._maximum = maximum
 
     def total(self):
         return self._total
 
+    def count(self):
+        return self._count
+
+    def minimum(self):
+        return self._minimum
+
+    def maximum(self):
+        return self._maximum
+
+
+class ActivityBucketAccumulator():
+
+    __slots__ = ('_totalInCents', '_count', '_minimumInCents', '_maximumInCents')
+
+    @classmethod
+    def empty(cls):
+        return cls()
+
+    def __init__(self):
+        self._totalInCents = 0
+        self._count = 0
+        self._minimumInCents = None
+        self._maximumInCents = None
+
+    def addTotalInCents(self, cents):
+        self._totalInCents = self._totalInCents + cents
+        self._count = self._count + 1
+        if self._minimumInCents is None or cents < self._minimumInCents: self._minimumInCents = cents
+        if self._maximumInCents is None or cents > self._maximumInCents: self._maximumInCents = cents
+
+    def bucket(self):
+        minimum = Dollars.withCents(self._minimumInCents) if self._count else None
+        maximum = Dollars.withCents(self._maximumInCents) if self._count else None
+        return ActivityBucket.withTotalCountMinimumAndMaximum(Dollars.withCents(self._totalInCents), self._count, minimum, maximum)
+
 class ActivityBucketDefinition:
     
     @classmethod
@@ -97,7 +247,7 @@ class ActivityBucketDefinition:
 
     def __init__(self, bucketName, activityCategories):
         self._bucketName = bucketName
-        self._activityCategories = activityCategories
+        self._activityCategories = frozenset(activityCategories)
 
     def bucket(self):
         return self._bucketName
@@ -105,6 +255,12 @@ class ActivityBucketDefinition:
     def matches(self, anActivity):
         return anActivity.category() in self._activityCategories
 
+    def matchesEach(self, activities):
+        return [anActivity.category() in self._activityCategories for anActivity in activities]
+
+    def activityCategories(self):
+        return self._activityCategories
+
 
 class ActivityBucketingSpec:
     
@@ -123,12 +279,51 @@ class ActivityBucketingSpec:
     def __init__(self, aBucketDefinition, useActivityCategoryAsDefault):
         self._bucketDefinitions = aBucketDefinition
         self._useActivityCategoryAsDefault = useActivityCategoryAsDefault
+        self._defaultBucketDefinitions = {}
+        self._indexedDefinitionsCount = None
 
     def allBuckets(self):
         return [aDefinition.bucket() for aDefinition in self._bucketDefinitions ]
 
     def bucketDefinitionForActivity(self, anActivity):
-        for aDefinition in self._bucketDefinitions:
-            if aDefinition.matches(anActivity): return aDefinition
+        if self._indexedDefinitionsCount != len(self._bucketDefinitions): self._indexDefinitions()
+        firstMatchingPosition = self._positionsByCategory.get(anActivity.category(), self._indexedDefinitionsCount)
+        for position in self._conditionDefinitionPositions:
+            if position >= firstMatchingPosition: break
+            if self._bucketDefinitions[position].matches(anActivity): return self._bucketDefinitions[position]
+        if firstMatchingPosition < self._indexedDefinitionsCount: return self._bucketDefinitions[firstMatchingPosition]
+        return self.defaultBucketDefinitionForActivity(anActivity)
+
+    def bucketDefinitionsForActivities(self, activities):
+        if self._indexedDefinitionsCount != len(self._bucketDefinitions): self._indexDefinitions()
+        firstMatchingPositions = [self._positionsByCategory.get(anActivity.category(), self._indexedDefinitionsCount) for anActivity in activities]
+        # Each condition based definition is asked once for all the activities no earlier definition matched.
+        for definitionPosition in self._conditionDefinitionPositions:
+            pendingPositions = [position for position, firstMatchingPosition in enumerate(firstMatchingPositions) if firstMatchingPosition > definitionPosition]
+            if not pendingPositions: break
+            mask = self._bucketDefinitions[definitionPosition].matchesEach([activities[position] for position in pendingPositions])
+            for position, matched in zip(pendingPositions, mask):
+                if matched: firstMatchingPositions[position] = definitionPosition
+        return [self._bucketDefinitions[firstMatchingPosition] if firstMatchingPosition < self._indexedDefinitionsCount else self.defaultBucketDefinitionForActivity(anActivity)
+                for anActivity, firstMatchingPosition in zip(activities, firstMatchingPositions)]
+
+    def defaultBucketDefinitionForActivity(self, anActivity):
         defaultBucket = anActivity.category() if self._useActivityCategoryAsDefault else 'NoBucket'
-        return ActivityBucketDefinition.withBucketName(defaultBucket)
+        defaultDefinition = self._defaultBucketDefinitions.get(defaultBucket)
+        if defaultDefinition is None:
+            defaultDefinition = self._defaultBucketDefinitions.setdefault(defaultBucket, ActivityBucketDefinition.withBucketName(defaultBucket))
+        return defaultDefinition
+
+    def _indexDefinitions(self):
+        # A category listed by several definitions belongs to the first one declared.
+        positionsByCategory = {}
+        conditionDefinitionPositions = []
+        for position, aDefinition in enumerate(self._bucketDefinitions):
+            activityCategories = aDefinition.activityCategories()
+            if activityCategories is None:
+                conditionDefinitionPositions.append(position)
+                continue
+            for aCategory in activityCategories: positionsByCategory.setdefault(aCategory, position)
+        self._positionsByCategory = positionsByCategory
+        self._conditionDefinitionPositions = conditionDefinitionPositions
+        self._indexedDefinitionsCount = len(self._bucketDefinitions)
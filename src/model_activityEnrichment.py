@@ -1,3 +1,10 @@
+import re
+import types
+from functools import partial
+from collections import OrderedDict
+from time import perf_counter
+
+
 class ActivityAggregationCompositeCondition:
 
     @classmethod
@@ -8,21 +15,326 @@ class ActivityAggregationCompositeCondition:
         self._conditions = conditions
 
     def satisfies(self, anActivity):
-        return any([aCondition.satisfies(anActivity) for aCondition in self._conditions])
+        return any(aCondition.satisfies(anActivity) for aCondition in self._conditions)
+
+    def satisfiesEach(self, activities):
+        return AdaptivelyOrderedConditions.masksCombined(self._conditions, activities, True)
+
+    def compiled(self):
+        return AdaptivelyOrderedConditions.anyOf(AdaptivelyOrderedConditions.flattened(self._conditions, type(self)))
+
+    def conditions(self):
+        return self._conditions
+
+    def fingerprint(self):
+        return (type(self).__name__, tuple(aCondition.fingerprint() for aCondition in self._conditions))
+
+    def searchedStrings(self):
+        searchedStrings = []
+        for aCondition in self._conditions:
+            conditionStrings = aCondition.searchedStrings()
+            if conditionStrings is None: return None
+            searchedStrings.extend(conditionStrings)
+        return searchedStrings
+
+    def searchedPatterns(self):
+        searchedPatterns = []
+        for aCondition in self._conditions:
+            conditionPatterns = aCondition.searchedPatterns()
+            if conditionPatterns is None: return None
+            searchedPatterns.extend(conditionPatterns)
+        return searchedPatterns
+
+    def dependsOnlyOnDescription(self):
+        return all(aCondition.dependsOnlyOnDescription() for aCondition in self._conditions)
+
+    def evaluatesInBatches(self):
+        return any(aCondition.evaluatesInBatches() for aCondition in self._conditions)
+
+
+class ActivityAggregationConjunctionCondition:
+
+    @classmethod
+    def withConditions(cls, conditions):
+        cls.assertConditions(conditions)
+        return cls(conditions)
+
+    @classmethod
+    def assertConditions(cls, conditions):
+        if not conditions: raise Exception('Conjunction needs at least one condition')
+
+    def __init__(self, conditions):
+        self._conditions = conditions
+
+    def satisfies(self, anActivity):
+        return all(aCondition.satisfies(anActivity) for aCondition in self._conditions)
+
+    def satisfiesEach(self, activities):
+        return AdaptivelyOrderedConditions.masksCombined(self._conditions, activities, False)
+
+    def compiled(self):
+        return AdaptivelyOrderedConditions.allOf(AdaptivelyOrderedConditions.flattened(self._conditions, type(self)))
+
+    def conditions(self):
+        return self._conditions
+
+    def fingerprint(self):
+        return (type(self).__name__, tuple(aCondition.fingerprint() for aCondition in self._conditions))
+
+    def searchedStrings(self):
+        return None
+
+    def searchedPatterns(self):
+        return None
+
+    def dependsOnlyOnDescription(self):
+        return all(aCondition.dependsOnlyOnDescription() for aCondition in self._conditions)
+
+    def evaluatesInBatches(self):
+        return any(aCondition.evaluatesInBatches() for aCondition in self._conditions)
+
+
+class ActivityAggregationNegatedCondition:
+
+    @classmethod
+    def negating(cls, aCondition):
+        return cls(aCondition)
+
+    def __init__(self, aCondition):
+        self._condition = aCondition
+
+    def satisfies(self, anActivity):
+        return not self._condition.satisfies(anActivity)
+
+    def satisfiesEach(self, activities):
+        return [not satisfied for satisfied in self._condition.satisfiesEach(activities)]
+
+    def compiled(self):
+        if isinstance(self._condition, ActivityAggregationNegatedCondition): return self._condition.negatedCondition().compiled()
+        return self.negating(self._condition.compiled())
+
+    def negatedCondition(self):
+        return self._condition
+
+    def fingerprint(self):
+        return (type(self).__name__, self._condition.fingerprint())
+
+    def searchedStrings(self):
+        return None
+
+    def searchedPatterns(self):
+        return None
+
+    def dependsOnlyOnDescription(self):
+        return self._condition.dependsOnlyOnDescription()
+
+    def evaluatesInBatches(self):
+        return self._condition.evaluatesInBatches()
+
+
+class AdaptivelyOrderedConditions:
+
+    SAMPLED_EVALUATIONS = 256
+
+    @classmethod
+    def anyOf(cls, conditions):
+        return conditions[0] if len(conditions) == 1 else cls(conditions, True)
+
+    @classmethod
+    def allOf(cls, conditions):
+        return conditions[0] if len(conditions) == 1 else cls(conditions, False)
+
+    @classmethod
+    def flattened(cls, conditions, compositeClass):
+        flattenedConditions = []
+        for aCondition in conditions:
+            if isinstance(aCondition, compositeClass): flattenedConditions.extend(cls.flattened(aCondition.conditions(), compositeClass))
+            else: flattenedConditions.append(aCondition.compiled())
+        return flattenedConditions
+
+    @classmethod
+    def masksCombined(cls, conditions, activities, decidingResult):
+        mask = [not decidingResult] * len(activities)
+        pendingPositions = list(range(len(activities)))
+        for aCondition in conditions:
+            if not pendingPositions: break
+            conditionMask = aCondition.satisfiesEach([activities[position] for position in pendingPositions])
+            undecidedPositions = []
+            for position, satisfied in zip(pendingPositions, conditionMask):
+                if bool(satisfied) == decidingResult: mask[position] = decidingResult
+                else: undecidedPositions.append(position)
+            pendingPositions = undecidedPositions
+        return mask
+
+    def __init__(self, conditions, decidingResult):
+        # decidingResult is the sub-condition outcome that settles the whole: True for any, False for all.
+        self._conditions = conditions
+        self._decidingResult = decidingResult
+        self._evaluations = [0] * len(conditions)
+        self._decisions = [0] * len(conditions)
+        self._seconds = [0.0] * len(conditions)
+        self._sampledEvaluations = 0
+
+    def conditions(self):
+        return self._conditions
+
+    def satisfies(self, anActivity):
+        if self._sampledEvaluations < self.SAMPLED_EVALUATIONS: return self._satisfiesMeasuringConditions(anActivity)
+        decidingResult = self._decidingResult
+        for aCondition in self._conditions:
+            if bool(aCondition.satisfies(anActivity)) == decidingResult: return decidingResult
+        return not decidingResult
+
+    def satisfiesEach(self, activities):
+        return self.masksCombined(self._conditions, activities, self._decidingResult)
+
+    def _satisfiesMeasuringConditions(self, anActivity):
+        result = not self._decidingResult
+        for position, aCondition in enumerate(self._conditions):
+            start = perf_counter()
+            satisfied = bool(aCondition.satisfies(anActivity))
+            self._seconds[position] = self._seconds[position] + perf_counter() - start
+            self._evaluations[position] = self._evaluations[position] + 1
+            if satisfied == self._decidingResult:
+                self._decisions[position] = self._decisions[position] + 1
+                result = self._decidingResult
+                break
+        self._sampledEvaluations = self._sampledEvaluations + 1
+        if self._sampledEvaluations == self.SAMPLED_EVALUATIONS: self._reorderConditions()
+        return result
+
+    def _reorderConditions(self):
+        # Cheapest expected cost per decision first; the outcome does not depend on the order.
+        positions = sorted(range(len(self._conditions)), key=self._expectedCostPerDecision)
+        self._conditions = [self._conditions[position] for position in positions]
+
+    def _expectedCostPerDecision(self, position):
+        evaluations = self._evaluations[position]
+        if not evaluations: return float('inf')
+        decisionRate = self._decisions[position] / evaluations
+        return (self._seconds[position] / evaluations) / max(decisionRate, 1 / (evaluations + 1))
 
 
 class ActivityPluggableCondition:
 
     @classmethod
-    def usingCode(cls, code):
-        return cls(code)
+    def usingCode(cls, code, dependsOnlyOnDescription = True):
+        return cls(code, dependsOnlyOnDescription)
 
-    def __init__(self, code):
+    def __init__(self, code, dependsOnlyOnDescription):
         self._code = code
+        self._dependsOnlyOnDescription = dependsOnlyOnDescription
 
     def satisfies(self, anActivity):
         return self._code(anActivity)
 
+    def satisfiesEach(self, activities):
+        return [self._code(anActivity) for anActivity in activities]
+
+    def compiled(self):
+        return self
+
+    def fingerprint(self):
+        return (type(self).__name__, self.codeFingerprint(self._code))
+
+    def searchedStrings(self):
+        return None
+
+    def searchedPatterns(self):
+        return None
+
+    def dependsOnlyOnDescription(self):
+        return self._dependsOnlyOnDescription
+
+    def evaluatesInBatches(self):
+        return False
+
+    @classmethod
+    def codeFingerprint(cls, code, codeBeingFingerprinted = ()):
+        # Bytecode, constants, default and captured values and the module globals the code reads identify
+        # the rule, following functions it calls. Partials and callable objects are fingerprinted through
+        # their function and bound state. State reached only through attributes or arguments is not covered.
+        # Reprs that embed memory addresses only make the fingerprint change more often, never less.
+        if any(code is visitedCode for visitedCode in codeBeingFingerprinted): return (getattr(code, '__module__', None), getattr(code, '__qualname__', repr(code)))
+        codeBeingFingerprinted = codeBeingFingerprinted + (code,)
+        if isinstance(code, partial):
+            return ('partial', cls.valueFingerprint(code.func, codeBeingFingerprinted), cls.valuesFingerprint(code.args, codeBeingFingerprinted),
+                    cls.namedValuesFingerprint(code.keywords, codeBeingFingerprinted))
+        if isinstance(code, types.MethodType):
+            return ('method', cls.objectFingerprint(code.__self__, codeBeingFingerprinted), cls.codeFingerprint(code.__func__, codeBeingFingerprinted))
+        if not isinstance(code, types.FunctionType):
+            if isinstance(code, (types.BuiltinFunctionType, type)) or not hasattr(type(code), '__call__'): return (getattr(code, '__module__', None), getattr(code, '__qualname__', repr(code)))
+            return ('callable', cls.objectFingerprint(code, codeBeingFingerprinted), cls.valueFingerprint(type(code).__call__, codeBeingFingerprinted))
+        codeObject = code.__code__
+        defaultValues = cls.valuesFingerprint(code.__defaults__ or (), codeBeingFingerprinted)
+        keywordDefaultValues = cls.namedValuesFingerprint(code.__kwdefaults__ or {}, codeBeingFingerprinted)
+        closureValues = tuple(cls.valueFingerprint(aCell.cell_contents, codeBeingFingerprinted) for aCell in code.__closure__ or ())
+        globalValues = tuple((aName, cls.valueFingerprint(code.__globals__[aName], codeBeingFingerprinted))
+                             for aName in cls.namesReadBy(codeObject) if aName in code.__globals__)
+        return (code.__module__, code.__qualname__, cls.codeObjectFingerprint(codeObject), defaultValues, keywordDefaultValues, closureValues, globalValues)
+
+    @classmethod
+    def codeObjectFingerprint(cls, codeObject):
+        constants = tuple(cls.codeObjectFingerprint(aConstant) if hasattr(aConstant, 'co_code') else repr(aConstant) for aConstant in codeObject.co_consts)
+        return (codeObject.co_code.hex(), constants, codeObject.co_names)
+
+    @classmethod
+    def namesReadBy(cls, codeObject):
+        names = list(codeObject.co_names)
+        for aConstant in codeObject.co_consts:
+            if hasattr(aConstant, 'co_code'): names.extend(aName for aName in cls.namesReadBy(aConstant) if aName not in names)
+        return names
+
+    @classmethod
+    def valueFingerprint(cls, aValue, codeBeingFingerprinted):
+        if isinstance(aValue, types.ModuleType): return aValue.__name__
+        if isinstance(aValue, (types.FunctionType, types.MethodType, partial)): return cls.codeFingerprint(aValue, codeBeingFingerprinted)
+        return repr(aValue)
+
+    @classmethod
+    def valuesFingerprint(cls, values, codeBeingFingerprinted):
+        return tuple(cls.valueFingerprint(aValue, codeBeingFingerprinted) for aValue in values)
+
+    @classmethod
+    def namedValuesFingerprint(cls, valuesByName, codeBeingFingerprinted):
+        return tuple(sorted((aName, cls.valueFingerprint(aValue, codeBeingFingerprinted)) for aName, aValue in valuesByName.items()))
+
+    @classmethod
+    def objectFingerprint(cls, anObject, codeBeingFingerprinted):
+        objectType = type(anObject)
+        if not hasattr(anObject, '__dict__'): return (objectType.__module__, objectType.__qualname__, repr(anObject))
+        return (objectType.__module__, objectType.__qualname__, cls.namedValuesFingerprint(vars(anObject), codeBeingFingerprinted))
+
+
+class ActivityBatchPluggableCondition(ActivityPluggableCondition):
+
+    @classmethod
+    def usingActivitiesBatchCode(cls, batchCode, dependsOnlyOnDescription = True):
+        return cls(batchCode, dependsOnlyOnDescription, False)
+
+    @classmethod
+    def usingDescriptionsBatchCode(cls, batchCode):
+        return cls(batchCode, True, True)
+
+    def __init__(self, batchCode, dependsOnlyOnDescription, receivesDescriptions):
+        super().__init__(batchCode, dependsOnlyOnDescription)
+        self._receivesDescriptions = receivesDescriptions
+
+    def satisfies(self, anActivity):
+        return self.satisfiesEach([anActivity])[0]
+
+    def satisfiesEach(self, activities):
+        batch = [anActivity.description() for anActivity in activities] if self._receivesDescriptions else activities
+        mask = self._code(batch)
+        if len(mask) != len(activities): raise Exception('Batch condition must return one result per activity')
+        return [bool(satisfied) for satisfied in mask]
+
+    def evaluatesInBatches(self):
+        return True
+
+    def fingerprint(self):
+        return super().fingerprint() + (self._receivesDescriptions,)
+
 
 class ActivityDescriptionIncludesStringCondition:
 
@@ -41,6 +353,140 @@ class ActivityDescriptionIncludesStringCondition:
     def satisfies(self, anActivity):
         return self._string in anActivity.description()
 
+    def satisfiesEach(self, activities):
+        return [self._string in anActivity.description() for anActivity in activities]
+
+    def compiled(self):
+        return self
+
+    def fingerprint(self):
+        return (type(self).__name__, self._string)
+
+    def searchedStrings(self):
+        return [self._string]
+
+    def searchedPatterns(self):
+        return [re.escape(self._string)]
+
+    def dependsOnlyOnDescription(self):
+        return True
+
+    def evaluatesInBatches(self):
+        return False
+
+
+class ActivityDescriptionMatchesPatternCondition:
+
+    @classmethod
+    def forPattern(cls, pattern, ignoreCase = False):
+        cls.assertValid(pattern, ignoreCase)
+        return cls(pattern, ignoreCase)
+
+    @classmethod
+    def assertValid(cls, pattern, ignoreCase = False):
+        if not pattern: raise Exception('Pattern to search for cannot be empty')
+        try:
+            re.compile(pattern)
+            re.compile(DescriptionPatternsAlternation.alternativeFor(cls.searchedPatternFor(pattern, ignoreCase), 0))
+        except re.error as error:
+            raise Exception('Invalid pattern ' + pattern + ': ' + str(error))
+
+    @classmethod
+    def searchedPatternFor(cls, pattern, ignoreCase):
+        scopedPattern = DescriptionPatternsAlternation.withScopedFlags(pattern)
+        return '(?i:' + scopedPattern + ')' if ignoreCase else scopedPattern
+
+    def __init__(self, pattern, ignoreCase):
+        self._pattern = pattern
+        self._ignoreCase = ignoreCase
+        self._regex = re.compile(pattern, re.IGNORECASE if ignoreCase else 0)
+
+    def satisfies(self, anActivity):
+        return self._regex.search(anActivity.description()) is not None
+
+    def satisfiesEach(self, activities):
+        search = self._regex.search
+        return [search(anActivity.description()) is not None for anActivity in activities]
+
+    def compiled(self):
+        return self
+
+    def fingerprint(self):
+        return (type(self).__name__, self._pattern, self._ignoreCase)
+
+    def searchedStrings(self):
+        return None
+
+    def searchedPatterns(self):
+        return [self.searchedPatternFor(self._pattern, self._ignoreCase)]
+
+    def dependsOnlyOnDescription(self):
+        return True
+
+    def evaluatesInBatches(self):
+        return False
+
+
+class DescriptionPatternsAlternation():
+
+    BACKREFERENCE = re.compile(r'\\[1-9]|\(\?P=')
+    GLOBAL_FLAGS = re.compile(r'\(\?([aiLmsux]+)\)')
+
+    @classmethod
+    def forPatternsAndValues(cls, patternsWithValues, noMatchValue):
+        return cls(patternsWithValues, noMatchValue)
+
+    @classmethod
+    def withScopedFlags(cls, pattern):
+        # Global flags are only allowed at the start of a whole regex, so inside an alternation they become scoped ones.
+        flags = ''
+        aMatch = cls.GLOBAL_FLAGS.match(pattern)
+        while aMatch:
+            flags = flags + aMatch.group(1)
+            pattern = pattern[aMatch.end():]
+            aMatch = cls.GLOBAL_FLAGS.match(pattern)
+        if not flags: return pattern
+        return '(?' + flags + ':' + pattern + ('\n)' if 'x' in flags else ')')
+
+    @classmethod
+    def alternativeFor(cls, pattern, alternativeNumber):
+        return '(?=(?s:.*?)(?:' + cls.withScopedFlags(pattern) + '))(?P<' + cls.groupNameFor(alternativeNumber) + '>)'
+
+    @classmethod
+    def groupNameFor(cls, alternativeNumber):
+        return '_alternative' + str(alternativeNumber)
+
+    def __init__(self, patternsWithValues, noMatchValue):
+        # Every alternative is a lookahead tried from the start of the description, so the
+        # first alternative that succeeds is the one declared first, wherever it matches.
+        self._noMatchValue = noMatchValue
+        self._valuesByGroup = {}
+        self._alternation = None
+        self._separateRegexes = []
+        if not patternsWithValues: return
+        alternatives = []
+        for alternativeNumber, (pattern, aValue) in enumerate(patternsWithValues):
+            self._valuesByGroup[self.groupNameFor(alternativeNumber)] = aValue
+            alternatives.append(self.alternativeFor(pattern, alternativeNumber))
+        if not any(self.BACKREFERENCE.search(pattern) for pattern, _ in patternsWithValues):
+            try:
+                self._alternation = re.compile('|'.join(alternatives))
+                return
+            except re.error:
+                pass
+        self._separateRegexes = [(re.compile(pattern), aValue) for pattern, aValue in patternsWithValues]
+
+    def isCombined(self):
+        return self._alternation is not None
+
+    def firstMatchingValue(self, text):
+        if self._alternation:
+            aMatch = self._alternation.match(text)
+            return self._valuesByGroup[aMatch.lastgroup] if aMatch else self._noMatchValue
+        for aRegex, aValue in self._separateRegexes:
+            if aRegex.search(text): return aValue
+        return self._noMatchValue
+
 
 class ActivityAggregationDefinition:
 
@@ -56,34 +502,386 @@ class ActivityAggregationDefinition:
     def __init__(self, name, condition):
         self._name = name
         self._condition = condition
+        self._compiledCondition = condition.compiled()
 
     def category(self):
         return self._name
 
+    def bucket(self):
+        return self._name
+
+    def activityCategories(self):
+        return None
+
     def matches(self, anActivity):
-        return self._condition.satisfies(anActivity)
+        return self._compiledCondition.satisfies(anActivity)
+
+    def matchesEach(self, activities):
+        return self._compiledCondition.satisfiesEach(activities)
 
 class ActivityEnrichmentSpec():
+
+    DESCRIPTION_CACHE_SIZE = 8192
      
     @classmethod
-    def withDefinitions(cls, definitions):
-        return cls(definitions)
+    def withDefinitions(cls, definitions, descriptionCacheSize = DESCRIPTION_CACHE_SIZE):
+        cls.assertDescriptionCacheSize(descriptionCacheSize)
+        return cls(definitions, descriptionCacheSize)
     
     @classmethod
     def empty(cls):
         return cls.withDefinitions([])
 
-    def __init__(self, definitions):
+    @classmethod
+    def assertDescriptionCacheSize(cls, descriptionCacheSize):
+        if descriptionCacheSize < 0: raise Exception('Description cache size cannot be negative')
+
+    def __init__(self, definitions, descriptionCacheSize):
         self._definitions = definitions
+        self._descriptionCacheSize = descriptionCacheSize
+        self._descriptionCache = OrderedDict()
+        self._descriptionCacheHits = 0
+        self._descriptionCacheMisses = 0
+        self._compiledDefinitionsCount = None
+        self._profiler = None
         
     def enrichmentDefinitionForActivity(self, anActivity):
-        for aDefinition in self._definitions:
-            if aDefinition.matches(anActivity): return aDefinition
+        if self._profiler: return self._profiledDefinitionForActivity(anActivity)
+        if self._compiledDefinitionsCount != len(self._definitions): self._compileDefinitions()
+        firstMatchingIndex = self._firstIndexMatchingDescription(anActivity)
+        for definitionIndex in self._activityDependentDefinitionIndexes:
+            if definitionIndex >= firstMatchingIndex: break
+            if self._definitions[definitionIndex].matches(anActivity): return self._definitions[definitionIndex]
+        if firstMatchingIndex < len(self._definitions): return self._definitions[firstMatchingIndex]
+        return ActivityEnrichmentSpecDefinition.withBucketDescriptionOverrideAndCondition('Unclassified', anActivity.description(), None)
+
+    def enrichmentDefinitionsForActivities(self, activities):
+        if self._profiler: return [self._profiledDefinitionForActivity(anActivity) for anActivity in activities]
+        if self._compiledDefinitionsCount != len(self._definitions): self._compileDefinitions()
+        firstMatchingIndexes = self._firstIndexesMatchingDescriptions(activities)
+        self._narrowFirstMatchingIndexes(activities, firstMatchingIndexes, self._activityDependentDefinitionIndexes)
+        return [self._definitions[firstMatchingIndex] if firstMatchingIndex < len(self._definitions)
+                else ActivityEnrichmentSpecDefinition.withBucketDescriptionOverrideAndCondition('Unclassified', anActivity.description(), None)
+                for anActivity, firstMatchingIndex in zip(activities, firstMatchingIndexes)]
+
+    def evaluatesInBatches(self):
+        return any(aDefinition.evaluatesInBatches() for aDefinition in self._definitions)
+
+    def startProfiling(self):
+        self._profiler = EnrichmentDefinitionsProfiler.forDefinitions(self._definitions)
+
+    def stopProfiling(self):
+        report = self.profilingReport()
+        self._profiler = None
+        return report
+
+    def isProfiling(self):
+        return self._profiler is not None
+
+    def profilingReport(self):
+        self.assertIsProfiling()
+        return self._profiler.report()
+
+    def assertIsProfiling(self):
+        if not self._profiler: raise Exception('Enrichment spec is not being profiled')
+
+    def _profiledDefinitionForActivity(self, anActivity):
+        # Profiling skips the automaton and the description cache so every rule is measured on its own.
+        aDefinition = self._profiler.firstMatchingDefinition(anActivity)
+        if aDefinition: return aDefinition
         return ActivityEnrichmentSpecDefinition.withBucketDescriptionOverrideAndCondition('Unclassified', anActivity.description(), None)
 
+    def descriptionCacheStatistics(self):
+        return DescriptionCacheStatistics.withHitsMissesAndSize(self._descriptionCacheHits, self._descriptionCacheMisses, len(self._descriptionCache))
+
+    def _firstIndexMatchingDescription(self, anActivity):
+        # Only definitions whose outcome is decided by the description are resolved here,
+        # which is what makes the result safe to remember per description.
+        description = anActivity.description()
+        firstMatchingIndex = self._descriptionCache.get(description)
+        if firstMatchingIndex is not None:
+            self._descriptionCacheHits = self._descriptionCacheHits + 1
+            self._descriptionCache.move_to_end(description)
+            return firstMatchingIndex
+        self._descriptionCacheMisses = self._descriptionCacheMisses + 1
+        firstMatchingIndex = self._firstIndexMatchingSearchedText(description)
+        for definitionIndex in self._opaqueDescriptionDefinitionIndexes:
+            if definitionIndex >= firstMatchingIndex: break
+            if self._definitions[definitionIndex].matches(anActivity):
+                firstMatchingIndex = definitionIndex
+                break
+        self._rememberFirstIndexMatchingDescription(description, firstMatchingIndex)
+        return firstMatchingIndex
+
+    def _firstIndexesMatchingDescriptions(self, activities):
+        firstMatchingIndexes = [None] * len(activities)
+        uncachedPositionsByDescription = {}
+        for position, anActivity in enumerate(activities):
+            description = anActivity.description()
+            firstMatchingIndex = self._descriptionCache.get(description)
+            if firstMatchingIndex is not None:
+                self._descriptionCacheHits = self._descriptionCacheHits + 1
+                self._descriptionCache.move_to_end(description)
+                firstMatchingIndexes[position] = firstMatchingIndex
+            else:
+                uncachedPositionsByDescription.setdefault(description, []).append(position)
+        self._descriptionCacheMisses = self._descriptionCacheMisses + len(uncachedPositionsByDescription)
+        uncachedActivities = [activities[positions[0]] for positions in uncachedPositionsByDescription.values()]
+        uncachedIndexes = [self._firstIndexMatchingSearchedText(anActivity.description()) for anActivity in uncachedActivities]
+        self._narrowFirstMatchingIndexes(uncachedActivities, uncachedIndexes, self._opaqueDescriptionDefinitionIndexes)
+        for (description, positions), firstMatchingIndex in zip(uncachedPositionsByDescription.items(), uncachedIndexes):
+            self._rememberFirstIndexMatchingDescription(description, firstMatchingIndex)
+            for position in positions: firstMatchingIndexes[position] = firstMatchingIndex
+        return firstMatchingIndexes
+
+    def _firstIndexMatchingSearchedText(self, description):
+        firstMatchingIndex = self._substringsAutomaton.firstMatchingValue(description)
+        if self._patternsAlternation: firstMatchingIndex = min(firstMatchingIndex, self._patternsAlternation.firstMatchingValue(description))
+        return firstMatchingIndex
+
+    def _narrowFirstMatchingIndexes(self, activities, firstMatchingIndexes, definitionIndexes):
+        # Each definition sees, in a single call, only the activities no earlier definition matched.
+        for definitionIndex in definitionIndexes:
+            pendingPositions = [position for position, firstMatchingIndex in enumerate(firstMatchingIndexes) if firstMatchingIndex > definitionIndex]
+            if not pendingPositions: break
+            mask = self._definitions[definitionIndex].matchesEach([activities[position] for position in pendingPositions])
+            for position, matched in zip(pendingPositions, mask):
+                if matched: firstMatchingIndexes[position] = definitionIndex
+
+    def _rememberFirstIndexMatchingDescription(self, description, firstMatchingIndex):
+        if not self._descriptionCacheSize: return
+        self._descriptionCache[description] = firstMatchingIndex
+        if len(self._descriptionCache) > self._descriptionCacheSize: self._descriptionCache.popitem(last=False)
+
+    def _compileDefinitions(self):
+        # Definitions made only of substring conditions are resolved by a single automaton
+        # scan; the rest keep being evaluated, but only when they precede its match.
+        searchedStringsWithIndexes = []
+        searchedPatternsWithIndexes = []
+        opaqueDescriptionDefinitionIndexes = []
+        activityDependentDefinitionIndexes = []
+        for definitionIndex, aDefinition in enumerate(self._definitions):
+            searchedStrings = aDefinition.searchedStrings()
+            searchedPatterns = aDefinition.searchedPatterns() if searchedStrings is None else None
+            if searchedStrings is not None:
+                searchedStringsWithIndexes.extend((aString, definitionIndex) for aString in searchedStrings)
+            elif searchedPatterns is not None:
+                searchedPatternsWithIndexes.extend((aPattern, definitionIndex) for aPattern in searchedPatterns)
+            elif aDefinition.dependsOnlyOnDescription():
+                opaqueDescriptionDefinitionIndexes.append(definitionIndex)
+            else:
+                activityDependentDefinitionIndexes.append(definitionIndex)
+        self._substringsAutomaton = AhoCorasickAutomaton.forStringsAndValues(searchedStringsWithIndexes, len(self._definitions))
+        self._patternsAlternation = DescriptionPatternsAlternation.forPatternsAndValues(searchedPatternsWithIndexes, len(self._definitions)) if searchedPatternsWithIndexes else None
+        self._opaqueDescriptionDefinitionIndexes = opaqueDescriptionDefinitionIndexes
+        self._activityDependentDefinitionIndexes = activityDependentDefinitionIndexes
+        self._descriptionCache.clear()
+        self._compiledDefinitionsCount = len(self._definitions)
+
     def allBuckets(self):
         return [aDefinition.bucket() for aDefinition in self._definitions]
 
+    def fingerprint(self):
+        return (type(self).__name__, tuple(aDefinition.fingerprint() for aDefinition in self._definitions))
+
+
+class EnrichmentDefinitionsProfiler():
+
+    @classmethod
+    def forDefinitions(cls, definitions):
+        return cls(definitions)
+
+    def __init__(self, definitions):
+        self._definitions = definitions
+        self._profiledActivities = 0
+        self._evaluations = []
+        self._matches = []
+        self._shadowedMatches = []
+        self._seconds = []
+
+    def firstMatchingDefinition(self, anActivity):
+        # Rules after the first match are still asked, untimed, to learn which ones it shadows.
+        self._countNewDefinitions()
+        self._profiledActivities = self._profiledActivities + 1
+        firstMatchingDefinition = None
+        for position, aDefinition in enumerate(self._definitions):
+            if firstMatchingDefinition:
+                if aDefinition.matches(anActivity): self._shadowedMatches[position] = self._shadowedMatches[position] + 1
+                continue
+            start = perf_counter()
+            matched = aDefinition.matches(anActivity)
+            self._seconds[position] = self._seconds[position] + perf_counter() - start
+            self._evaluations[position] = self._evaluations[position] + 1
+            if matched:
+                self._matches[position] = self._matches[position] + 1
+                firstMatchingDefinition = aDefinition
+        return firstMatchingDefinition
+
+    def report(self):
+        self._countNewDefinitions()
+        profiles = [EnrichmentDefinitionProfile.forDefinitionAtPosition(position, aDefinition, self._evaluations[position], self._matches[position], self._shadowedMatches[position], self._seconds[position])
+                    for position, aDefinition in enumerate(self._definitions)]
+        return EnrichmentProfilingReport.withProfiledActivitiesAndProfiles(self._profiledActivities, profiles)
+
+    def _countNewDefinitions(self):
+        newDefinitionsCount = len(self._definitions) - len(self._evaluations)
+        if newDefinitionsCount <= 0: return
+        self._evaluations.extend([0] * newDefinitionsCount)
+        self._matches.extend([0] * newDefinitionsCount)
+        self._shadowedMatches.extend([0] * newDefinitionsCount)
+        self._seconds.extend([0.0] * newDefinitionsCount)
+
+
+class EnrichmentProfilingReport():
+
+    @classmethod
+    def withProfiledActivitiesAndProfiles(cls, profiledActivities, definitionProfiles):
+        return cls(profiledActivities, definitionProfiles)
+
+    def __init__(self, profiledActivities, definitionProfiles):
+        self._profiledActivities = profiledActivities
+        self._definitionProfiles = definitionProfiles
+
+    def profiledActivities(self):
+        return self._profiledActivities
+
+    def definitionProfiles(self):
+        return self._definitionProfiles
+
+    def alwaysShadowedDefinitions(self):
+        return [aProfile for aProfile in self._definitionProfiles if aProfile.isAlwaysShadowed()]
+
+    def neverMatchedDefinitions(self):
+        return [aProfile for aProfile in self._definitionProfiles if aProfile.neverMatched()]
+
+    def mostExpensiveDefinitions(self, count):
+        return sorted(self._definitionProfiles, key=lambda aProfile: aProfile.seconds(), reverse=True)[:count]
+
+    def asDictionaries(self):
+        return [aProfile.asDictionary() for aProfile in self._definitionProfiles]
+
+
+class EnrichmentDefinitionProfile():
+
+    @classmethod
+    def forDefinitionAtPosition(cls, position, aDefinition, evaluations, matches, shadowedMatches, seconds):
+        return cls(position, aDefinition, evaluations, matches, shadowedMatches, seconds)
+
+    def __init__(self, position, aDefinition, evaluations, matches, shadowedMatches, seconds):
+        self._position = position
+        self._definition = aDefinition
+        self._evaluations = evaluations
+        self._matches = matches
+        self._shadowedMatches = shadowedMatches
+        self._seconds = seconds
+
+    def position(self):
+        return self._position
+
+    def definition(self):
+        return self._definition
+
+    def evaluations(self):
+        return self._evaluations
+
+    def matches(self):
+        return self._matches
+
+    def shadowedMatches(self):
+        return self._shadowedMatches
+
+    def seconds(self):
+        return self._seconds
+
+    def isAlwaysShadowed(self):
+        return self._matches == 0 and self._shadowedMatches > 0
+
+    def neverMatched(self):
+        return self._matches == 0 and self._shadowedMatches == 0
+
+    def asDictionary(self):
+        return {'position': self._position, 'bucket': self._definition.bucket(), 'descriptionOverride': self._definition.descriptionOverride(),
+                'evaluations': self._evaluations, 'matches': self._matches, 'shadowedMatches': self._shadowedMatches, 'seconds': self._seconds,
+                'alwaysShadowed': self.isAlwaysShadowed(), 'neverMatched': self.neverMatched()}
+
+
+class DescriptionCacheStatistics():
+
+    @classmethod
+    def withHitsMissesAndSize(cls, hits, misses, size):
+        return cls(hits, misses, size)
+
+    def __init__(self, hits, misses, size):
+        self._hits = hits
+        self._misses = misses
+        self._size = size
+
+    def hits(self):
+        return self._hits
+
+    def misses(self):
+        return self._misses
+
+    def size(self):
+        return self._size
+
+    def hitRate(self):
+        lookups = self._hits + self._misses
+        return self._hits / lookups if lookups else 0.0
+
+
+class AhoCorasickAutomaton():
+
+    @classmethod
+    def forStringsAndValues(cls, stringsWithValues, noMatchValue):
+        automaton = cls(noMatchValue)
+        for aString, aValue in stringsWithValues: automaton.addString(aString, aValue)
+        automaton.linkFailureTransitions()
+        return automaton
+
+    def __init__(self, noMatchValue):
+        self._noMatchValue = noMatchValue
+        self._transitions = [{}]
+        self._failures = [0]
+        self._lowestValues = [noMatchValue]
+
+    def addString(self, aString, aValue):
+        state = 0
+        for character in aString:
+            nextState = self._transitions[state].get(character)
+            if nextState is None:
+                nextState = len(self._transitions)
+                self._transitions[state][character] = nextState
+                self._transitions.append({})
+                self._failures.append(0)
+                self._lowestValues.append(self._noMatchValue)
+            state = nextState
+        self._lowestValues[state] = min(self._lowestValues[state], aValue)
+
+    def linkFailureTransitions(self):
+        pendingStates = list(self._transitions[0].values())
+        for state in pendingStates:
+            for character, nextState in self._transitions[state].items():
+                failureState = self._failures[state]
+                while failureState and character not in self._transitions[failureState]:
+                    failureState = self._failures[failureState]
+                self._failures[nextState] = self._transitions[failureState].get(character, 0)
+                self._lowestValues[nextState] = min(self._lowestValues[nextState], self._lowestValues[self._failures[nextState]])
+                pendingStates.append(nextState)
+
+    def firstMatchingValue(self, text):
+        transitions = self._transitions
+        failures = self._failures
+        lowestValues = self._lowestValues
+        lowestValue = self._noMatchValue
+        state = 0
+        for character in text:
+            while state and character not in transitions[state]:
+                state = failures[state]
+            state = transitions[state].get(character, 0)
+            if lowestValues[state] < lowestValue: lowestValue = lowestValues[state]
+        return lowestValue
+
 
 class ActivityEnrichmentSpecDefinition():
 
@@ -100,6 +898,7 @@ class ActivityEnrichmentSpecDefinition():
         self._bucket = bucket
         self._descriptionOverride = descriptionOverride
         self._condition = condition
+        self._compiledCondition = condition.compiled() if condition else None
 
     def descriptionOverride(self):
         return self._descriptionOverride
@@ -108,7 +907,25 @@ class ActivityEnrichmentSpecDefinition():
         return self._bucket
 
     def matches(self, aDescription):
-        return self._condition.satisfies(aDescription)
+        return self._compiledCondition.satisfies(aDescription)
+
+    def matchesEach(self, activities):
+        return self._compiledCondition.satisfiesEach(activities)
+
+    def searchedStrings(self):
+        return self._condition.searchedStrings()
+
+    def searchedPatterns(self):
+        return self._condition.searchedPatterns()
+
+    def dependsOnlyOnDescription(self):
+        return self._condition.dependsOnlyOnDescription()
+
+    def evaluatesInBatches(self):
+        return self._condition.evaluatesInBatches()
+
+    def fingerprint(self):
+        return (type(self).__name__, self._bucket, self._descriptionOverride, self._condition.fingerprint())
 
 
 class ActivityEnrichmentSpecBuilder():
@@ -121,8 +938,27 @@ class ActivityEnrichmentSpecBuilder():
         aDefinition = ActivityEnrichmentSpecDefinition.withBucketDescriptionOverrideAndCondition(bucket, descriptionOverride, condition)
         self.addNewDefinition(aDefinition)
     
-    def addDefintionSpecForCodeBasedCondition(self, bucket, descriptionOverride, conditionCode):
-        condition = ActivityPluggableCondition.usingCode(conditionCode)
+    def addDefintionSpecForCodeBasedCondition(self, bucket, descriptionOverride, conditionCode, dependsOnlyOnDescription = True):
+        condition = ActivityPluggableCondition.usingCode(conditionCode, dependsOnlyOnDescription)
+        aDefinition = ActivityEnrichmentSpecDefinition.withBucketDescriptionOverrideAndCondition(bucket, descriptionOverride, condition)
+        self.addNewDefinition(aDefinition)
+
+    def addDefintionSpecForBatchCodeBasedCondition(self, bucket, descriptionOverride, batchConditionCode, dependsOnlyOnDescription = True):
+        condition = ActivityBatchPluggableCondition.usingActivitiesBatchCode(batchConditionCode, dependsOnlyOnDescription)
+        aDefinition = ActivityEnrichmentSpecDefinition.withBucketDescriptionOverrideAndCondition(bucket, descriptionOverride, condition)
+        self.addNewDefinition(aDefinition)
+
+    def addDefintionSpecForDescriptionsBatchCodeBasedCondition(self, bucket, descriptionOverride, batchConditionCode):
+        condition = ActivityBatchPluggableCondition.usingDescriptionsBatchCode(batchConditionCode)
+        aDefinition = ActivityEnrichmentSpecDefinition.withBucketDescriptionOverrideAndCondition(bucket, descriptionOverride, condition)
+        self.addNewDefinition(aDefinition)
+
+    def addDefintionSpecForDescriptionMatchingPattern(self, bucket, descriptionOverride, pattern, ignoreCase = False):
+        condition = ActivityDescriptionMatchesPatternCondition.forPattern(pattern, ignoreCase)
+        aDefinition = ActivityEnrichmentSpecDefinition.withBucketDescriptionOverrideAndCondition(bucket, descriptionOverride, condition)
+        self.addNewDefinition(aDefinition)
+
+    def addDefintionSpecForCondition(self, bucket, descriptionOverride, condition):
         aDefinition = ActivityEnrichmentSpecDefinition.withBucketDescriptionOverrideAndCondition(bucket, descriptionOverride, condition)
         self.addNewDefinition(aDefinition)
 
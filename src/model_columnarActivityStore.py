@@ -0,0 +1,147 @@
+from array import array
+from datetime import date
+
+from src.model import Dollars
+
+
+class ColumnarActivityTable():
+
+    @classmethod
+    def named(cls, name):
+        return cls(name)
+
+    @classmethod
+    def fromSource(cls, name, aSource):
+        table = cls.named(name)
+        table.addActivities(aSource.iterActivities())
+        return table
+
+    @classmethod
+    def fromActivities(cls, name, activities):
+        table = cls.named(name)
+        table.addActivities(activities)
+        return table
+
+    def __init__(self, name):
+        self._name = name
+        self._amountsInCents = array('q')
+        self._dateOrdinals = array('l')
+        self._expenseFlags = bytearray()
+        self._categories = DictionaryEncodedColumn()
+        self._descriptions = DictionaryEncodedColumn()
+        self._rawDescriptions = DictionaryEncodedColumn()
+        self._sourceNames = DictionaryEncodedColumn()
+        self._version = 0
+
+    def addActivities(self, activities):
+        for anActivity in activities: self.addActivity(anActivity)
+
+    def addActivity(self, anActivity):
+        self._amountsInCents.append(anActivity.totalInCents())
+        self._dateOrdinals.append(anActivity.date().toordinal())
+        self._expenseFlags.append(anActivity.isExpense())
+        self._categories.append(anActivity.category())
+        self._descriptions.append(anActivity.description())
+        self._rawDescriptions.append(anActivity.rawDescription())
+        self._sourceNames.append(anActivity.sourceName())
+        self._version = self._version + 1
+
+    def name(self):
+        return self._name
+
+    def version(self):
+        return self._version
+
+    def size(self):
+        return len(self._amountsInCents)
+
+    def expenses(self):
+        return list(self.iterExpenses())
+
+    def incomes(self):
+        return list(self.iterIncomes())
+
+    def iterActivities(self):
+        return (ColumnarActivityRow(self, rowIndex) for rowIndex in range(self.size()))
+
+    def iterExpenses(self):
+        return (ColumnarActivityRow(self, rowIndex) for rowIndex, isExpense in enumerate(self._expenseFlags) if isExpense)
+
+    def iterIncomes(self):
+        return (ColumnarActivityRow(self, rowIndex) for rowIndex, isExpense in enumerate(self._expenseFlags) if not isExpense)
+
+    def amountInCentsAt(self, rowIndex):
+        return self._amountsInCents[rowIndex]
+
+    def dateAt(self, rowIndex):
+        return date.fromordinal(self._dateOrdinals[rowIndex])
+
+    def isExpenseAt(self, rowIndex):
+        return self._expenseFlags[rowIndex] == 1
+
+    def categoryAt(self, rowIndex):
+        return self._categories.valueAt(rowIndex)
+
+    def descriptionAt(self, rowIndex):
+        return self._descriptions.valueAt(rowIndex)
+
+    def rawDescriptionAt(self, rowIndex):
+        return self._rawDescriptions.valueAt(rowIndex)
+
+    def sourceNameAt(self, rowIndex):
+        return self._sourceNames.valueAt(rowIndex)
+
+
+class DictionaryEncodedColumn():
+
+    def __init__(self):
+        self._values = []
+        self._idsByValue = {}
+        self._ids = array('l')
+
+    def append(self, aValue):
+        valueId = self._idsByValue.get(aValue)
+        if valueId is None:
+            valueId = len(self._values)
+            self._idsByValue[aValue] = valueId
+            self._values.append(aValue)
+        self._ids.append(valueId)
+
+    def valueAt(self, rowIndex):
+        return self._values[self._ids[rowIndex]]
+
+    def distinctValues(self):
+        return list(self._values)
+
+
+class ColumnarActivityRow():
+
+    __slots__ = ('_table', '_rowIndex')
+
+    def __init__(self, table, rowIndex):
+        self._table = table
+        self._rowIndex = rowIndex
+
+    def total(self):
+        return Dollars.withCents(self._table.amountInCentsAt(self._rowIndex))
+
+    def totalInCents(self):
+        return self._table.amountInCentsAt(self._rowIndex)
+
+    def description(self):
+        return self._table.descriptionAt(self._rowIndex)
+
+    def category(self):
+        return self._table.categoryAt(self._rowIndex)
+
+    def isExpense(self):
+        return self._table.isExpenseAt(self._rowIndex)
+
+    def sourceName(self):
+        return self._table.sourceNameAt(self._rowIndex)
+
+    def rawDescription(self):
+        return self._table.rawDescriptionAt(self._rowIndex)
+
+    def date(self):
+        return self._table.dateAt(self._rowIndex)
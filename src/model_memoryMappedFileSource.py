@@ -0,0 +1,60 @@
+import mmap
+import os
+
+from src.model import PathFinancialActivityFileSource
+
+
+class MemoryMappedFinancialActivityFileSource(PathFinancialActivityFileSource):
+
+    def __init__(self, name, path, amountColumnSpec, activityLineParser, activityEnrichmentSpec, encoding):
+        super().__init__(name, path, amountColumnSpec, activityLineParser, activityEnrichmentSpec, encoding)
+        self._separatorByte = activityLineParser.separator().encode(encoding)
+        boundingCharacter = activityLineParser.boundingCharacter()
+        self._boundingByte = boundingCharacter.encode(encoding) if boundingCharacter else None
+
+    def iterActivities(self):
+        with open(self._path, 'rb') as aFile:
+            if os.fstat(aFile.fileno()).st_size == 0: return
+            with mmap.mmap(aFile.fileno(), 0, access=mmap.ACCESS_READ) as mappedFile:
+                yield from self._activitiesFromMappedFile(mappedFile)
+
+    def _activitiesFromMappedFile(self, mappedFile):
+        lineBounds = self._lineBoundsIn(mappedFile)
+        headerStart, headerEnd = next(lineBounds)
+        fileView = memoryview(mappedFile)
+        try:
+            header = self._activityLineParser.parse(self._decoded(fileView, headerStart, headerEnd))
+            recordPlan = self._amountColumnSpec.recordPlanForHeader(header)
+            neededIndexes = set(recordPlan.columnIndexes())
+            lineRecords = (self._recordFromLine(mappedFile, fileView, lineStart, lineEnd, neededIndexes) for lineStart, lineEnd in lineBounds)
+            yield from self._activitiesFromRecordsInBatches(recordPlan, lineRecords)
+        finally:
+            fileView.release()
+
+    def _lineBoundsIn(self, mappedFile):
+        fileSize = len(mappedFile)
+        lineStart = 0
+        while lineStart < fileSize:
+            lineEnd = mappedFile.find(b'\n', lineStart)
+            if lineEnd == -1: lineEnd = fileSize
+            yield lineStart, lineEnd
+            lineStart = lineEnd + 1
+
+    def _recordFromLine(self, mappedFile, fileView, lineStart, lineEnd, neededIndexes):
+        # Bounded values can hide separators, so those lines go through the text parser.
+        if self._boundingByte and mappedFile.find(self._boundingByte, lineStart, lineEnd) != -1:
+            return self._activityLineParser.parse(self._decoded(fileView, lineStart, lineEnd))
+        lineRecord = []
+        valueStart = lineStart
+        lastNeededIndex = max(neededIndexes)
+        while len(lineRecord) <= lastNeededIndex:
+            separatorPosition = mappedFile.find(self._separatorByte, valueStart, lineEnd)
+            valueEnd = lineEnd if separatorPosition == -1 else separatorPosition
+            isNeeded = len(lineRecord) in neededIndexes
+            lineRecord.append(self._decoded(fileView, valueStart, valueEnd).strip() if isNeeded else None)
+            if separatorPosition == -1: break
+            valueStart = separatorPosition + len(self._separatorByte)
+        return lineRecord
+
+    def _decoded(self, fileView, start, end):
+        return str(fileView[start:end], self._encoding)
@@ -0,0 +1,86 @@
+import io
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+from src.model import PathFinancialActivityFileSource, FileActivityRowsReader, FinancialActivity
+
+
+class ParallelFinancialActivityFileSource(PathFinancialActivityFileSource):
+
+    @classmethod
+    def fromPath(cls, name, path, amountColumnSpec, activityLineParser, activityEnrichmentSpec, workers = None, chunkSize = None, encoding = 'utf-8'):
+        cls.assertName(name)
+        cls.assertSpecsCanBeSentToWorkers(amountColumnSpec, activityLineParser, activityEnrichmentSpec)
+        return cls(name, path, amountColumnSpec, activityLineParser, activityEnrichmentSpec, workers, chunkSize, encoding)
+
+    @classmethod
+    def assertSpecsCanBeSentToWorkers(cls, amountColumnSpec, activityLineParser, activityEnrichmentSpec):
+        try:
+            pickle.dumps((amountColumnSpec, activityLineParser, activityEnrichmentSpec))
+        except (pickle.PicklingError, AttributeError, TypeError) as error:
+            raise Exception('Specs cannot be sent to worker processes, pluggable conditions must be module level functions: ' + str(error))
+
+    def __init__(self, name, path, amountColumnSpec, activityLineParser, activityEnrichmentSpec, workers, chunkSize, encoding):
+        super().__init__(name, path, amountColumnSpec, activityLineParser, activityEnrichmentSpec, encoding)
+        self._workers = workers if workers else os.cpu_count()
+        self._chunkSize = chunkSize
+
+    def activityRowsLoad(self):
+        return None
+
+    def iterActivities(self):
+        with open(self._path, 'rb') as aFile:
+            headerLine = aFile.readline()
+            if not headerLine: return
+            header = self._activityLineParser.parse(headerLine.decode(self._encoding))
+            self._amountColumnSpec.recordPlanForHeader(header)
+            chunks = self._chunkBoundsAfterHeader(aFile)
+        workerSpecs = (self._path, self._encoding, header, self._amountColumnSpec, self._activityLineParser, self._activityEnrichmentSpec)
+        with ProcessPoolExecutor(max_workers=self._workers, initializer=_initializeWorker, initargs=workerSpecs) as executor:
+            for activityRows in executor.map(_activityRowsInChunk, chunks):
+                yield from FinancialActivity.fromActivityRowsInCents(activityRows, self)
+
+    def _chunkBoundsAfterHeader(self, aFile):
+        chunkStart = aFile.tell()
+        fileSize = os.fstat(aFile.fileno()).st_size
+        chunkSize = self._chunkSize if self._chunkSize else max(1, (fileSize - chunkStart) // (self._workers * 4))
+        chunks = []
+        while chunkStart < fileSize:
+            aFile.seek(min(chunkStart + chunkSize, fileSize))
+            aFile.readline()
+            chunkEnd = aFile.tell()
+            chunks.append((chunkStart, chunkEnd))
+            chunkStart = chunkEnd
+        return chunks
+
+
+class FileChunkActivityRowsReader():
+
+    @classmethod
+    def fromSpecs(cls, path, encoding, header, amountColumnSpec, activityLineParser, activityEnrichmentSpec):
+        return cls(path, encoding, header, amountColumnSpec, activityLineParser, activityEnrichmentSpec)
+
+    def __init__(self, path, encoding, header, amountColumnSpec, activityLineParser, activityEnrichmentSpec):
+        self._path = path
+        self._encoding = encoding
+        self._activityLineParser = activityLineParser
+        self._recordPlan = amountColumnSpec.recordPlanForHeader(header)
+        self._rowsReader = FileActivityRowsReader.withSpecs(amountColumnSpec, activityLineParser, activityEnrichmentSpec, PathFinancialActivityFileSource.ENRICHMENT_BATCH_SIZE)
+
+    def activityRowsInChunk(self, chunkStart, chunkEnd):
+        with open(self._path, 'rb') as aFile:
+            aFile.seek(chunkStart)
+            chunk = aFile.read(chunkEnd - chunkStart).decode(self._encoding)
+        lineRecords = (self._activityLineParser.parse(line) for line in io.StringIO(chunk, newline=None))
+        return list(self._rowsReader.rowsFromRecords(self._recordPlan, lineRecords))
+
+
+_workerChunkReader = None
+
+def _initializeWorker(path, encoding, header, amountColumnSpec, activityLineParser, activityEnrichmentSpec):
+    global _workerChunkReader
+    _workerChunkReader = FileChunkActivityRowsReader.fromSpecs(path, encoding, header, amountColumnSpec, activityLineParser, activityEnrichmentSpec)
+
+def _activityRowsInChunk(chunkBounds):
+    return _workerChunkReader.activityRowsInChunk(*chunkBounds)
@@ -0,0 +1,91 @@
+import hashlib
+import io
+import marshal
+import os
+import sys
+from datetime import date
+
+from src.model import PathFinancialActivityFileSource, FinancialActivity
+
+
+class ActivityParseCache():
+
+    FORMAT_VERSION = 1
+
+    @classmethod
+    def inDirectory(cls, directory):
+        os.makedirs(directory, exist_ok=True)
+        return cls(directory)
+
+    def __init__(self, directory):
+        self._directory = directory
+
+    def keyFor(self, fileContent, fingerprints):
+        contentHash = hashlib.sha256(fileContent).hexdigest()
+        formatVersions = (self.FORMAT_VERSION, marshal.version, sys.implementation.cache_tag)
+        specsHash = hashlib.sha256(repr((formatVersions, fingerprints)).encode('utf-8')).hexdigest()
+        return contentHash + '-' + specsHash[:32]
+
+    def activityRowsFor(self, key):
+        entryPath = self._entryPath(key)
+        if not os.path.exists(entryPath): return None
+        # A truncated or foreign entry is treated as a miss and rewritten by the next cold load.
+        with open(entryPath, 'rb') as anEntry:
+            try:
+                return marshal.load(anEntry)
+            except (EOFError, ValueError, TypeError):
+                return None
+
+    def storeActivityRows(self, key, activityRows):
+        entryPath = self._entryPath(key)
+        temporaryPath = entryPath + '.' + str(os.getpid()) + '.tmp'
+        with open(temporaryPath, 'wb') as anEntry:
+            marshal.dump(activityRows, anEntry)
+        os.replace(temporaryPath, entryPath)
+
+    def _entryPath(self, key):
+        return os.path.join(self._directory, key + '.activities')
+
+
+class CachedFinancialActivityFileSource(PathFinancialActivityFileSource):
+
+    @classmethod
+    def fromPath(cls, name, path, amountColumnSpec, activityLineParser, activityEnrichmentSpec, parseCache, encoding = 'utf-8'):
+        cls.assertName(name)
+        return cls(name, path, amountColumnSpec, activityLineParser, activityEnrichmentSpec, parseCache, encoding)
+
+    def __init__(self, name, path, amountColumnSpec, activityLineParser, activityEnrichmentSpec, parseCache, encoding):
+        super().__init__(name, path, amountColumnSpec, activityLineParser, activityEnrichmentSpec, encoding)
+        self._parseCache = parseCache
+
+    def activityRowsLoad(self):
+        return None
+
+    def specFingerprints(self):
+        return (self._amountColumnSpec.fingerprint(), self._activityLineParser.fingerprint(), self._activityEnrichmentSpec.fingerprint())
+
+    def _loadActivityFromFile(self):
+        with open(self._path, 'rb') as aFile:
+            fileContent = aFile.read()
+        cacheKey = self._parseCache.keyFor(fileContent, self.specFingerprints())
+        activityRows = self._parseCache.activityRowsFor(cacheKey)
+        if activityRows is None:
+            activities = list(self._activitiesFromLines(io.StringIO(fileContent.decode(self._encoding), newline=None)))
+            self._parseCache.storeActivityRows(cacheKey, [self._rowFromActivity(anActivity) for anActivity in activities])
+        else:
+            activities = self._activitiesFromCachedRows(activityRows)
+        self._loadedExpenses = [anActivity for anActivity in activities if anActivity.isExpense()]
+        self._loadedIncomes = [anActivity for anActivity in activities if not anActivity.isExpense()]
+
+    def _rowFromActivity(self, anActivity):
+        return (anActivity.isExpense(), anActivity.description(), anActivity.rawDescription(), anActivity.category(), anActivity.totalInCents(), anActivity.date().toordinal())
+
+    def _activitiesFromCachedRows(self, activityRows):
+        datesByOrdinal = {}
+        activityRowsInCents = []
+        for isExpense, description, rawDescription, category, cents, dateOrdinal in activityRows:
+            activityDate = datesByOrdinal.get(dateOrdinal)
+            if activityDate is None: activityDate = datesByOrdinal.setdefault(dateOrdinal, date.fromordinal(dateOrdinal))
+            activityType = FinancialActivity.EXPENSE_TYPE if isExpense else FinancialActivity.INCOME_TYPE
+            activityRowsInCents.append((activityType, description, rawDescription, category, cents, activityDate))
+        return FinancialActivity.fromActivityRowsInCents(activityRowsInCents, self)
@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+
+from src.model import PathFinancialActivityFileSource
+
+
+class TailingFinancialActivityFileSource(PathFinancialActivityFileSource):
+
+    @classmethod
+    def fromPath(cls, name, path, amountColumnSpec, activityLineParser, activityEnrichmentSpec, checkpoint = None, encoding = 'utf-8'):
+        cls.assertName(name)
+        fileCheckpoint = checkpoint if checkpoint else FileIngestionCheckpoint.atStart()
+        return cls(name, path, amountColumnSpec, activityLineParser, activityEnrichmentSpec, fileCheckpoint, encoding)
+
+    def __init__(self, name, path, amountColumnSpec, activityLineParser, activityEnrichmentSpec, checkpoint, encoding):
+        super().__init__(name, path, amountColumnSpec, activityLineParser, activityEnrichmentSpec, encoding)
+        self._checkpoint = checkpoint
+
+    def checkpoint(self):
+        return self._checkpoint
+
+    def activityRowsLoad(self):
+        return None
+
+    def refresh(self):
+        fileSignature = self._fileSignature()
+        with open(self._path, 'rb') as aFile:
+            fileStatus = os.fstat(aFile.fileno())
+            fileIdentity = [fileStatus.st_dev, fileStatus.st_ino]
+            if not self._checkpoint.canResume(aFile, fileIdentity, fileStatus.st_size): self._restartFromFileStart()
+            aFile.seek(self._checkpoint.offset())
+            self._ingestCompleteLines(aFile, fileIdentity)
+        self._isLoaded = True
+        self._loadedFileSignature = fileSignature
+        self._version = self._version + 1
+
+    def _loadActivityIfNeeded(self):
+        if self._isLoaded and not self._fileChangedSinceLoad(): return
+        self.refresh()
+
+    def _restartFromFileStart(self):
+        self._checkpoint = FileIngestionCheckpoint.atStart()
+        self._loadedExpenses = []
+        self._loadedIncomes = []
+
+    def _ingestCompleteLines(self, aFile, fileIdentity):
+        # A line without its newline may still be being written, so it is left for the next refresh.
+        offset = self._checkpoint.offset()
+        lastLineStart = self._checkpoint.lastLineStart()
+        header = self._checkpoint.header()
+        lineRecords = []
+        for line in aFile:
+            if not line.endswith(b'\n'): break
+            lastLineStart = offset
+            offset = offset + len(line)
+            decodedLine = line.decode(self._encoding)
+            if not header:
+                header = self._activityLineParser.parse(decodedLine)
+                continue
+            lineRecords.append(self._activityLineParser.parse(decodedLine))
+        recordPlan = self._amountColumnSpec.recordPlanForHeader(header) if header else None
+        for activity in self._activitiesFromRecordsInBatches(recordPlan, lineRecords):
+            if activity.isExpense():
+                self._loadedExpenses.append(activity)
+            else:
+                self._loadedIncomes.append(activity)
+        consumedDigest = FileIngestionCheckpoint.consumedDigestIn(aFile, lastLineStart, offset)
+        self._checkpoint = FileIngestionCheckpoint.withFileIdentityOffsetHeaderAndDigest(fileIdentity, offset, header, lastLineStart, consumedDigest)
+
+
+class FileIngestionCheckpoint():
+
+    @classmethod
+    def atStart(cls):
+        return cls.withFileIdentityOffsetHeaderAndDigest(None, 0, None, 0, None)
+
+    @classmethod
+    def withFileIdentityOffsetHeaderAndDigest(cls, fileIdentity, offset, header, lastLineStart, consumedDigest):
+        return cls(fileIdentity, offset, header, lastLineStart, consumedDigest)
+
+    @classmethod
+    def fromDictionary(cls, aDictionary):
+        return cls.withFileIdentityOffsetHeaderAndDigest(aDictionary['fileIdentity'], aDictionary['offset'], aDictionary['header'],
+                                                         aDictionary.get('lastLineStart', 0), aDictionary.get('consumedDigest'))
+
+    @classmethod
+    def loadFrom(cls, aFile):
+        return cls.fromDictionary(json.load(aFile))
+
+    @classmethod
+    def consumedDigestIn(cls, aFile, lastLineStart, offset):
+        # The header and the last consumed line tell a grown file from one rewritten in place.
+        if offset == 0: return None
+        aFile.seek(0)
+        headerLine = aFile.readline()
+        aFile.seek(lastLineStart)
+        lastLine = aFile.read(offset - lastLineStart)
+        return hashlib.sha256(headerLine + b'\n' + lastLine).hexdigest()
+
+    def __init__(self, fileIdentity, offset, header, lastLineStart, consumedDigest):
+        self._fileIdentity = fileIdentity
+        self._offset = offset
+        self._header = header
+        self._lastLineStart = lastLineStart
+        self._consumedDigest = consumedDigest
+
+    def fileIdentity(self):
+        return self._fileIdentity
+
+    def offset(self):
+        return self._offset
+
+    def header(self):
+        return self._header
+
+    def lastLineStart(self):
+        return self._lastLineStart
+
+    def consumedDigest(self):
+        return self._consumedDigest
+
+    def canResume(self, aFile, fileIdentity, fileSize):
+        if self._offset == 0: return True
+        if self._fileIdentity != fileIdentity or self._offset > fileSize: return False
+        return self.consumedDigestIn(aFile, self._lastLineStart, self._offset) == self._consumedDigest
+
+    def asDictionary(self):
+        return {'fileIdentity': self._fileIdentity, 'offset': self._offset, 'header': self._header,
+                'lastLineStart': self._lastLineStart, 'consumedDigest': self._consumedDigest}
+
+    def saveInto(self, aFile):
+        json.dump(self.asDictionary(), aFile)
@@ -1,9 +1,10 @@
 from unittest import TestCase
+from datetime import date
 
-from src.model import FinancialActivityStatement, Dollars, FinancialActivity
-from src.model_activityAggregation import ActivityBucketedAggregation, ActivityBucketDefinition
-from src.model_activityEnrichment import ActivityAggregationDefinition, ActivityPluggableCondition
-from test.testSupport import LoadedActivitySource
+from src.model import FinancialActivityStatement, Dollars, FinancialActivity, FinancialActivityFileSource
+from src.model_activityAggregation import ActivityBucketedAggregation, ActivityBucketDefinition, ActivityPeriodicBucketedAggregation, ActivityTimePeriod
+from src.model_activityEnrichment import ActivityAggregationDefinition, ActivityPluggableCondition, ActivityBatchPluggableCondition
+from test.testSupport import LoadedActivitySource, TemporaryExportFile
 
 
 class ActivityBucketedAggregationTest(TestCase):
@@ -205,11 +206,107 @@ class ActivityBucketedAggregationTest(TestCase):
         self.assertBucketTotalIsZeroDollars(activityAggregation,'Lifestyle')
         self.assertBucketTotal(activityAggregation,'NoBucket', oneHundredDollars)
     
+    def testBatchConditionIsAskedOnceForAllActivitiesNotMatchedByEarlierDefinitions(self):
+        aSource = LoadedActivitySource()
+        aSource.addExpenseWithCategoryAndDollarsAmount('Jazz', 35)
+        aSource.addExpenseWithCategoryAndDollarsAmount('Coffee', 5)
+        aSource.addExpenseWithCategoryAndDollarsAmount('Movies', 15)
+        statement = self.statementWithSource(aSource)
+        receivedBatches = []
+        def isCoffee(activities):
+            receivedBatches.append([anActivity.category() for anActivity in activities])
+            return [anActivity.category() == 'Coffee' for anActivity in activities]
+        jazzBucketDefinition = ActivityBucketDefinition.withBucketNameAndActivityCategories('Music', ['Jazz'])
+        coffeeBucketDefinition = ActivityAggregationDefinition.withNameAndCondition('Lifestyle', ActivityBatchPluggableCondition.usingActivitiesBatchCode(isCoffee))
+        aggregationSpec = ActivityBucketedAggregation.withDefinitions([jazzBucketDefinition, coffeeBucketDefinition])
+        activityAggregation = statement.activityAggregationBasedOnSpec(aggregationSpec)
+        self.assertEqual(receivedBatches, [['Coffee', 'Movies']])
+        self.assertBucketTotal(activityAggregation, 'Music', self.dollars(35))
+        self.assertBucketTotal(activityAggregation, 'NoBucket', self.dollars(15))
+
+    def testCategoryListedInSeveralDefinitionsGoesToTheFirstOne(self):
+        aSource = LoadedActivitySource()
+        aSource.addExpenseWithCategoryAndDollarsAmount('Coffee', 5)
+        aSource.addExpenseWithCategoryAndDollarsAmount('Jazz', 35)
+        statement = self.statementWithSource(aSource)
+        lifestyleBucketDefinition = ActivityBucketDefinition.withBucketNameAndActivityCategories('Lifestyle', ['Coffee'])
+        leisureBucketDefinition = ActivityBucketDefinition.withBucketNameAndActivityCategories('Leisure', ['Jazz', 'Coffee'])
+        aggregationSpec = ActivityBucketedAggregation.withDefinitions([lifestyleBucketDefinition, leisureBucketDefinition])
+        activityAggregation = statement.activityAggregationBasedOnSpec(aggregationSpec)
+        self.assertBucketTotal(activityAggregation, 'Lifestyle', self.dollars(5))
+        self.assertBucketTotal(activityAggregation, 'Leisure', self.dollars(35))
+
+    def testConditionDefinitionsDeclaredBeforeCategoryDefinitionsTakePriority(self):
+        expensiveCondition = ActivityPluggableCondition.usingCode(lambda anActivity: anActivity.totalInCents() > 2000)
+        expensiveBucketDefinition = ActivityAggregationDefinition.withNameAndCondition('Expensive', expensiveCondition)
+        leisureBucketDefinition = ActivityBucketDefinition.withBucketNameAndActivityCategories('Leisure', ['Jazz', 'Coffee'])
+        aggregationSpec = ActivityBucketedAggregation.withDefinitions([expensiveBucketDefinition, leisureBucketDefinition])
+        coffee = self.expenseWithCategoryAndDollarsAmount('Coffee', 5)
+        jazz = self.expenseWithCategoryAndDollarsAmount('Jazz', 35)
+        self.assertEqual(aggregationSpec.bucketDefinitionForActivity(coffee).bucket(), 'Leisure')
+        self.assertEqual(aggregationSpec.bucketDefinitionForActivity(jazz).bucket(), 'Expensive')
+        self.assertEqual([aDefinition.bucket() for aDefinition in aggregationSpec.bucketDefinitionsForActivities([coffee, jazz])], ['Leisure', 'Expensive'])
+
+    def testDefaultBucketDefinitionsAreReused(self):
+        aggregationSpec = ActivityBucketedAggregation.fromActivityCategories()
+        firstCoffee = self.expenseWithCategoryAndDollarsAmount('Coffee', 5)
+        secondCoffee = self.expenseWithCategoryAndDollarsAmount('Coffee', 3)
+        jazz = self.expenseWithCategoryAndDollarsAmount('Jazz', 35)
+        self.assertIs(aggregationSpec.bucketDefinitionForActivity(firstCoffee), aggregationSpec.bucketDefinitionForActivity(secondCoffee))
+        self.assertEqual(aggregationSpec.bucketDefinitionForActivity(jazz).bucket(), 'Jazz')
+
+    def testStreamedAggregationKeepsTotalCountMinimumAndMaximumPerBucket(self):
+        aSource = LoadedActivitySource()
+        aSource.addExpenseWithCategoryAndDollarsAmount('Jazz', 35)
+        aSource.addExpenseWithCategoryAndDollarsAmount('Movies', 15)
+        aSource.addExpenseWithCategoryAndDollarsAmount('Coffee', 5)
+        aSource.addExpenseWithCategoryAndDollarsAmount('Theatre', 50)
+        entertainmentBucketDefinition = ActivityBucketDefinition.withBucketNameAndActivityCategories('Entertainment', ['Jazz', 'Movies', 'Theatre'])
+        medicalBucketDefinition = ActivityBucketDefinition.withBucketNameAndActivityCategories('Medical', ['Pharmacy'])
+        aggregationSpec = ActivityBucketedAggregation.withDefinitions([entertainmentBucketDefinition, medicalBucketDefinition])
+        activityAggregation = aggregationSpec.streamedResultsFromActivities(anExpense for anExpense in aSource.expenses())
+        entertainment = activityAggregation['Entertainment']
+        self.assertEqual((entertainment.total(), entertainment.count()), (self.dollars(100), 3))
+        self.assertEqual((entertainment.minimum(), entertainment.maximum()), (self.dollars(15), self.dollars(50)))
+        self.assertEqual(activityAggregation['NoBucket'].count(), 1)
+        medical = activityAggregation['Medical']
+        self.assertEqual((medical.total(), medical.count(), medical.minimum(), medical.maximum()), (Dollars.zero(), 0, None, None))
+
+    def testStreamedAggregationOfAStatementMatchesTheLoadedOne(self):
+        aSource = LoadedActivitySource()
+        aSource.addExpenseWithCategoryAndDollarsAmount('Jazz', 35)
+        aSource.addExpenseWithCategoryAndDollarsAmount('Coffee', 5)
+        aSource.addIncomeWithDescriptionAndDollarsAmount('Salary', 20)
+        statement = self.statementWithSource(aSource)
+        aggregationSpec = ActivityBucketedAggregation.fromActivityCategories()
+        aggregationSpec.BUCKETING_BATCH_SIZE = 2
+        streamedAggregation = statement.streamedActivityAggregationBasedOnSpec(aggregationSpec)
+        loadedAggregation = statement.activityAggregationBasedOnSpec(aggregationSpec)
+        self.assertEqual(list(streamedAggregation.keys()), list(loadedAggregation.keys()))
+        for bucket, activityBucket in streamedAggregation.items():
+            self.assertEqual(activityBucket.total(), loadedAggregation[bucket].total())
+            self.assertEqual(activityBucket.count(), loadedAggregation[bucket].count())
+
+    def testStreamedAggregationOfAFileSourceIncludesExpensesAndIncomes(self):
+        exportFile = TemporaryExportFile.withLines(self, ['Date,Description,Debit,Credit', '09-27-2024,PurchaseA,10.00,', '09-28-2024,IncomeA,,5.00'])
+        aFile = open(exportFile.path())
+        self.addCleanup(aFile.close)
+        aSource = FinancialActivityFileSource.fromFile('TestSource', aFile, TemporaryExportFile.debitAndCreditRecordSpec(), TemporaryExportFile.lineParser(), TemporaryExportFile.emptyEnrichmentSpec())
+        statement = self.statementWithSource(aSource)
+        activityAggregation = statement.streamedActivityAggregationBasedOnSpec(ActivityBucketedAggregation.withNoDefinitions())
+        self.assertEqual(activityAggregation['NoBucket'].count(), 2)
+        self.assertBucketTotal(activityAggregation, 'NoBucket', self.dollars(15))
+
     def testActivityAggregationDefinitionCannotHaveAnEmptyName(self):
         aCondition = ActivityPluggableCondition.usingCode(lambda anActivity: False)
         with self.assertRaisesRegex(Exception, 'Category name cannot be empty'):
             ActivityAggregationDefinition.withNameAndCondition('', aCondition)
 
+    def expenseWithCategoryAndDollarsAmount(self, aCategory, dollarsAmount):
+        aSource = LoadedActivitySource()
+        aSource.addExpenseWithCategoryAndDollarsAmount(aCategory, dollarsAmount)
+        return aSource.expenses()[0]
+
     def dollars(self, aTotalAmountInDollars):
         return Dollars.withAmount(aTotalAmountInDollars)
 
@@ -237,6 +334,38 @@ class ActivityBucketedAggregationTest(TestCase):
         self.assertEqual(activityAggregation[bucket].total(), expectedTotal)
     
 
+class ActivityPeriodicBucketedAggregationTest(TestCase):
+
+    def testActivitiesAreAggregatedPerMonthAndBucketInChronologicalOrder(self):
+        aSource = LoadedActivitySource()
+        self.addExpense(aSource, 'Jazz', 35, date(2024, 6, 3))
+        self.addExpense(aSource, 'Coffee', 5, date(2024, 5, 31))
+        self.addExpense(aSource, 'Movies', 15, date(2024, 6, 20))
+        self.addExpense(aSource, 'Coffee', 3, date(2024, 5, 2))
+        statement = FinancialActivityStatement.fromSingleSource(aSource)
+        entertainmentBucketDefinition = ActivityBucketDefinition.withBucketNameAndActivityCategories('Entertainment', ['Jazz', 'Movies'])
+        bucketedAggregation = ActivityBucketedAggregation.withDefinitionsDefaultingToActivityCategory([entertainmentBucketDefinition])
+        aggregationSpec = ActivityPeriodicBucketedAggregation.withPeriodAndBucketedAggregation(ActivityTimePeriod.monthly(), bucketedAggregation)
+        for periodicAggregation in [statement.activityAggregationBasedOnSpec(aggregationSpec), statement.streamedActivityAggregationBasedOnSpec(aggregationSpec)]:
+            self.assertEqual(list(periodicAggregation.keys()), [date(2024, 5, 1), date(2024, 6, 1)])
+            may, june = periodicAggregation[date(2024, 5, 1)], periodicAggregation[date(2024, 6, 1)]
+            self.assertEqual((may['Coffee'].total(), may['Coffee'].count()), (Dollars.withAmount(8), 2))
+            self.assertEqual(may['Entertainment'].total(), Dollars.zero())
+            self.assertEqual((june['Entertainment'].total(), june['Entertainment'].maximum()), (Dollars.withAmount(50), Dollars.withAmount(35)))
+            self.assertNotIn('Coffee', june)
+
+    def testPeriodsStartOnTheFirstDayOfTheirDayWeekMonthOrYear(self):
+        aDate = date(2024, 5, 16)
+        self.assertEqual(ActivityTimePeriod.daily().periodStartForDate(aDate), aDate)
+        self.assertEqual(ActivityTimePeriod.weekly().periodStartForDate(aDate), date(2024, 5, 13))
+        self.assertEqual(ActivityTimePeriod.weekly().periodStartForDate(date(2024, 5, 13)), date(2024, 5, 13))
+        self.assertEqual(ActivityTimePeriod.monthly().periodStartForDate(aDate), date(2024, 5, 1))
+        self.assertEqual(ActivityTimePeriod.yearly().periodStartForDate(aDate), date(2024, 1, 1))
+
+    def addExpense(self, aSource, aCategory, dollarsAmount, aDate):
+        aSource.addExpense(FinancialActivity.expenseWithDescriptionAndTotal(aCategory, aCategory, aCategory, Dollars.withAmount(dollarsAmount), aSource, aDate))
+
+
 class ActivityBucketDefinitionTest(TestCase):
 
     def testBucketNameCannotBeEmpty(self):
@@ -0,0 +1,74 @@
+from unittest import TestCase
+from datetime import date
+
+from src.model import Dollars, FinancialActivityStatement, FinancialActivityStatementExporter, FinancialActivityFileSource
+from src.model import DescriptionColumnDefinition, AmountColumnDefinition, CategoryColumnDefinition, SourceNameColumnDefinition
+from src.model import RawDescriptionColumnDefinition, DateColumnDefinition, ActivityTypeColumnDefinition
+from src.model_activityAggregation import ActivityBucketedAggregation, ActivityBucketDefinition
+from src.model_columnarActivityStore import ColumnarActivityTable
+from test.testSupport import LoadedActivitySource, TestFile, TemporaryExportFile
+
+
+class ColumnarActivityTableTest(TestCase):
+
+    def testEmptyTableHasNoExpensesNorIncomes(self):
+        table = ColumnarActivityTable.named('Archive')
+        self.assertEqual(table.size(), 0)
+        self.assertEqual(table.expenses(), [])
+        self.assertEqual(table.incomes(), [])
+
+    def testRowsBehaveLikeTheActivitiesTheyWereBuiltFrom(self):
+        aSource = self.sourceWithActivities()
+        table = ColumnarActivityTable.fromSource('Archive', aSource)
+        for anActivity, aRow in zip(aSource.expenses() + aSource.incomes(), table.expenses() + table.incomes()):
+            self.assertEqual(aRow.total(), anActivity.total())
+            self.assertEqual(aRow.description(), anActivity.description())
+            self.assertEqual(aRow.rawDescription(), anActivity.rawDescription())
+            self.assertEqual(aRow.category(), anActivity.category())
+            self.assertEqual(aRow.isExpense(), anActivity.isExpense())
+            self.assertEqual(aRow.sourceName(), anActivity.sourceName())
+            self.assertEqual(aRow.date(), anActivity.date())
+
+    def testTableBuiltFromAFileSourceHoldsExpensesAndIncomes(self):
+        exportFile = TemporaryExportFile.withLines(self, ['Date,Description,Debit,Credit', '09-27-2024,PurchaseA,10.00,', '09-28-2024,IncomeA,,5.00'])
+        aFile = open(exportFile.path())
+        self.addCleanup(aFile.close)
+        aSource = FinancialActivityFileSource.fromFile('Checking', aFile, TemporaryExportFile.debitAndCreditRecordSpec(), TemporaryExportFile.lineParser(), TemporaryExportFile.emptyEnrichmentSpec())
+        table = ColumnarActivityTable.fromSource('Archive', aSource)
+        self.assertEqual(table.size(), 2)
+        self.assertEqual([anIncome.total() for anIncome in table.incomes()], [Dollars.withAmount(5)])
+
+    def testStatementTotalsAreTheSameOverTheTable(self):
+        table = ColumnarActivityTable.fromSource('Archive', self.sourceWithActivities())
+        statement = FinancialActivityStatement.fromSingleSource(table)
+        self.assertEqual(statement.totalExpenses(), Dollars.withAmount(21.49))
+        self.assertEqual(statement.totalIncome(), Dollars.withAmount(2000))
+
+    def testBucketedAggregationRunsOverTheTable(self):
+        table = ColumnarActivityTable.fromSource('Archive', self.sourceWithActivities())
+        statement = FinancialActivityStatement.fromSingleSource(table)
+        lifestyleBucketDefinition = ActivityBucketDefinition.withBucketNameAndActivityCategories('Lifestyle', ['Coffee', 'Movies'])
+        aggregationSpec = ActivityBucketedAggregation.withDefinition(lifestyleBucketDefinition)
+        activityAggregation = statement.activityAggregationBasedOnSpec(aggregationSpec)
+        self.assertEqual(activityAggregation['Lifestyle'].total(), Dollars.withAmount(21.49))
+        self.assertEqual(activityAggregation['NoBucket'].total(), Dollars.withAmount(2000))
+
+    def testExportOfTheTableMatchesTheExportOfTheOriginalActivities(self):
+        aSource = self.sourceWithActivities()
+        table = ColumnarActivityTable.fromSource('Archive', aSource)
+        columnDefinitions = [DescriptionColumnDefinition(), RawDescriptionColumnDefinition(), AmountColumnDefinition(), CategoryColumnDefinition(),
+                             ActivityTypeColumnDefinition(), SourceNameColumnDefinition(), DateColumnDefinition()]
+        exporter = FinancialActivityStatementExporter.withColumnDefinitions(columnDefinitions)
+        originalExport = TestFile()
+        exporter.exportStatementIntoFile(FinancialActivityStatement.fromSingleSource(aSource), originalExport)
+        tableExport = TestFile()
+        exporter.exportStatementIntoFile(FinancialActivityStatement.fromSingleSource(table), tableExport)
+        self.assertEqual(tableExport.readlines(), originalExport.readlines())
+
+    def sourceWithActivities(self):
+        aSource = LoadedActivitySource.withName('Checking')
+        aSource.addExpenseWithDescriptionCategoryAndDollarsAmount('CoffeeStoreABC', 'Coffee', 4.50)
+        aSource.addExpenseWithDescriptionCategoryAndDollarsAmount('MoviesApp123', 'Movies', 16.99)
+        aSource.addIncomeWithDescriptionAndDollarsAmount('Salary-Work', 2000)
+        aSource.addIncomeWithDescriptionAndDate('Refund', date(2025,1,2))
+        return aSource
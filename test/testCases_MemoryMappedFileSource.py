@@ -0,0 +1,70 @@
+from unittest import TestCase
+from datetime import date
+
+from src.model import Dollars, FinancialActivityFileLineParser, SingleAmountColumnFileRecordSpec
+from src.model_memoryMappedFileSource import MemoryMappedFinancialActivityFileSource
+from test.testSupport import TemporaryExportFile
+
+
+class MemoryMappedFinancialActivityFileSourceTest(TestCase):
+
+    def testNoActivityIsImportedFromEmptyFile(self):
+        aSource = self.sourceForContent('')
+        self.assertEqual(aSource.expenses(), [])
+        self.assertEqual(aSource.incomes(), [])
+
+    def testExpensesAndIncomesAreImportedFromFileWithDebitAndCreditColumns(self):
+        aSource = self.sourceForContent(
+            'Date,Description,Debit,Credit\n'
+            '09-30-2024,IncomeA,,2.00\n'
+            '09-27-2024,PurchaseA,3.00,\n')
+        self.assertActivities(aSource.expenses(), [('PurchaseA', 3, date(2024,9,27))])
+        self.assertActivities(aSource.incomes(), [('IncomeA', 2, date(2024,9,30))])
+
+    def testLastLineWithoutTrailingNewLineAndWindowsLineEndingsAreImported(self):
+        aSource = self.sourceForContent(
+            'Date,Description,Debit,Credit\r\n'
+            '09-27-2024,PurchaseA,3.00,\r\n'
+            '09-28-2024,PurchaseB,4.00,')
+        self.assertActivities(aSource.expenses(), [('PurchaseA', 3, date(2024,9,27)), ('PurchaseB', 4, date(2024,9,28))])
+
+    def testColumnsNotUsedByTheRecordSpecAreNotDecoded(self):
+        aSource = self.sourceForContent(
+            b'Date,Description,Debit,Credit,Notes\n'
+            b'09-27-2024,PurchaseA,3.00,,\xff\xfe\n')
+        self.assertActivities(aSource.expenses(), [('PurchaseA', 3, date(2024,9,27))])
+
+    def testLinesWithBoundedValuesAreParsedWithTheLineParser(self):
+        parser = FinancialActivityFileLineParser.commaSeparatedValues(boundingCharacter='"')
+        aSource = self.sourceForContent(
+            'Date,Description,Debit,Credit\n'
+            '09-27-2024,"Store, NY",3.00,\n'
+            '09-28-2024,PurchaseB,4.00,\n', parser = parser)
+        self.assertActivities(aSource.expenses(), [('Store, NY', 3, date(2024,9,27)), ('PurchaseB', 4, date(2024,9,28))])
+
+    def testNonAsciiDescriptionsAreDecodedAsUtf8ByDefault(self):
+        amountSpec = SingleAmountColumnFileRecordSpec.forSpecificColumn(amountColumn = 'Amount')
+        aSource = self.sourceForContent(
+            'Date,Description,Amount\n'
+            '09-27-2024,Café Ñandú,-7.50\n', amountSpec = amountSpec)
+        self.assertActivities(aSource.incomes(), [('Café Ñandú', 7.50, date(2024,9,27))])
+
+    def testActivitiesAreStreamedWithoutLoadingTheWholeFile(self):
+        aSource = self.sourceForContent(
+            'Date,Description,Debit,Credit\n'
+            '09-27-2024,PurchaseA,3.00,\n'
+            'this line is never parsed\n')
+        activities = aSource.iterActivities()
+        self.assertEqual(next(activities).description(), 'PurchaseA')
+        activities.close()
+
+    def sourceForContent(self, content, parser = None, amountSpec = None):
+        exportFile = TemporaryExportFile.withContent(self, content)
+        lineParser = parser if parser else TemporaryExportFile.lineParser()
+        spec = TemporaryExportFile.recordSpecWithAmountSpec(amountSpec) if amountSpec else TemporaryExportFile.debitAndCreditRecordSpec()
+        return MemoryMappedFinancialActivityFileSource.fromPath('TestSource', exportFile.path(), spec, lineParser, TemporaryExportFile.emptyEnrichmentSpec())
+
+    def assertActivities(self, activities, expectedActivities):
+        actualActivities = [(anActivity.description(), anActivity.total(), anActivity.date()) for anActivity in activities]
+        expected = [(aDescription, Dollars.withAmount(anAmount), aDate) for aDescription, anAmount, aDate in expectedActivities]
+        self.assertEqual(actualActivities, expected)
@@ -0,0 +1,73 @@
+import os
+from unittest import TestCase
+from datetime import date
+
+from src.model import Dollars, FileActivityRowsReader
+from src.model_activityEnrichment import ActivityEnrichmentSpecBuilder
+from src.model_parallelFileSource import ParallelFinancialActivityFileSource, FileChunkActivityRowsReader
+from test.testSupport import TemporaryExportFile
+
+
+def isCoffeePurchase(aRawRecord):
+    return aRawRecord.description().startswith('Coffee')
+
+
+class ParallelFinancialActivityFileSourceTest(TestCase):
+
+    def testNoActivityIsImportedFromEmptyFile(self):
+        aSource = self.sourceForLines([])
+        self.assertEqual(aSource.expenses(), [])
+        self.assertEqual(aSource.incomes(), [])
+
+    def testActivitiesFromAllChunksAreMergedInFileOrder(self):
+        lines = ['Date,Description,Debit,Credit']
+        lines = lines + ['09-{0:02d}-2024,Purchase{0},{0}.00,'.format(day) for day in range(1, 21)]
+        lines = lines + ['10-{0:02d}-2024,Income{0},,{0}.50'.format(day) for day in range(1, 11)]
+        aSource = self.sourceForLines(lines, chunkSize = 64)
+        expenses = aSource.expenses()
+        incomes = aSource.incomes()
+        self.assertEqual([anExpense.description() for anExpense in expenses], ['Purchase' + str(day) for day in range(1, 21)])
+        self.assertEqual([anIncome.total() for anIncome in incomes], [Dollars.withAmount(day + 0.5) for day in range(1, 11)])
+        self.assertEqual(incomes[0].date(), date(2024,10,1))
+        self.assertEqual(incomes[0].sourceName(), 'TestSource')
+
+    def testActivitiesAreEnrichedInWorkerProcesses(self):
+        lines = ['Date,Description,Debit,Credit',
+                 '09-27-2024,CoffeeShop 123,3.00,',
+                 '09-28-2024,Market,4.00,']
+        specBuilder = ActivityEnrichmentSpecBuilder()
+        specBuilder.addDefintionSpecForCodeBasedCondition('Coffee', 'Coffee Shop', isCoffeePurchase)
+        aSource = self.sourceForLines(lines, activityEnrichmentSpec = specBuilder.fullSpec(), chunkSize = 1)
+        expenses = aSource.expenses()
+        self.assertEqual([(anExpense.description(), anExpense.category()) for anExpense in expenses], [('Coffee Shop', 'Coffee'), ('Market', 'Unclassified')])
+        self.assertEqual(expenses[0].rawDescription(), 'CoffeeShop 123')
+
+    def testLinesAreSplitOnlyOnNewlinesLikeTheSequentialSource(self):
+        lines = ['Date,Description,Debit,Credit',
+                 '09-27-2024,Caf\u00e9 Line\u0085Separator,3.00,',
+                 '09-28-2024,Form\x0cFeed,4.00,']
+        aSource = self.sourceForLines(lines, chunkSize = 1)
+        self.assertEqual([anExpense.description() for anExpense in aSource.expenses()], ['Caf\u00e9 Line\u0085Separator', 'Form\x0cFeed'])
+
+    def testChunkRowsAreTheRowsTheSequentialLoaderReads(self):
+        lines = ['Date,Description,Debit,Credit', '09-27-2024,PurchaseA,3.00,', '09-28-2024,IncomeA,,2.00']
+        exportFile = TemporaryExportFile.withLines(self, lines)
+        header = TemporaryExportFile.lineParser().parse(lines[0])
+        chunkReader = FileChunkActivityRowsReader.fromSpecs(exportFile.path(), 'utf-8', header, TemporaryExportFile.debitAndCreditRecordSpec(),
+                                                            TemporaryExportFile.lineParser(), TemporaryExportFile.emptyEnrichmentSpec())
+        rowsReader = FileActivityRowsReader.withSpecs(TemporaryExportFile.debitAndCreditRecordSpec(), TemporaryExportFile.lineParser(), TemporaryExportFile.emptyEnrichmentSpec(), 1024)
+        chunkStart = len(lines[0]) + 1
+        chunkRows = chunkReader.activityRowsInChunk(chunkStart, os.path.getsize(exportFile.path()))
+        self.assertEqual(chunkRows, list(rowsReader.rowsFromLines(iter(aLine + '\n' for aLine in lines))))
+        self.assertEqual(chunkRows[0], ('Expense', 'PurchaseA', 'PurchaseA', 'Unclassified', 300, date(2024,9,27)))
+
+    def testSpecsWithPluggableConditionsThatCannotBePickledAreRejected(self):
+        specBuilder = ActivityEnrichmentSpecBuilder()
+        specBuilder.addDefintionSpecForCodeBasedCondition('Coffee', 'Coffee Shop', lambda aRawRecord: True)
+        with self.assertRaisesRegex(Exception, 'Specs cannot be sent to worker processes, pluggable conditions must be module level functions'):
+            self.sourceForLines([], activityEnrichmentSpec = specBuilder.fullSpec())
+
+    def sourceForLines(self, lines, activityEnrichmentSpec = None, chunkSize = None):
+        exportFile = TemporaryExportFile.withLines(self, lines)
+        enrichmentSpec = activityEnrichmentSpec if activityEnrichmentSpec else TemporaryExportFile.emptyEnrichmentSpec()
+        return ParallelFinancialActivityFileSource.fromPath('TestSource', exportFile.path(), TemporaryExportFile.debitAndCreditRecordSpec(), TemporaryExportFile.lineParser(), enrichmentSpec, workers = 2, chunkSize = chunkSize)
@@ -0,0 +1,142 @@
+import os
+import shutil
+import tempfile
+from functools import partial
+from unittest import TestCase
+from datetime import date
+
+from src.model import Dollars, FinancialActivityFileLineParser
+from src.model_activityEnrichment import ActivityEnrichmentSpecBuilder, ActivityPluggableCondition
+from src.model_parseCache import ActivityParseCache, CachedFinancialActivityFileSource
+from test.testSupport import TemporaryExportFile
+
+
+COFFEE_PREFIXES = ['Coffee']
+
+def startsWithCoffeePrefix(aRecord):
+    return any(aRecord.description().startswith(aPrefix) for aPrefix in COFFEE_PREFIXES)
+
+def isCoffeeOrTeaPurchase(aRecord):
+    return startsWithCoffeePrefix(aRecord) or aRecord.description().startswith('Tea')
+
+
+def descriptionStartsWith(aPrefix, aRecord):
+    return aRecord.description().startswith(aPrefix)
+
+
+class DescriptionPrefixCondition():
+
+    def __init__(self, prefix):
+        self._prefix = prefix
+
+    def __call__(self, aRecord):
+        return aRecord.description().startswith(self._prefix)
+
+
+class FailingLineParser(FinancialActivityFileLineParser):
+
+    def parse(self, line):
+        raise Exception('Line parser should not be used on a warm cache')
+
+    def fingerprint(self):
+        return FinancialActivityFileLineParser.commaSeparatedValues().fingerprint()
+
+
+class CachedFinancialActivityFileSourceTest(TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self._directory)
+        self._cache = ActivityParseCache.inDirectory(os.path.join(self._directory, 'cache'))
+        self._exportFile = TemporaryExportFile.withLines(self, ['Date,Description,Debit,Credit', '09-27-2024,CoffeeShop 12,3.00,', '09-28-2024,Payroll,,2000.00'])
+
+    def testWarmLoadRestoresActivitiesWithoutParsing(self):
+        coldSource = self.sourceWithSpecs(self.coffeeEnrichmentSpec())
+        coldExpenses = coldSource.expenses()
+        warmSource = self.sourceWithSpecs(self.coffeeEnrichmentSpec(), parser = FailingLineParser.commaSeparatedValues())
+        warmExpenses = warmSource.expenses()
+        self.assertEqual(self.activityValues(warmExpenses), self.activityValues(coldExpenses))
+        self.assertEqual(self.activityValues(warmSource.incomes()), [(False, 'Payroll', 'Payroll', 'Unclassified', Dollars.withAmount(2000), date(2024,9,28), 'TestSource')])
+        self.assertEqual(warmExpenses[0].category(), 'Coffee')
+
+    def testChangingTheEnrichmentSpecInvalidatesTheCachedEntry(self):
+        self.sourceWithSpecs(self.coffeeEnrichmentSpec()).expenses()
+        specBuilder = ActivityEnrichmentSpecBuilder()
+        specBuilder.addDefintionSpecForDescriptionIncludingString('Cafe', 'Coffee Shop', 'CoffeeShop')
+        expenses = self.sourceWithSpecs(specBuilder.fullSpec()).expenses()
+        self.assertEqual(expenses[0].category(), 'Cafe')
+
+    def testChangingTheFileContentInvalidatesTheCachedEntry(self):
+        self.sourceWithSpecs(self.coffeeEnrichmentSpec()).expenses()
+        self._exportFile.writeLines(['Date,Description,Debit,Credit', '09-27-2024,CoffeeShop 12,7.00,'])
+        expenses = self.sourceWithSpecs(self.coffeeEnrichmentSpec()).expenses()
+        self.assertEqual(expenses[0].total(), Dollars.withAmount(7))
+
+    def testColdLoadSplitsLinesOnlyOnNewlinesLikeTheUncachedSource(self):
+        self._exportFile.writeLines(['Date,Description,Debit,Credit', '09-27-2024,Caf\u00e9 Line\u0085Separator,3.00,', '09-28-2024,Form\x0cFeed,4.00,'])
+        expenses = self.sourceWithSpecs(self.coffeeEnrichmentSpec()).expenses()
+        self.assertEqual([anExpense.description() for anExpense in expenses], ['Caf\u00e9 Line\u0085Separator', 'Form\x0cFeed'])
+
+    def testCorruptCachedEntryIsTreatedAsAMissAndRewritten(self):
+        coldExpenses = self.sourceWithSpecs(self.coffeeEnrichmentSpec()).expenses()
+        cacheDirectory = os.path.join(self._directory, 'cache')
+        for anEntryName in os.listdir(cacheDirectory):
+            with open(os.path.join(cacheDirectory, anEntryName), 'r+b') as anEntry:
+                anEntry.truncate(5)
+        reloadedExpenses = self.sourceWithSpecs(self.coffeeEnrichmentSpec()).expenses()
+        warmExpenses = self.sourceWithSpecs(self.coffeeEnrichmentSpec(), parser = FailingLineParser.commaSeparatedValues()).expenses()
+        self.assertEqual(self.activityValues(reloadedExpenses), self.activityValues(coldExpenses))
+        self.assertEqual(self.activityValues(warmExpenses), self.activityValues(coldExpenses))
+
+    def testPluggableConditionsWithDifferentCodeHaveDifferentFingerprints(self):
+        aCondition = ActivityPluggableCondition.usingCode(lambda aRecord: aRecord.description().startswith('Coffee'))
+        sameCondition = ActivityPluggableCondition.usingCode(lambda aRecord: aRecord.description().startswith('Coffee'))
+        anotherCondition = ActivityPluggableCondition.usingCode(lambda aRecord: aRecord.description().startswith('Tea'))
+        self.assertEqual(aCondition.fingerprint()[1][2], sameCondition.fingerprint()[1][2])
+        self.assertNotEqual(aCondition.fingerprint(), anotherCondition.fingerprint())
+
+    def testPluggableConditionFingerprintFollowsTheModuleGlobalsItReads(self):
+        aCondition = ActivityPluggableCondition.usingCode(startsWithCoffeePrefix)
+        callingCondition = ActivityPluggableCondition.usingCode(isCoffeeOrTeaPurchase)
+        fingerprint = aCondition.fingerprint()
+        callingFingerprint = callingCondition.fingerprint()
+        self.assertEqual(aCondition.fingerprint(), fingerprint)
+        COFFEE_PREFIXES.append('Espresso')
+        self.addCleanup(COFFEE_PREFIXES.remove, 'Espresso')
+        self.assertNotEqual(aCondition.fingerprint(), fingerprint)
+        self.assertNotEqual(callingCondition.fingerprint(), callingFingerprint)
+
+    def testPluggableConditionFingerprintIncludesDefaultArgumentValues(self):
+        conditions = [ActivityPluggableCondition.usingCode(lambda aRecord, aWord=word: aWord in aRecord.description()) for word in ['Coffee', 'Tea']]
+        keywordConditions = [ActivityPluggableCondition.usingCode(lambda aRecord, *, aWord=word: aWord in aRecord.description()) for word in ['Coffee', 'Tea']]
+        self.assertNotEqual(conditions[0].fingerprint(), conditions[1].fingerprint())
+        self.assertNotEqual(keywordConditions[0].fingerprint(), keywordConditions[1].fingerprint())
+
+    def testPluggableConditionFingerprintIncludesPartialAndCallableObjectState(self):
+        self.assertEqual(ActivityPluggableCondition.usingCode(partial(descriptionStartsWith, 'Coffee')).fingerprint(),
+                         ActivityPluggableCondition.usingCode(partial(descriptionStartsWith, 'Coffee')).fingerprint())
+        self.assertNotEqual(ActivityPluggableCondition.usingCode(partial(descriptionStartsWith, 'Coffee')).fingerprint(),
+                            ActivityPluggableCondition.usingCode(partial(descriptionStartsWith, 'Tea')).fingerprint())
+        self.assertEqual(ActivityPluggableCondition.usingCode(DescriptionPrefixCondition('Coffee')).fingerprint(),
+                         ActivityPluggableCondition.usingCode(DescriptionPrefixCondition('Coffee')).fingerprint())
+        self.assertNotEqual(ActivityPluggableCondition.usingCode(DescriptionPrefixCondition('Coffee')).fingerprint(),
+                            ActivityPluggableCondition.usingCode(DescriptionPrefixCondition('Tea')).fingerprint())
+
+    def testRulesBoundToDifferentDefaultValuesDoNotShareCachedEntries(self):
+        for word, expectedCategory in [('Coffee', 'Rule'), ('Tea', 'Unclassified')]:
+            specBuilder = ActivityEnrichmentSpecBuilder()
+            specBuilder.addDefintionSpecForCodeBasedCondition('Rule', 'Rule', lambda aRecord, aWord=word: aWord in aRecord.description())
+            self.assertEqual(self.sourceWithSpecs(specBuilder.fullSpec()).expenses()[0].category(), expectedCategory)
+
+    def coffeeEnrichmentSpec(self):
+        specBuilder = ActivityEnrichmentSpecBuilder()
+        specBuilder.addDefintionSpecForDescriptionIncludingString('Coffee', 'Coffee Shop', 'CoffeeShop')
+        return specBuilder.fullSpec()
+
+    def sourceWithSpecs(self, activityEnrichmentSpec, parser = None):
+        lineParser = parser if parser else TemporaryExportFile.lineParser()
+        return CachedFinancialActivityFileSource.fromPath('TestSource', self._exportFile.path(), TemporaryExportFile.debitAndCreditRecordSpec(), lineParser, activityEnrichmentSpec, self._cache)
+
+    def activityValues(self, activities):
+        return [(anActivity.isExpense(), anActivity.description(), anActivity.rawDescription(), anActivity.category(), anActivity.total(), anActivity.date(), anActivity.sourceName())
+                for anActivity in activities]
@@ -0,0 +1,96 @@
+import io
+import os
+from unittest import TestCase
+
+from src.model import Dollars
+from src.model_tailingFileSource import TailingFinancialActivityFileSource, FileIngestionCheckpoint
+from test.testSupport import TemporaryExportFile
+
+
+class TailingFinancialActivityFileSourceTest(TestCase):
+
+    def setUp(self):
+        self._exportFile = TemporaryExportFile.withContent(self, '')
+
+    def testActivitiesAreLoadedFromTheWholeFileTheFirstTime(self):
+        self._exportFile.appendLines(['Date,Description,Debit,Credit', '09-27-2024,PurchaseA,3.00,', '09-28-2024,IncomeA,,2.00'])
+        aSource = self.sourceFromPath()
+        self.assertTotals(aSource.expenses(), [3])
+        self.assertTotals(aSource.incomes(), [2])
+
+    def testOnlyAppendedLinesAreIngestedOnRefresh(self):
+        self._exportFile.appendLines(['Date,Description,Debit,Credit', '09-27-2024,PurchaseA,3.00,'])
+        aSource = self.sourceFromPath()
+        firstExpense = aSource.expenses()[0]
+        self._exportFile.appendLines(['09-28-2024,PurchaseB,4.00,', '09-29-2024,IncomeA,,1.00'])
+        aSource.refresh()
+        self.assertIs(aSource.expenses()[0], firstExpense)
+        self.assertTotals(aSource.expenses(), [3, 4])
+        self.assertTotals(aSource.incomes(), [1])
+
+    def testIngestedActivitiesAreKeptWhileTheFileIsMissing(self):
+        self._exportFile.appendLines(['Date,Description,Debit,Credit', '09-27-2024,PurchaseA,3.00,'])
+        aSource = self.sourceFromPath()
+        aSource.expenses()
+        os.remove(self._exportFile.path())
+        self.assertTotals(aSource.expenses(), [3])
+
+    def testAppendedLinesAreIngestedWhenTheFileChangesBetweenQueries(self):
+        self._exportFile.appendLines(['Date,Description,Debit,Credit', '09-27-2024,PurchaseA,3.00,'])
+        aSource = self.sourceFromPath()
+        aSource.expenses()
+        self._exportFile.appendLines(['09-28-2024,PurchaseB,4.00,'])
+        self.assertTotals(aSource.expenses(), [3, 4])
+
+    def testLineWithoutNewLineIsLeftUntilItIsComplete(self):
+        self._exportFile.appendLines(['Date,Description,Debit,Credit', '09-27-2024,PurchaseA,3.00,'])
+        self._exportFile.appendText('09-28-2024,Purch')
+        aSource = self.sourceFromPath()
+        self.assertTotals(aSource.expenses(), [3])
+        self._exportFile.appendText('aseB,4.00,\n')
+        aSource.refresh()
+        self.assertTotals(aSource.expenses(), [3, 4])
+
+    def testPersistedCheckpointResumesWithoutReingestingConsumedLines(self):
+        self._exportFile.appendLines(['Date,Description,Debit,Credit', '09-27-2024,PurchaseA,3.00,'])
+        aSource = self.sourceFromPath()
+        aSource.expenses()
+        persistedCheckpoint = io.StringIO()
+        aSource.checkpoint().saveInto(persistedCheckpoint)
+        self._exportFile.appendLines(['09-28-2024,PurchaseB,4.00,'])
+        persistedCheckpoint.seek(0)
+        restartedSource = self.sourceFromPath(FileIngestionCheckpoint.loadFrom(persistedCheckpoint))
+        self.assertTotals(restartedSource.expenses(), [4])
+        self.assertEqual(restartedSource.checkpoint().offset(), os.path.getsize(self._exportFile.path()))
+
+    def testReplacedFileIsIngestedFromTheStart(self):
+        self._exportFile.appendLines(['Date,Description,Debit,Credit', '09-27-2024,PurchaseA,3.00,', '09-28-2024,PurchaseB,4.00,'])
+        aSource = self.sourceFromPath()
+        aSource.expenses()
+        self._exportFile.replaceWithLines(['Date,Description,Debit,Credit', '09-30-2024,PurchaseC,9.00,'])
+        self.assertTotals(aSource.expenses(), [9])
+
+    def testFileRewrittenInPlaceIsIngestedFromTheStart(self):
+        self._exportFile.appendLines(['Date,Description,Debit,Credit', '09-27-2024,A,3.00,'])
+        aSource = self.sourceFromPath()
+        aSource.expenses()
+        self._exportFile.writeLines(['Date,Description,Debit,Credit', '09-28-2024,Z,1.00,', '09-29-2024,Y,2.00,', '09-30-2024,X,4.00,'])
+        self.assertEqual([anExpense.description() for anExpense in aSource.expenses()], ['Z', 'Y', 'X'])
+
+    def testPersistedCheckpointOfAFileRewrittenInPlaceIsNotResumed(self):
+        self._exportFile.appendLines(['Date,Description,Debit,Credit', '09-27-2024,A,3.00,'])
+        aSource = self.sourceFromPath()
+        aSource.expenses()
+        persistedCheckpoint = io.StringIO()
+        aSource.checkpoint().saveInto(persistedCheckpoint)
+        self._exportFile.writeLines(['Date,Description,Debit,Credit', '09-28-2024,Z,1.00,', '09-29-2024,Y,2.00,'])
+        persistedCheckpoint.seek(0)
+        restartedSource = self.sourceFromPath(FileIngestionCheckpoint.loadFrom(persistedCheckpoint))
+        self.assertEqual([anExpense.description() for anExpense in restartedSource.expenses()], ['Z', 'Y'])
+
+    def sourceFromPath(self, checkpoint = None):
+        return TailingFinancialActivityFileSource.fromPath('TestSource', self._exportFile.path(), TemporaryExportFile.debitAndCreditRecordSpec(),
+                                                           TemporaryExportFile.lineParser(), TemporaryExportFile.emptyEnrichmentSpec(), checkpoint)
+
+    def assertTotals(self, activities, expectedDollarAmounts):
+        self.assertEqual([anActivity.total() for anActivity in activities], [Dollars.withAmount(anAmount) for anAmount in expectedDollarAmounts])
@@ -1,15 +1,23 @@
+import io
+import os
+import tempfile
 from unittest import TestCase
 from datetime import date
 
 from src.model import Dollars, FinancialActivityStatement, FinancialActivity, FinancialActivityFileSource
 from src.model import FinancialActivityFileLineParser, SingleAmountColumnFileRecordSpec, TwoAmountColumnsFileRecordSpec
-from src.model_activityEnrichment import ActivityEnrichmentSpecBuilder
+from src.model_activityEnrichment import ActivityEnrichmentSpecBuilder, ActivityEnrichmentSpec, AhoCorasickAutomaton
+from src.model_activityEnrichment import ActivityAggregationCompositeCondition, ActivityAggregationConjunctionCondition, ActivityAggregationNegatedCondition
+from src.model_activityEnrichment import ActivityDescriptionIncludesStringCondition, ActivityPluggableCondition, AdaptivelyOrderedConditions
+from src.model_activityEnrichment import ActivityDescriptionMatchesPatternCondition, DescriptionPatternsAlternation
 from src.model import FinancialActivityStatementExporter, DescriptionColumnDefinition, AmountColumnDefinition
 from src.model import ActivityTypeColumnDefinition, CurrencyColumnDefinition, CategoryColumnDefinition, SourceNameColumnDefinition
 from src.model import RawDescriptionColumnDefinition, DateColumnDefinition
-from src.model import CompositeFinancialActivitiesSource
+from src.model import CompositeFinancialActivitiesSource, CombinedActivitiesView
+from src.model_memoryMappedFileSource import MemoryMappedFinancialActivityFileSource
 from src.model import DateFileRecordSpec, FileRecordSpec
-from test.testSupport import LoadedActivitySource, TestFile
+from src.model import CharacterScanningLineTokenizer, DecimalAmountParser
+from test.testSupport import LoadedActivitySource, TestFile, TemporaryExportFile
 
 
 class FinancialActivityStatementTest(TestCase):
@@ -68,6 +76,33 @@ class FinancialActivityStatementTest(TestCase):
         statementIncomes = statement.incomes()
         self.assertListEqual(statementIncomes, aSource.incomes())
 
+    def testTotalsAndActivitiesAreReusedWhileTheSourceDoesNotChange(self):
+        aSource = self.sourceWithExpensesFromAmounts([self.dollars(10), self.dollars(2)])
+        statement = FinancialActivityStatement.fromSingleSource(aSource)
+        allActivities = statement.allActivities()
+        self.assertIs(statement.allActivities(), allActivities)
+        self.assertIs(statement.totalExpenses(), statement.totalExpenses())
+        self.assertIsInstance(allActivities, tuple)
+
+    def testTotalsAndActivitiesAreRecomputedWhenTheSourceChanges(self):
+        aSource = self.sourceWithExpensesFromAmounts([self.dollars(10)])
+        statement = FinancialActivityStatement.fromSingleSource(aSource)
+        self.assertEqual(statement.totalExpenses(), self.dollars(10))
+        self.assertEqual(len(statement.allActivities()), 1)
+        aSource.addExpenseWithAmount(self.dollars(5))
+        aSource.addIncomeWithAmount(self.dollars(7))
+        self.assertEqual(statement.totalExpenses(), self.dollars(15))
+        self.assertEqual(statement.totalIncome(), self.dollars(7))
+        self.assertEqual(len(statement.allActivities()), 3)
+
+    def testCompositeSourceChangesWhenAnyOfItsSourcesChanges(self):
+        sourceA = self.sourceWithExpensesFromAmounts([self.dollars(1)])
+        sourceB = self.sourceWithExpensesFromAmounts([self.dollars(2)])
+        statement = FinancialActivityStatement.fromSingleSource(CompositeFinancialActivitiesSource.withAllSources([sourceA, sourceB]))
+        self.assertEqual(statement.totalExpenses(), self.dollars(3))
+        sourceB.addExpenseWithAmount(self.dollars(4))
+        self.assertEqual(statement.totalExpenses(), self.dollars(7))
+
     def zeroDollars(self):
         return Dollars.zero()
     
@@ -87,6 +122,131 @@ class FinancialActivityStatementTest(TestCase):
         return LoadedActivitySource.withIncomesFromAmounts(amounts)
 
 
+class CompositeFinancialActivitiesSourceTest(TestCase):
+
+    def testExpensesAndIncomesFromAllSourcesAreStreamedInSourceOrder(self):
+        sourceA = LoadedActivitySource.withExpensesFromAmounts([Dollars.withAmount(1), Dollars.withAmount(2)])
+        sourceB = LoadedActivitySource.withIncomesFromAmounts([Dollars.withAmount(3)])
+        sourceC = LoadedActivitySource.withExpensesFromAmounts([Dollars.withAmount(4)])
+        aSource = CompositeFinancialActivitiesSource.withAllSources([sourceA, sourceB, sourceC])
+        self.assertEqual([anExpense.total() for anExpense in aSource.iterExpenses()], [Dollars.withAmount(1), Dollars.withAmount(2), Dollars.withAmount(4)])
+        self.assertEqual([anIncome.total() for anIncome in aSource.iterIncomes()], [Dollars.withAmount(3)])
+
+
+    def testPreloadedSourcesKeepServingTheirLatestActivities(self):
+        sourceA = LoadedActivitySource.withExpensesFromAmounts([Dollars.withAmount(1)])
+        sourceB = LoadedActivitySource.withIncomesFromAmounts([Dollars.withAmount(3)])
+        aSource = CompositeFinancialActivitiesSource.withAllSources([sourceA, sourceB])
+        failures = aSource.preloadConcurrently(workers = 2)
+        sourceA.addExpenseWithAmount(Dollars.withAmount(5))
+        self.assertEqual(failures, [])
+        self.assertEqual([anExpense.total() for anExpense in aSource.expenses()], [Dollars.withAmount(1), Dollars.withAmount(5)])
+        self.assertEqual([anIncome.total() for anIncome in aSource.incomes()], [Dollars.withAmount(3)])
+
+    def testPreloadedFileSourceIsReloadedWhenItsFileIsReplaced(self):
+        exportFile = TemporaryExportFile.withLines(self, ['Date,Description,Debit,Credit', '01-05-2024,Coffee,1.00,'])
+        aFile = open(exportFile.path())
+        self.addCleanup(aFile.close)
+        fileSource = FinancialActivityFileSource.fromFile('TestSource', aFile, TemporaryExportFile.debitAndCreditRecordSpec(), TemporaryExportFile.lineParser(), TemporaryExportFile.emptyEnrichmentSpec())
+        aSource = CompositeFinancialActivitiesSource.withAllSources([fileSource])
+        self.assertEqual(aSource.preloadConcurrently(), [])
+        exportFile.replaceWithLines(['Date,Description,Debit,Credit', '01-05-2024,Coffee,1.00,', '01-06-2024,Lunch,12.50,'])
+        self.assertEqual([anExpense.description() for anExpense in aSource.expenses()], ['Coffee', 'Lunch'])
+
+    def testFileSourcesArePreloadedInWorkerProcesses(self):
+        exportFileA = TemporaryExportFile.withLines(self, ['Date,Description,Debit,Credit', '01-05-2024,Coffee,1.00,', '01-06-2024,Refund,,2.00'])
+        exportFileB = TemporaryExportFile.withLines(self, ['Date,Description,Debit,Credit', '01-07-2024,Lunch,12.50,'])
+        aFile = open(exportFileA.path())
+        self.addCleanup(aFile.close)
+        fileSource = FinancialActivityFileSource.fromFile('BankA', aFile, TemporaryExportFile.debitAndCreditRecordSpec(), TemporaryExportFile.lineParser(), TemporaryExportFile.emptyEnrichmentSpec())
+        pathSource = MemoryMappedFinancialActivityFileSource.fromPath('BankB', exportFileB.path(), TemporaryExportFile.debitAndCreditRecordSpec(), TemporaryExportFile.lineParser(), TemporaryExportFile.emptyEnrichmentSpec())
+        self.assertIsNotNone(fileSource.activityRowsLoad())
+        aSource = CompositeFinancialActivitiesSource.withAllSources([fileSource, pathSource])
+        self.assertEqual(aSource.preloadConcurrently(workers = 2), [])
+        self.assertTrue(fileSource.isLoaded())
+        self.assertEqual((fileSource.version(), pathSource.version()), (1, 1))
+        self.assertEqual([(anExpense.description(), anExpense.sourceName()) for anExpense in aSource.expenses()], [('Coffee', 'BankA'), ('Lunch', 'BankB')])
+        self.assertEqual([anIncome.total() for anIncome in aSource.incomes()], [Dollars.withAmount(2)])
+        self.assertEqual(aSource.version(), (1, 1))
+
+    def testFileSourcesWhoseSpecsCannotBeSentToWorkersArePreloadedInThreads(self):
+        exportFile = TemporaryExportFile.withLines(self, ['Date,Description,Debit,Credit', '01-05-2024,Coffee,1.00,'])
+        specBuilder = ActivityEnrichmentSpecBuilder()
+        specBuilder.addDefintionSpecForCodeBasedCondition('Coffee', 'Coffee Shop', lambda aRecord: aRecord.description() == 'Coffee')
+        aFile = open(exportFile.path())
+        self.addCleanup(aFile.close)
+        fileSource = FinancialActivityFileSource.fromFile('BankA', aFile, TemporaryExportFile.debitAndCreditRecordSpec(), TemporaryExportFile.lineParser(), specBuilder.fullSpec())
+        self.assertIsNone(fileSource.activityRowsLoad())
+        aSource = CompositeFinancialActivitiesSource.withAllSources([fileSource])
+        self.assertEqual(aSource.preloadConcurrently(), [])
+        self.assertEqual([anExpense.category() for anExpense in aSource.expenses()], ['Coffee'])
+
+    def testFailingSourceIsReportedWithoutPreventingTheOtherSourcesFromLoading(self):
+        brokenSource = FinancialActivityFileSource.fromFile('BrokenBank', None, None, None, None)
+        workingSource = LoadedActivitySource.withExpensesFromAmounts([Dollars.withAmount(2)])
+        aSource = CompositeFinancialActivitiesSource.withAllSources([brokenSource, workingSource])
+        failures = aSource.preloadConcurrently()
+        self.assertEqual([aFailure.sourceName() for aFailure in failures], ['BrokenBank'])
+        self.assertIs(failures[0].source(), brokenSource)
+        self.assertIsInstance(failures[0].error(), TypeError)
+        self.assertEqual([anExpense.total() for anExpense in workingSource.expenses()], [Dollars.withAmount(2)])
+        with self.assertRaises(TypeError):
+            aSource.expenses()
+
+    def testSourceThatFailedToPreloadFailsQueriesUntilItLoads(self):
+        exportFile = TemporaryExportFile.withLines(self, ['Date,Description,Debit,Credit', '01-05-2024,Coffee,1.00,'])
+        TemporaryExportFile.removeIfPresent(exportFile.path())
+        lateSource = MemoryMappedFinancialActivityFileSource.fromPath('LateBank', exportFile.path(), TemporaryExportFile.debitAndCreditRecordSpec(), TemporaryExportFile.lineParser(), TemporaryExportFile.emptyEnrichmentSpec())
+        workingSource = LoadedActivitySource.withExpensesFromAmounts([Dollars.withAmount(2)])
+        aSource = CompositeFinancialActivitiesSource.withAllSources([lateSource, workingSource])
+        failures = aSource.preloadConcurrently()
+        self.assertIsInstance(failures[0].error(), FileNotFoundError)
+        with self.assertRaises(FileNotFoundError):
+            aSource.expenses()
+        exportFile.write('Date,Description,Debit,Credit\n01-05-2024,Coffee,1.00,\n')
+        self.assertEqual([anExpense.total() for anExpense in aSource.expenses()], [Dollars.withAmount(1), Dollars.withAmount(2)])
+
+
+    def testCombinedExpensesAreReusedUntilASourceChanges(self):
+        sourceA = LoadedActivitySource.withExpensesFromAmounts([Dollars.withAmount(1)])
+        sourceB = LoadedActivitySource.withExpensesFromAmounts([Dollars.withAmount(2)])
+        aSource = CompositeFinancialActivitiesSource.withAllSources([sourceA, sourceB])
+        combinedExpenses = aSource.expenses()
+        self.assertIs(aSource.expenses(), combinedExpenses)
+        sourceB.addExpenseWithAmount(Dollars.withAmount(3))
+        self.assertEqual([anExpense.total() for anExpense in aSource.expenses()], [Dollars.withAmount(1), Dollars.withAmount(2), Dollars.withAmount(3)])
+
+    def testActivitiesFromAllSourcesAreMergedInDateOrder(self):
+        sourceA = LoadedActivitySource.withName('A')
+        sourceA.addIncomeWithDescriptionAndDate('A1', date(2024,1,5))
+        sourceA.addIncomeWithDescriptionAndDate('A2', date(2024,1,20))
+        sourceB = LoadedActivitySource.withName('B')
+        sourceB.addIncomeWithDescriptionAndDate('B2', date(2024,1,10))
+        sourceB.addIncomeWithDescriptionAndDate('B1', date(2024,1,1))
+        aSource = CompositeFinancialActivitiesSource.withAllSourcesInDateOrder([sourceA, sourceB])
+        self.assertEqual([anIncome.description() for anIncome in aSource.incomes()], ['B1', 'A1', 'B2', 'A2'])
+        unorderedSource = CompositeFinancialActivitiesSource.withAllSources([sourceA, sourceB])
+        self.assertEqual([anIncome.description() for anIncome in unorderedSource.iterIncomesInDateOrder()], ['B1', 'A1', 'B2', 'A2'])
+
+
+    def testSourcesBuiltDirectlyAreCombinedInSourceOrder(self):
+        sourceA = LoadedActivitySource.withExpensesFromAmounts([Dollars.withAmount(1)])
+        sourceB = LoadedActivitySource.withExpensesFromAmounts([Dollars.withAmount(2)])
+        aSource = CompositeFinancialActivitiesSource([sourceA, sourceB])
+        self.assertEqual([anExpense.total() for anExpense in aSource.expenses()], [Dollars.withAmount(1), Dollars.withAmount(2)])
+
+    def testSourcesAlreadyInDateOrderAreMergedWithoutSorting(self):
+        orderedSource = LoadedActivitySource.withName('A')
+        orderedSource.addIncomeWithDescriptionAndDate('A1', date(2024,1,5))
+        orderedSource.addIncomeWithDescriptionAndDate('A2', date(2024,1,5))
+        orderedSource.addIncomeWithDescriptionAndDate('A3', date(2024,1,20))
+        unorderedSource = LoadedActivitySource.withName('B')
+        unorderedSource.addIncomeWithDescriptionAndDate('B2', date(2024,1,10))
+        unorderedSource.addIncomeWithDescriptionAndDate('B1', date(2024,1,1))
+        self.assertIs(CombinedActivitiesView.inDateOrder(orderedSource.incomes()), orderedSource.incomes())
+        self.assertEqual([anIncome.description() for anIncome in CombinedActivitiesView.inDateOrder(unorderedSource.incomes())], ['B1', 'B2'])
+
+
 class FinancialActivityFileSourceTest(TestCase):
 
     def testNoExpensesAreImportedFromEmptyFile(self):
@@ -532,9 +692,195 @@ class FinancialActivityFileSourceTest(TestCase):
         with self.assertRaisesRegex(Exception, 'Source name cannot be empty'):
             FinancialActivityFileSource.fromFile('', aFile, spec, parser, activityEnrichmentSpec)
 
+    def testAmountsWithThousandsSeparatorsAndParenthesesAreImportedFromFileWithSingleAmountColumn(self):
+        lines = ['Date,Description,Amount',
+                 '09-27-2024,Rent,"$1,250.00"',
+                 '09-28-2024,Refund,"(19.99)"',]
+        aFile = self.fileWithGivenLines(lines)
+        parser = FinancialActivityFileLineParser.commaSeparatedValues(boundingCharacter='"')
+        amountSpec = SingleAmountColumnFileRecordSpec.forSpecificColumn(amountColumn = 'Amount')
+        spec = self.fileSpec(descriptionColumn = 'Description', amountSpec = amountSpec)
+        activityEnrichmentSpec = self.emptyActivityEnrichmentSpec()
+        aSource = FinancialActivityFileSource.fromFile('TestSource', aFile, spec, parser, activityEnrichmentSpec)
+        self.assertAllAndOnlyTotalsInDollars(aSource.expenses(), [1250])
+        self.assertAllAndOnlyTotalsInDollars(aSource.incomes(), [19.99])
+
+    def testFileWithOnlyIncomesIsReadOnceNoMatterHowManyTimesExpensesAreRequested(self):
+        aFile = self.fileWithGivenLines(['Date,Description,Debit,Credit',
+                                         '09-30-2024,IncomeA,,2.00',])
+        parser = FinancialActivityFileLineParser.commaSeparatedValues()
+        amountSpec = TwoAmountColumnsFileRecordSpec.forColumns(expenseColumn = 'Debit', incomeColumn = 'Credit')
+        spec = self.fileSpec(descriptionColumn = 'Description', amountSpec = amountSpec)
+        aSource = FinancialActivityFileSource.fromFile('TestSource', aFile, spec, parser, self.emptyActivityEnrichmentSpec())
+        self.assertFalse(aSource.isLoaded())
+        aSource.expenses()
+        aSource.expenses()
+        incomes = aSource.incomes()
+        self.assertTrue(aSource.isLoaded())
+        self.assertEqual(aFile.timesRead(), 1)
+        self.assertAllAndOnlyTotalsInDollars(incomes, [2])
+
+    def testReplacedFileIsReloadedAndUnchangedFileIsNot(self):
+        fileDescriptor, aPath = tempfile.mkstemp(suffix='.csv')
+        self.addCleanup(os.remove, aPath)
+        with os.fdopen(fileDescriptor, 'w') as aFile: aFile.write('Date,Description,Debit,Credit\n09-27-2024,PurchaseA,3.00,\n')
+        aFile = open(aPath)
+        self.addCleanup(lambda: aSource._file.close())
+        parser = FinancialActivityFileLineParser.commaSeparatedValues()
+        amountSpec = TwoAmountColumnsFileRecordSpec.forColumns(expenseColumn = 'Debit', incomeColumn = 'Credit')
+        spec = self.fileSpec(descriptionColumn = 'Description', amountSpec = amountSpec)
+        aSource = FinancialActivityFileSource.fromFile('TestSource', aFile, spec, parser, self.emptyActivityEnrichmentSpec())
+        firstExpenses = aSource.expenses()
+        self.assertIs(aSource.expenses(), firstExpenses)
+        replacementPath = aPath + '.new'
+        with open(replacementPath, 'w') as replacement: replacement.write('Date,Description,Debit,Credit\n09-28-2024,PurchaseB,4.00,\n09-29-2024,PurchaseC,5.00,\n')
+        os.replace(replacementPath, aPath)
+        self.assertAllAndOnlyTotalsInDollars(aSource.expenses(), [4, 5])
+
+    def testExpensesAndIncomesCanBeStreamedOneAfterTheOtherFromAnOpenedFile(self):
+        exportFile = TemporaryExportFile.withLines(self, ['Date,Description,Debit,Credit', '09-27-2024,PurchaseA,10.00,', '09-28-2024,IncomeA,,5.00'])
+        aSource = self.sourceFromOpenedFile(exportFile)
+        statement = FinancialActivityStatement.fromSingleSource(aSource)
+        self.assertEqual(statement.totalStreamedExpenses(), Dollars.withAmount(10))
+        self.assertEqual(statement.totalStreamedIncome(), Dollars.withAmount(5))
+        self.assertAllAndOnlyTotalsInDollars(aSource.expenses(), [10])
+        self.assertEqual(len(list(aSource.iterActivities())), 2)
+
+    def testStreamsOverAnOpenedFileWithoutPathStartFromTheFirstLine(self):
+        aFile = io.StringIO('Date,Description,Debit,Credit\n09-27-2024,PurchaseA,10.00,\n09-28-2024,IncomeA,,5.00\n')
+        aSource = FinancialActivityFileSource.fromFile('TestSource', aFile, TemporaryExportFile.debitAndCreditRecordSpec(), TemporaryExportFile.lineParser(), self.emptyActivityEnrichmentSpec())
+        self.assertAllAndOnlyTotalsInDollars(list(aSource.iterExpenses()), [10])
+        self.assertAllAndOnlyTotalsInDollars(list(aSource.iterIncomes()), [5])
+
+    def testLoadingFailsWhenDescriptionColumnIsNotInFileHeader(self):
+        lines = ['Date,Memo,Debit,Credit',
+                 '09-27-2024,PurchaseA,2.00,',]
+        aFile = self.fileWithGivenLines(lines)
+        parser = FinancialActivityFileLineParser.commaSeparatedValues()
+        amountSpec = TwoAmountColumnsFileRecordSpec.forColumns(expenseColumn = 'Debit', incomeColumn = 'Credit')
+        spec = self.fileSpec(descriptionColumn = 'Description', amountSpec = amountSpec)
+        activityEnrichmentSpec = self.emptyActivityEnrichmentSpec()
+        aSource = FinancialActivityFileSource.fromFile('TestSource', aFile, spec, parser, activityEnrichmentSpec)
+        with self.assertRaisesRegex(Exception, 'Column Description not found in file header'):
+            aSource.expenses()
+
+    def testLoadingFailsWhenAmountColumnIsNotInFileHeaderEvenIfFileHasNoActivity(self):
+        lines = ['Date,Description,Debit,Credit']
+        aFile = self.fileWithGivenLines(lines)
+        parser = FinancialActivityFileLineParser.commaSeparatedValues()
+        amountSpec = SingleAmountColumnFileRecordSpec.forSpecificColumn(amountColumn = 'Amount')
+        spec = self.fileSpec(descriptionColumn = 'Description', amountSpec = amountSpec)
+        activityEnrichmentSpec = self.emptyActivityEnrichmentSpec()
+        aSource = FinancialActivityFileSource.fromFile('TestSource', aFile, spec, parser, activityEnrichmentSpec)
+        with self.assertRaisesRegex(Exception, 'Column Amount not found in file header'):
+            aSource.expenses()
+
+    def testActivityIsImportedFromFileWithColumnsInDifferentOrderThanUsual(self):
+        lines = ['Credit,Debit,Description,Date',
+                 ',4.50,PurchaseA,09-27-2024',]
+        aFile = self.fileWithGivenLines(lines)
+        parser = FinancialActivityFileLineParser.commaSeparatedValues()
+        amountSpec = TwoAmountColumnsFileRecordSpec.forColumns(expenseColumn = 'Debit', incomeColumn = 'Credit')
+        spec = self.fileSpec(descriptionColumn = 'Description', amountSpec = amountSpec)
+        activityEnrichmentSpec = self.emptyActivityEnrichmentSpec()
+        aSource = FinancialActivityFileSource.fromFile('TestSource', aFile, spec, parser, activityEnrichmentSpec)
+        expenses = aSource.expenses()
+        self.assertActivitiesQuantity(expenses, 1)
+        self.assertActivityWithDescriptionAndTotalInDollars(expenses, 'PurchaseA', 4.50)
+        self.assertActivityDate(expenses[0], date(2024,9,27))
+
+    def testActivitiesAreStreamedInFileOrder(self):
+        lines = ['Date,Description,Debit,Credit',
+                 '09-30-2024,IncomeA,,2.00',
+                 '09-27-2024,PurchaseA,3.00,',
+                 '09-30-2024,IncomeB,,4.00',]
+        aSource = self.sourceWithDebitAndCreditColumnsFromLines(lines)
+        activities = list(aSource.iterActivities())
+        self.assertEqual([anActivity.description() for anActivity in activities], ['IncomeA', 'PurchaseA', 'IncomeB'])
+
+    def testExpensesAndIncomesAreStreamedSeparately(self):
+        lines = ['Date,Description,Debit,Credit',
+                 '09-30-2024,IncomeA,,2.00',
+                 '09-27-2024,PurchaseA,3.00,',
+                 '09-30-2024,IncomeB,,4.00',]
+        aSource = self.sourceWithDebitAndCreditColumnsFromLines(lines)
+        self.assertAllAndOnlyTotalsInDollars(list(aSource.iterExpenses()), [3])
+        self.assertAllAndOnlyTotalsInDollars(list(aSource.iterIncomes()), [2, 4])
+
+    def testStreamingReadsOnlyTheLinesThatHaveBeenConsumed(self):
+        lines = ['Date,Description,Debit,Credit',
+                 '09-27-2024,PurchaseA,3.00,',
+                 'this line is never parsed']
+        aSource = self.sourceWithDebitAndCreditColumnsFromLines(lines)
+        activities = aSource.iterActivities()
+        self.assertEqual(next(activities).description(), 'PurchaseA')
+
+    def testStreamingAnEmptyFileYieldsNoActivities(self):
+        aSource = self.sourceWithDebitAndCreditColumnsFromLines([])
+        self.assertEqual(list(aSource.iterActivities()), [])
+
+    def testStatementTotalsStreamedActivitiesWithoutLoadingTheSource(self):
+        lines = ['Date,Description,Debit,Credit',
+                 '09-30-2024,IncomeA,,2.00',
+                 '09-27-2024,PurchaseA,3.00,',
+                 '09-27-2024,PurchaseB,5.00,',]
+        aSource = self.sourceWithDebitAndCreditColumnsFromLines(lines)
+        statement = FinancialActivityStatement.fromSingleSource(aSource)
+        self.assertEqual(statement.totalStreamedExpenses(), Dollars.withAmount(8))
+        self.assertEqual(statement.totalStreamedIncome(), Dollars.withAmount(2))
+
+    def sourceWithDebitAndCreditColumnsFromLines(self, lines):
+        aFile = self.fileWithGivenLines(lines)
+        parser = FinancialActivityFileLineParser.commaSeparatedValues()
+        amountSpec = TwoAmountColumnsFileRecordSpec.forColumns(expenseColumn = 'Debit', incomeColumn = 'Credit')
+        spec = self.fileSpec(descriptionColumn = 'Description', amountSpec = amountSpec)
+        activityEnrichmentSpec = self.emptyActivityEnrichmentSpec()
+        return FinancialActivityFileSource.fromFile('TestSource', aFile, spec, parser, activityEnrichmentSpec)
+
+    def testLoadedActivitiesAreKeptWhenTheFileIsRemoved(self):
+        exportFile = TemporaryExportFile.withLines(self, ['Date,Description,Debit,Credit', '09-27-2024,Coffee,3.00,'])
+        aSource = self.sourceFromOpenedFile(exportFile)
+        self.assertEqual([anExpense.description() for anExpense in aSource.expenses()], ['Coffee'])
+        os.remove(exportFile.path())
+        self.assertEqual([anExpense.description() for anExpense in aSource.expenses()], ['Coffee'])
+        exportFile.write('Date,Description,Debit,Credit\n09-28-2024,Tea,2.00,\n')
+        self.assertEqual([anExpense.description() for anExpense in aSource.expenses()], ['Tea'])
+
+    def testStreamsStartAfterAPreambleTheCallerAlreadySkipped(self):
+        exportFile = TemporaryExportFile.withLines(self, ['Account statement', 'Date,Description,Debit,Credit', '09-27-2024,A,3.00,'])
+        aFile = open(exportFile.path())
+        self.addCleanup(aFile.close)
+        aFile.readline()
+        aSource = FinancialActivityFileSource.fromFile('TestSource', aFile, TemporaryExportFile.debitAndCreditRecordSpec(), TemporaryExportFile.lineParser(), self.emptyActivityEnrichmentSpec())
+        self.assertEqual([anExpense.description() for anExpense in aSource.expenses()], ['A'])
+        self.assertEqual([anActivity.description() for anActivity in aSource.iterActivities()], ['A'])
+
+    def testStreamsOverAnOpenedFileWithoutPathStartAfterAPreambleTheCallerAlreadySkipped(self):
+        aFile = io.StringIO('Account statement\nDate,Description,Debit,Credit\n09-27-2024,A,3.00,\n')
+        aFile.readline()
+        aSource = FinancialActivityFileSource.fromFile('TestSource', aFile, TemporaryExportFile.debitAndCreditRecordSpec(), TemporaryExportFile.lineParser(), self.emptyActivityEnrichmentSpec())
+        self.assertEqual([anActivity.description() for anActivity in aSource.iterActivities()], ['A'])
+        self.assertEqual([anActivity.description() for anActivity in aSource.iterActivities()], ['A'])
+
+    def testFileOpenedByRelativePathIsStillReadAfterTheWorkingDirectoryChanges(self):
+        exportFile = TemporaryExportFile.withLines(self, ['Date,Description,Debit,Credit', '09-27-2024,A,3.00,'])
+        workingDirectory = os.getcwd()
+        self.addCleanup(os.chdir, workingDirectory)
+        os.chdir(os.path.dirname(exportFile.path()))
+        aFile = open(os.path.basename(exportFile.path()))
+        self.addCleanup(aFile.close)
+        aSource = FinancialActivityFileSource.fromFile('TestSource', aFile, TemporaryExportFile.debitAndCreditRecordSpec(), TemporaryExportFile.lineParser(), self.emptyActivityEnrichmentSpec())
+        os.chdir(workingDirectory)
+        self.assertEqual([anActivity.description() for anActivity in aSource.iterActivities()], ['A'])
+
+    def sourceFromOpenedFile(self, exportFile):
+        aFile = open(exportFile.path())
+        self.addCleanup(aFile.close)
+        return FinancialActivityFileSource.fromFile('TestSource', aFile, TemporaryExportFile.debitAndCreditRecordSpec(), TemporaryExportFile.lineParser(), self.emptyActivityEnrichmentSpec())
+
     def assertActivitiesQuantity(self, activities, expectedSize):
         self.assertEqual(len(activities), expectedSize)
-    
+
     def assertActivityWithDescriptionAndTotalInDollars(self, activities, aDescription, aDollarAmount):
         matchingActivityWasFound = False
         expectedActivityTotal = Dollars.withAmount(aDollarAmount)
@@ -627,6 +973,375 @@ class ActivityEnrichmentSpecBuilderTest(TestCase):
             specBuilder.addDefintionSpecForDescriptionIncludingString('Bucket', 'DescriptionOverride','')
 
 
+class ActivityEnrichmentSpecTest(TestCase):
+
+    def testFirstDefinitionWinsWhenSeveralSubstringsMatch(self):
+        specBuilder = ActivityEnrichmentSpecBuilder()
+        specBuilder.addDefintionSpecForDescriptionIncludingString('Transport', 'Subway', 'MTA')
+        specBuilder.addDefintionSpecForDescriptionIncludingString('Groceries', 'MarketABC', 'Markt#ABC')
+        specBuilder.addDefintionSpecForDescriptionIncludingAnyOfGivenStrings('Coffee', 'CoffeeShop', ['Cafe', 'Markt'])
+        enrichmentSpec = specBuilder.fullSpec()
+        self.assertEqual(self.bucketFor(enrichmentSpec, 'PayAPP Markt#ABC MTA'), 'Transport')
+        self.assertEqual(self.bucketFor(enrichmentSpec, 'Markt#ABC NY'), 'Groceries')
+        self.assertEqual(self.bucketFor(enrichmentSpec, 'Markt#AB Cafe'), 'Coffee')
+        self.assertEqual(self.bucketFor(enrichmentSpec, 'Rent'), 'Unclassified')
+
+    def testCodeBasedConditionsKeepTheirPositionAmongSubstringConditions(self):
+        specBuilder = ActivityEnrichmentSpecBuilder()
+        specBuilder.addDefintionSpecForDescriptionIncludingString('Groceries', 'MarketABC', 'Markt#ABC')
+        specBuilder.addDefintionSpecForCodeBasedCondition('Large', 'Large', lambda anActivity: anActivity.description().endswith('NY'))
+        specBuilder.addDefintionSpecForDescriptionIncludingString('Transport', 'Subway', 'MTA')
+        enrichmentSpec = specBuilder.fullSpec()
+        self.assertEqual(self.bucketFor(enrichmentSpec, 'Markt#ABC NY'), 'Groceries')
+        self.assertEqual(self.bucketFor(enrichmentSpec, 'MTA NY'), 'Large')
+        self.assertEqual(self.bucketFor(enrichmentSpec, 'MTA NJ'), 'Transport')
+
+    def testDefinitionsAddedAfterFirstUseAreConsidered(self):
+        specBuilder = ActivityEnrichmentSpecBuilder()
+        enrichmentSpec = specBuilder.fullSpec()
+        self.assertEqual(self.bucketFor(enrichmentSpec, 'Markt#ABC NY'), 'Unclassified')
+        specBuilder.addDefintionSpecForDescriptionIncludingString('Groceries', 'MarketABC', 'Markt#ABC')
+        self.assertEqual(self.bucketFor(enrichmentSpec, 'Markt#ABC NY'), 'Groceries')
+
+    def testRepeatedDescriptionsAreResolvedFromTheDescriptionCache(self):
+        specBuilder = ActivityEnrichmentSpecBuilder()
+        specBuilder.addDefintionSpecForDescriptionIncludingString('Groceries', 'MarketABC', 'Markt#ABC')
+        enrichmentSpec = specBuilder.fullSpec()
+        for aDescription in ['Markt#ABC NY', 'Markt#ABC NY', 'Rent', 'Markt#ABC NY', 'Rent']:
+            self.bucketFor(enrichmentSpec, aDescription)
+        statistics = enrichmentSpec.descriptionCacheStatistics()
+        self.assertEqual(statistics.hits(), 3)
+        self.assertEqual(statistics.misses(), 2)
+        self.assertEqual(statistics.size(), 2)
+        self.assertEqual(self.bucketFor(enrichmentSpec, 'Rent'), 'Unclassified')
+
+    def testDescriptionCacheKeepsOnlyTheMostRecentlyUsedDescriptions(self):
+        enrichmentSpec = ActivityEnrichmentSpec.withDefinitions([], descriptionCacheSize = 2)
+        for aDescription in ['First', 'Second', 'First', 'Third', 'First', 'Second']:
+            self.bucketFor(enrichmentSpec, aDescription)
+        statistics = enrichmentSpec.descriptionCacheStatistics()
+        self.assertEqual(statistics.hits(), 2)
+        self.assertEqual(statistics.misses(), 4)
+        self.assertEqual(statistics.size(), 2)
+
+    def testCodeBasedConditionsDependingOnTheWholeActivityAreEvaluatedForEveryActivity(self):
+        evaluatedActivities = []
+        def isLargeExpense(anActivity):
+            evaluatedActivities.append(anActivity)
+            return anActivity.totalInCents() > 10000
+        specBuilder = ActivityEnrichmentSpecBuilder()
+        specBuilder.addDefintionSpecForCodeBasedCondition('Large', 'Large', isLargeExpense, dependsOnlyOnDescription = False)
+        specBuilder.addDefintionSpecForDescriptionIncludingString('Groceries', 'MarketABC', 'Markt#ABC')
+        enrichmentSpec = specBuilder.fullSpec()
+        self.assertEqual(self.bucketFor(enrichmentSpec, 'Markt#ABC NY', 500), 'Large')
+        self.assertEqual(self.bucketFor(enrichmentSpec, 'Markt#ABC NY', 5), 'Groceries')
+        self.assertEqual(len(evaluatedActivities), 2)
+        self.assertEqual(enrichmentSpec.descriptionCacheStatistics().hits(), 1)
+
+    def testDescriptionCacheSizeCannotBeNegative(self):
+        with self.assertRaisesRegex(Exception, 'Description cache size cannot be negative'):
+            ActivityEnrichmentSpec.withDefinitions([], descriptionCacheSize = -1)
+
+    def testDescriptionsBatchConditionReceivesEachUnresolvedDescriptionOnce(self):
+        receivedBatches = []
+        def isCoffee(descriptions):
+            receivedBatches.append(list(descriptions))
+            return [aDescription.startswith('Coffee') for aDescription in descriptions]
+        specBuilder = ActivityEnrichmentSpecBuilder()
+        specBuilder.addDefintionSpecForDescriptionIncludingString('Groceries', 'MarketABC', 'Markt#ABC')
+        specBuilder.addDefintionSpecForDescriptionsBatchCodeBasedCondition('Coffee', 'CoffeeShop', isCoffee)
+        enrichmentSpec = specBuilder.fullSpec()
+        activities = [self.activityWithDescription(aDescription) for aDescription in ['Coffee NY', 'Markt#ABC', 'Rent', 'Coffee NY']]
+        buckets = [aDefinition.bucket() for aDefinition in enrichmentSpec.enrichmentDefinitionsForActivities(activities)]
+        self.assertEqual(buckets, ['Coffee', 'Groceries', 'Unclassified', 'Coffee'])
+        self.assertEqual(receivedBatches, [['Coffee NY', 'Rent']])
+
+    def testBatchConditionMustReturnOneResultPerActivity(self):
+        specBuilder = ActivityEnrichmentSpecBuilder()
+        specBuilder.addDefintionSpecForBatchCodeBasedCondition('Coffee', 'CoffeeShop', lambda activities: [True])
+        enrichmentSpec = specBuilder.fullSpec()
+        activities = [self.activityWithDescription('Coffee NY'), self.activityWithDescription('Rent')]
+        with self.assertRaisesRegex(Exception, 'Batch condition must return one result per activity'):
+            enrichmentSpec.enrichmentDefinitionsForActivities(activities)
+
+    def testFileSourceEvaluatesBatchConditionsOncePerChunkOfLines(self):
+        receivedBatchSizes = []
+        def isCoffee(activities):
+            receivedBatchSizes.append(len(activities))
+            return [anActivity.description().startswith('Coffee') for anActivity in activities]
+        specBuilder = ActivityEnrichmentSpecBuilder()
+        specBuilder.addDefintionSpecForBatchCodeBasedCondition('Coffee', 'CoffeeShop', isCoffee, dependsOnlyOnDescription = False)
+        lines = ['Date,Description,Debit,Credit'] + ['09-27-2024,Coffee' + str(lineNumber) + ',3.00,' for lineNumber in range(5)]
+        aFile = TestFile()
+        for aLine in lines: aFile.addLine(aLine)
+        amountSpec = TwoAmountColumnsFileRecordSpec.forColumns(expenseColumn = 'Debit', incomeColumn = 'Credit')
+        dateSpec = DateFileRecordSpec.withSeparatorAndSequence(column = 'Date', separator = '-', sequence=['Month','Day','Year'])
+        spec = FileRecordSpec.withSpecs('Description', amountSpec = amountSpec, dateSpec = dateSpec)
+        aSource = FinancialActivityFileSource.fromFile('TestSource', aFile, spec, FinancialActivityFileLineParser.commaSeparatedValues(), specBuilder.fullSpec())
+        aSource.ENRICHMENT_BATCH_SIZE = 2
+        expenses = aSource.expenses()
+        self.assertEqual([anExpense.category() for anExpense in expenses], ['Coffee'] * 5)
+        self.assertEqual(receivedBatchSizes, [2, 2, 1])
+
+    def testProfilingCountsEvaluationsMatchesAndShadowedRules(self):
+        specBuilder = ActivityEnrichmentSpecBuilder()
+        specBuilder.addDefintionSpecForDescriptionIncludingString('Coffee', 'CoffeeShop', 'Coffee')
+        specBuilder.addDefintionSpecForDescriptionIncludingString('Coffee', 'CoffeeNY', 'Coffee NY')
+        specBuilder.addDefintionSpecForDescriptionIncludingString('Groceries', 'MarketABC', 'Markt#ABC')
+        specBuilder.addDefintionSpecForDescriptionIncludingString('Transport', 'Subway', 'MTA')
+        enrichmentSpec = specBuilder.fullSpec()
+        enrichmentSpec.startProfiling()
+        for aDescription in ['Coffee NY', 'Coffee NJ', 'Markt#ABC', 'Rent']:
+            self.bucketFor(enrichmentSpec, aDescription)
+        report = enrichmentSpec.stopProfiling()
+        self.assertFalse(enrichmentSpec.isProfiling())
+        self.assertEqual(report.profiledActivities(), 4)
+        self.assertEqual([aProfile.evaluations() for aProfile in report.definitionProfiles()], [4, 2, 2, 1])
+        self.assertEqual([aProfile.matches() for aProfile in report.definitionProfiles()], [2, 0, 1, 0])
+        self.assertEqual([aProfile.definition().descriptionOverride() for aProfile in report.alwaysShadowedDefinitions()], ['CoffeeNY'])
+        self.assertEqual([aProfile.position() for aProfile in report.neverMatchedDefinitions()], [3])
+        self.assertEqual(report.asDictionaries()[1]['shadowedMatches'], 1)
+
+    def testProfiledSpecResolvesTheSameDefinitions(self):
+        specBuilder = ActivityEnrichmentSpecBuilder()
+        specBuilder.addDefintionSpecForCodeBasedCondition('Large', 'Large', lambda anActivity: anActivity.totalInCents() > 10000, dependsOnlyOnDescription = False)
+        specBuilder.addDefintionSpecForDescriptionIncludingString('Groceries', 'MarketABC', 'Markt#ABC')
+        enrichmentSpec = specBuilder.fullSpec()
+        enrichmentSpec.startProfiling()
+        self.assertEqual(self.bucketFor(enrichmentSpec, 'Markt#ABC', 500), 'Large')
+        self.assertEqual(self.bucketFor(enrichmentSpec, 'Markt#ABC', 5), 'Groceries')
+        self.assertEqual(self.bucketFor(enrichmentSpec, 'Rent', 5), 'Unclassified')
+        self.assertEqual(enrichmentSpec.descriptionCacheStatistics().misses(), 0)
+
+    def testProfilingReportNeedsProfilingToBeStarted(self):
+        with self.assertRaisesRegex(Exception, 'Enrichment spec is not being profiled'):
+            ActivityEnrichmentSpecBuilder().fullSpec().profilingReport()
+
+    def testPatternDefinitionsResolveToTheFirstDeclaredMatchingDefinition(self):
+        specBuilder = ActivityEnrichmentSpecBuilder()
+        specBuilder.addDefintionSpecForDescriptionMatchingPattern('Transport', 'Subway', r'MTA\s+NYCT$')
+        specBuilder.addDefintionSpecForDescriptionMatchingPattern('Shopping', 'Amazon', r'^AMZN MKTP [A-Z0-9]+')
+        specBuilder.addDefintionSpecForDescriptionMatchingPattern('Shopping', 'AnyMarketplace', r'MKTP')
+        specBuilder.addDefintionSpecForDescriptionMatchingPattern('Coffee', 'CoffeeShop', r'coffee', ignoreCase = True)
+        enrichmentSpec = specBuilder.fullSpec()
+        self.assertEqual(self.descriptionOverrideFor(enrichmentSpec, 'AMZN MKTP 1A2B3C MTA NYCT'), 'Subway')
+        self.assertEqual(self.descriptionOverrideFor(enrichmentSpec, 'AMZN MKTP 1A2B3C'), 'Amazon')
+        self.assertEqual(self.descriptionOverrideFor(enrichmentSpec, 'PAYPAL AMZN MKTP 1A2B3C'), 'AnyMarketplace')
+        self.assertEqual(self.descriptionOverrideFor(enrichmentSpec, 'Blue Bottle COFFEE'), 'CoffeeShop')
+        self.assertEqual(self.descriptionOverrideFor(enrichmentSpec, 'Rent'), 'Rent')
+
+    def testPatternAndSubstringDefinitionsKeepTheirRelativePriority(self):
+        specBuilder = ActivityEnrichmentSpecBuilder()
+        specBuilder.addDefintionSpecForDescriptionIncludingString('Groceries', 'MarketABC', 'Markt#ABC')
+        specBuilder.addDefintionSpecForDescriptionMatchingPattern('Shopping', 'Amazon', r'^AMZN')
+        specBuilder.addDefintionSpecForCondition('Mixed', 'Mixed', ActivityAggregationCompositeCondition.withConditions([
+            ActivityDescriptionIncludesStringCondition.forString('Coffee'), ActivityDescriptionMatchesPatternCondition.forPattern(r'\d{4}$')]))
+        enrichmentSpec = specBuilder.fullSpec()
+        self.assertEqual(self.bucketFor(enrichmentSpec, 'AMZN Markt#ABC'), 'Groceries')
+        self.assertEqual(self.bucketFor(enrichmentSpec, 'AMZN Coffee'), 'Shopping')
+        self.assertEqual(self.bucketFor(enrichmentSpec, 'Coffee.Shop'), 'Mixed')
+        self.assertEqual(self.bucketFor(enrichmentSpec, 'Store 1234'), 'Mixed')
+
+    def testPatternsAreCombinedIntoASingleAlternation(self):
+        alternation = DescriptionPatternsAlternation.forPatternsAndValues([(r'B+$', 0), (r'^A', 1), (r'(x)\1', 2)], 3)
+        self.assertFalse(alternation.isCombined())
+        alternation = DescriptionPatternsAlternation.forPatternsAndValues([(r'B+$', 0), (r'^A', 1), (r'(?P<digit>\d)', 2)], 3)
+        self.assertTrue(alternation.isCombined())
+        self.assertEqual(alternation.firstMatchingValue('ABB'), 0)
+        self.assertEqual(alternation.firstMatchingValue('AB7C'), 1)
+        self.assertEqual(alternation.firstMatchingValue('C7'), 2)
+        self.assertEqual(alternation.firstMatchingValue('C'), 3)
+
+    def testPatternsWithLeadingGlobalFlagsKeepTheirFlagsInsideTheAlternation(self):
+        specBuilder = ActivityEnrichmentSpecBuilder()
+        specBuilder.addDefintionSpecForDescriptionMatchingPattern('Shopping', 'Amazon', r'(?i)amzn', ignoreCase = True)
+        specBuilder.addDefintionSpecForDescriptionMatchingPattern('Transport', 'Subway', r'(?x) MTA \s+ NYCT  # transit authority')
+        specBuilder.addDefintionSpecForDescriptionMatchingPattern('Coffee', 'CoffeeShop', r'^Coffee')
+        enrichmentSpec = specBuilder.fullSpec()
+        self.assertEqual(self.descriptionOverrideFor(enrichmentSpec, 'Amzn Mktp'), 'Amazon')
+        self.assertEqual(self.descriptionOverrideFor(enrichmentSpec, 'MTA NYCT'), 'Subway')
+        self.assertEqual(self.descriptionOverrideFor(enrichmentSpec, 'coffee amzn'), 'Amazon')
+        self.assertEqual(self.descriptionOverrideFor(enrichmentSpec, 'coffee'), 'coffee')
+        alternation = DescriptionPatternsAlternation.forPatternsAndValues([(r'(?i)amzn', 0), (r'^Coffee', 1)], 2)
+        self.assertTrue(alternation.isCombined())
+        self.assertEqual(alternation.firstMatchingValue('AMZN'), 0)
+        self.assertEqual(alternation.firstMatchingValue('coffee'), 2)
+
+    def testPatternsThatCannotBeCombinedAreSearchedOneByOne(self):
+        alternation = DescriptionPatternsAlternation.forPatternsAndValues([(r'(x)\1', 0), (r'(?P<same>y)', 1), (r'(?P<same>z)', 2)], 3)
+        self.assertFalse(alternation.isCombined())
+        self.assertEqual(alternation.firstMatchingValue('zxx'), 0)
+        self.assertEqual(alternation.firstMatchingValue('z'), 2)
+
+    def testPatternConditionNeedsAValidPattern(self):
+        with self.assertRaisesRegex(Exception, 'Pattern to search for cannot be empty'):
+            ActivityDescriptionMatchesPatternCondition.forPattern('')
+        with self.assertRaisesRegex(Exception, 'Invalid pattern'):
+            ActivityDescriptionMatchesPatternCondition.forPattern('AMZN(')
+
+    def testAutomatonFindsOverlappingStringsAndReturnsTheLowestValue(self):
+        automaton = AhoCorasickAutomaton.forStringsAndValues([('hers', 0), ('she', 1), ('he', 2), ('his', 3)], 4)
+        self.assertEqual(automaton.firstMatchingValue('ushers'), 0)
+        self.assertEqual(automaton.firstMatchingValue('ushe'), 1)
+        self.assertEqual(automaton.firstMatchingValue('ahis'), 3)
+        self.assertEqual(automaton.firstMatchingValue('hi'), 4)
+
+    def descriptionOverrideFor(self, enrichmentSpec, aDescription):
+        return enrichmentSpec.enrichmentDefinitionForActivity(self.activityWithDescription(aDescription)).descriptionOverride()
+
+    def bucketFor(self, enrichmentSpec, aDescription, amount = 1):
+        return enrichmentSpec.enrichmentDefinitionForActivity(self.activityWithDescription(aDescription, amount)).bucket()
+
+    def activityWithDescription(self, aDescription, amount = 1):
+        return FinancialActivity.expenseWithDescriptionAndTotal(aDescription, aDescription, 'Unclassified', Dollars.withAmount(amount), None, date(2024, 5, 12))
+
+
+class ActivityConditionTest(TestCase):
+
+    def testAnyOfConditionsStopsEvaluatingOnceOneIsSatisfied(self):
+        evaluatedConditions = []
+        composite = ActivityAggregationCompositeCondition.withConditions([self.recordingCondition('first', True, evaluatedConditions), self.recordingCondition('second', True, evaluatedConditions)])
+        self.assertTrue(composite.satisfies(self.activityWithDescription('Coffee')))
+        self.assertTrue(composite.compiled().satisfies(self.activityWithDescription('Coffee')))
+        self.assertEqual(evaluatedConditions, ['first', 'first'])
+
+    def testConjunctionAndNegationOfDescriptionConditions(self):
+        coffee = ActivityDescriptionIncludesStringCondition.forString('Coffee')
+        brooklyn = ActivityDescriptionIncludesStringCondition.forString('Brooklyn')
+        coffeeOutsideBrooklyn = ActivityAggregationConjunctionCondition.withConditions([coffee, ActivityAggregationNegatedCondition.negating(brooklyn)])
+        for aCondition in [coffeeOutsideBrooklyn, coffeeOutsideBrooklyn.compiled()]:
+            self.assertTrue(aCondition.satisfies(self.activityWithDescription('Coffee Manhattan')))
+            self.assertFalse(aCondition.satisfies(self.activityWithDescription('Coffee Brooklyn')))
+            self.assertFalse(aCondition.satisfies(self.activityWithDescription('Tea Manhattan')))
+            activities = [self.activityWithDescription(aDescription) for aDescription in ['Coffee Manhattan', 'Coffee Brooklyn', 'Tea']]
+            self.assertEqual(aCondition.satisfiesEach(activities), [True, False, False])
+
+    def testConjunctionNeedsAtLeastOneCondition(self):
+        with self.assertRaisesRegex(Exception, 'Conjunction needs at least one condition'):
+            ActivityAggregationConjunctionCondition.withConditions([])
+
+    def testCompilingFlattensNestedCompositesAndDoubleNegations(self):
+        coffee = ActivityDescriptionIncludesStringCondition.forString('Coffee')
+        tea = ActivityDescriptionIncludesStringCondition.forString('Tea')
+        juice = ActivityDescriptionIncludesStringCondition.forString('Juice')
+        nested = ActivityAggregationCompositeCondition.withConditions([coffee, ActivityAggregationCompositeCondition.withConditions([tea, juice])])
+        self.assertEqual(nested.compiled().conditions(), [coffee, tea, juice])
+        doubleNegation = ActivityAggregationNegatedCondition.negating(ActivityAggregationNegatedCondition.negating(coffee))
+        self.assertIs(doubleNegation.compiled(), coffee)
+
+    def testCompiledConditionMovesCheapConditionsThatDecideTheResultFirst(self):
+        rarelyMatching = ActivityPluggableCondition.usingCode(lambda anActivity: anActivity.description() == 'Rare')
+        alwaysMatching = ActivityDescriptionIncludesStringCondition.forString('Coffee')
+        compiledCondition = ActivityAggregationCompositeCondition.withConditions([rarelyMatching, alwaysMatching]).compiled()
+        for _ in range(AdaptivelyOrderedConditions.SAMPLED_EVALUATIONS):
+            self.assertTrue(compiledCondition.satisfies(self.activityWithDescription('Coffee')))
+        self.assertEqual(compiledCondition.conditions(), [alwaysMatching, rarelyMatching])
+        self.assertTrue(compiledCondition.satisfies(self.activityWithDescription('Rare')))
+        self.assertFalse(compiledCondition.satisfies(self.activityWithDescription('Tea')))
+
+    def testEnrichmentDefinitionMatchedWithCompiledConditionsIsTheFirstDeclaredOne(self):
+        coffee = ActivityDescriptionIncludesStringCondition.forString('Coffee')
+        brooklyn = ActivityDescriptionIncludesStringCondition.forString('Brooklyn')
+        specBuilder = ActivityEnrichmentSpecBuilder()
+        specBuilder.addDefintionSpecForCondition('Local', 'LocalCoffee', ActivityAggregationConjunctionCondition.withConditions([coffee, brooklyn]))
+        specBuilder.addDefintionSpecForCondition('Coffee', 'Coffee', coffee)
+        enrichmentSpec = specBuilder.fullSpec()
+        self.assertEqual(enrichmentSpec.enrichmentDefinitionForActivity(self.activityWithDescription('Coffee Brooklyn')).bucket(), 'Local')
+        self.assertEqual(enrichmentSpec.enrichmentDefinitionForActivity(self.activityWithDescription('Coffee Queens')).bucket(), 'Coffee')
+
+    def recordingCondition(self, name, result, evaluatedConditions):
+        def condition(anActivity):
+            evaluatedConditions.append(name)
+            return result
+        return ActivityPluggableCondition.usingCode(condition)
+
+    def activityWithDescription(self, aDescription):
+        return FinancialActivity.expenseWithDescriptionAndTotal(aDescription, aDescription, 'Unclassified', Dollars.withAmount(1), None, date(2024, 5, 12))
+
+
+class DecimalAmountParserTest(TestCase):
+
+    def testEmptyAmountIsZeroCents(self):
+        self.assertEqual(DecimalAmountParser.default().centsFromString(''), 0)
+
+    def testDecimalAmountsAreParsedIntoExactCents(self):
+        parser = DecimalAmountParser.default()
+        self.assertEqual(parser.centsFromString('7.85'), 785)
+        self.assertEqual(parser.centsFromString('0.10'), 10)
+        self.assertEqual(parser.centsFromString('3.5'), 350)
+        self.assertEqual(parser.centsFromString('12'), 1200)
+        self.assertEqual(parser.centsFromString('.99'), 99)
+
+    def testNegativeAmountsAreParsedFromLeadingOrTrailingMinusSign(self):
+        parser = DecimalAmountParser.default()
+        self.assertEqual(parser.centsFromString('-5.00'), -500)
+        self.assertEqual(parser.centsFromString('5.00-'), -500)
+
+    def testAmountsWithinParenthesesAreNegative(self):
+        parser = DecimalAmountParser.default()
+        self.assertEqual(parser.centsFromString('(12.30)'), -1230)
+        self.assertEqual(parser.centsFromString('($1,000.00)'), -100000)
+
+    def testThousandsSeparatorsAndCurrencySymbolsAreIgnored(self):
+        parser = DecimalAmountParser.default()
+        self.assertEqual(parser.centsFromString('$1,234.56'), 123456)
+        self.assertEqual(parser.centsFromString('USD 2,000'), 200000)
+        self.assertEqual(parser.centsFromString('-€ 3.10'), -310)
+
+    def testSubCentDigitsAreRoundedHalfUp(self):
+        parser = DecimalAmountParser.default()
+        self.assertEqual(parser.centsFromString('1.005'), 101)
+        self.assertEqual(parser.centsFromString('1.0049'), 100)
+
+    def testSeparatorsCanBeSwappedForEuropeanFormattedAmounts(self):
+        parser = DecimalAmountParser.withSeparators(decimalSeparator = ',', thousandsSeparator = '.')
+        self.assertEqual(parser.centsFromString('1.234,56'), 123456)
+
+    def testDecimalAndThousandsSeparatorsMustBeDifferent(self):
+        with self.assertRaisesRegex(Exception, 'Decimal and thousands separators must be different'):
+            DecimalAmountParser.withSeparators(decimalSeparator = '.', thousandsSeparator = '.')
+
+    def testAmountsWithUnexpectedCharactersOrSignsAreInvalid(self):
+        parser = DecimalAmountParser.default()
+        for rawAmount in ['1e5', '12.50 CR', '--5', '-5.00-', '(-5.00)', '5.00.1', '1,234.5,6', '12 34']:
+            with self.assertRaisesRegex(Exception, 'Invalid amount'):
+                parser.centsFromString(rawAmount)
+
+    def testExplicitPlusSignAndTrailingCurrencyMarksAreAccepted(self):
+        parser = DecimalAmountParser.default()
+        self.assertEqual(parser.centsFromString('+5.00'), 500)
+        self.assertEqual(parser.centsFromString(' 3.50 USD '), 350)
+        self.assertEqual(parser.centsFromString('$-2.00'), -200)
+
+    def testAmountWithoutDigitsIsInvalid(self):
+        with self.assertRaisesRegex(Exception, 'Invalid amount: N/A'):
+            DecimalAmountParser.default().centsFromString('N/A')
+
+
+class DateFileRecordSpecTest(TestCase):
+
+    def testZeroPaddedDateIsParsedUsingTheSequencePositions(self):
+        dateSpec = DateFileRecordSpec.withSeparatorAndSequence(column = 'Date', separator = '/', sequence = ['Day', 'Month', 'Year'])
+        self.assertEqual(dateSpec.dateFromString('05/12/2024'), date(2024,12,5))
+
+    def testDateWithoutZeroPaddingIsParsedBySplittingOnTheSeparator(self):
+        dateSpec = DateFileRecordSpec.withSeparatorAndSequence(column = 'Date', separator = '-', sequence = ['Month', 'Day', 'Year'])
+        self.assertEqual(dateSpec.dateFromString('9-7-2024'), date(2024,9,7))
+
+    def testIsoDateIsParsed(self):
+        dateSpec = DateFileRecordSpec.withSeparatorAndSequence(column = 'Date', separator = '-', sequence = ['Year', 'Month', 'Day'])
+        self.assertEqual(dateSpec.dateFromString('2024-09-27'), date(2024,9,27))
+
+    def testFixedWidthDateWithoutSeparatorIsParsed(self):
+        dateSpec = DateFileRecordSpec.withSeparatorAndSequence(column = 'Date', separator = '', sequence = ['Year', 'Month', 'Day'])
+        self.assertEqual(dateSpec.dateFromString('20240927'), date(2024,9,27))
+
+    def testRepeatedRawDatesAreParsedOnlyOnce(self):
+        dateSpec = DateFileRecordSpec.withSeparatorAndSequence(column = 'Date', separator = '-', sequence = ['Month', 'Day', 'Year'])
+        aDate = dateSpec.dateFromString('09-27-2024')
+        self.assertIs(dateSpec.dateFromString('09-27-2024'), aDate)
+
+
 class FinancialActivityFileLineParserTest(TestCase):
     def testLineWithFourCommaSeparatedValuesIsParsedIntoAListWithThoseFourValues(self):
         parser = FinancialActivityFileLineParser.commaSeparatedValues()
@@ -658,6 +1373,23 @@ class FinancialActivityFileLineParserTest(TestCase):
         parsedLine = parser.parse('123,"NY,USA",456')
         self.assertEqual(parsedLine, ['123', 'NY,USA', '456'])
 
+    def testBoundingCharactersInTheMiddleOfAValueAreDroppedAndProtectTheSeparatorsBetweenThem(self):
+        parser = FinancialActivityFileLineParser.commaSeparatedValues(boundingCharacter='"')
+        parsedLine = parser.parse('A"B,C"D, "E,F" ,"",G')
+        self.assertEqual(parsedLine, ['AB,CD', 'E,F', '', 'G'])
+
+    def testUnclosedBoundingCharacterKeepsTheRestOfTheLineAsASingleValue(self):
+        parser = FinancialActivityFileLineParser.commaSeparatedValues(boundingCharacter='"')
+        parsedLine = parser.parse('123,"NY,USA,456')
+        self.assertEqual(parsedLine, ['123', 'NY,USA,456'])
+
+    def testCharacterScanningTokenizerCanBeSelectedAndParsesLikeTheDefaultTokenizer(self):
+        scanningParser = FinancialActivityFileLineParser.commaSeparatedValues(boundingCharacter='"', tokenizerClass=CharacterScanningLineTokenizer)
+        defaultParser = FinancialActivityFileLineParser.commaSeparatedValues(boundingCharacter='"')
+        lines = ['A,$ , Hello World,1.0\n', ',,', '123,"NY,USA",456', 'A"B,C"D, "E,F" ,"",G', '123,"NY,USA,456', '']
+        for aLine in lines:
+            self.assertEqual(scanningParser.parse(aLine), defaultParser.parse(aLine))
+
 
 class FinancialActivityStatementExporterTest(TestCase):
 
@@ -865,6 +1597,36 @@ class FinancialActivityStatementExporterTest(TestCase):
         self.assertEqual(exportedFileLines, expectedLines)
 
 
+class FinancialActivityTest(TestCase):
+
+    def testActivitiesAreBuiltInBulkFromRowsWithAmountsInCents(self):
+        aSource = LoadedActivitySource.withName('Checking')
+        rows = [(FinancialActivity.EXPENSE_TYPE, 'Coffee', 'COFFEE #12', 'Lifestyle', 450, date(2024,9,27)),
+                (FinancialActivity.INCOME_TYPE, 'Salary', 'ACME PAYROLL', 'Work', 200000, date(2024,9,30))]
+        expense, income = FinancialActivity.fromActivityRowsInCents(rows, aSource)
+        self.assertTrue(expense.isExpense())
+        self.assertEqual((expense.description(), expense.rawDescription(), expense.category()), ('Coffee', 'COFFEE #12', 'Lifestyle'))
+        self.assertEqual(expense.total(), Dollars.withAmount(4.50))
+        self.assertEqual(expense.date(), date(2024,9,27))
+        self.assertEqual(expense.sourceName(), 'Checking')
+        self.assertFalse(income.isExpense())
+        self.assertEqual(income.total(), Dollars.withAmount(2000))
+
+    def testActivitiesAndDollarsDoNotKeepAPerInstanceDictionary(self):
+        anActivity = FinancialActivity.expenseWithDescriptionAndTotal('Coffee', 'COFFEE #12', 'Lifestyle', Dollars.withAmount(2), LoadedActivitySource(), date(2024,9,27))
+        self.assertFalse(hasattr(anActivity, '__dict__'))
+        self.assertFalse(hasattr(anActivity.total(), '__dict__'))
+
+    def testRepeatedRawDescriptionsLoadedFromFileShareASingleString(self):
+        aFile = TestFile()
+        for aLine in ['Date,Description,Amount', '09-27-2024,COFFEE #12,2.00', '09-28-2024,COFFEE #12,3.00']: aFile.addLine(aLine)
+        spec = FileRecordSpec.withSpecs('Description', SingleAmountColumnFileRecordSpec.forSpecificColumn(amountColumn = 'Amount'),
+                                        DateFileRecordSpec.withSeparatorAndSequence(column = 'Date', separator = '-', sequence=['Month','Day','Year']))
+        aSource = FinancialActivityFileSource.fromFile('TestSource', aFile, spec, FinancialActivityFileLineParser.commaSeparatedValues(), ActivityEnrichmentSpecBuilder().fullSpec())
+        firstExpense, secondExpense = aSource.expenses()
+        self.assertIs(firstExpense.rawDescription(), secondExpense.rawDescription())
+
+
 class DollarsTests(TestCase):
     def testEquals(self):
         aZeroDollars = Dollars.zero()
@@ -907,5 +1669,27 @@ class DollarsTests(TestCase):
         fourteenDollars = Dollars.withAmount(14)
         sixDollars = Dollars.withAmount(6)
         self.assertEqual(twentyDollars - fourteenDollars, sixDollars)
+
+    def testDollarsAreKeptAsExactCents(self):
+        tenCents = Dollars.withAmount(0.10)
+        total = Dollars.zero()
+        for _ in range(10): total = total + tenCents
+        self.assertEqual(total, Dollars.withAmount(1))
+        self.assertEqual(total.cents(), 100)
+        self.assertEqual(Dollars.withCents(785), Dollars.withAmount(7.85))
+
+    def testNegativeStringRepresentation(self):
+        self.assertEqual(str(Dollars.withCents(-1205)), '-12.05 USD')
+        self.assertEqual(str(Dollars.withCents(-5)), '-0.05 USD')
+
+    def testSumOfDollars(self):
+        total = Dollars.sum([Dollars.withAmount(0.10), Dollars.withAmount(0.20), Dollars.withAmount(0.30)])
+        self.assertEqual(total, Dollars.withAmount(0.60))
+        self.assertEqual(Dollars.sum([]), Dollars.zero())
+
+    def testSumOfActivityTotals(self):
+        aSource = LoadedActivitySource.withExpensesFromAmounts([Dollars.withAmount(0.10)] * 7)
+        self.assertEqual(Dollars.sumOfTotals(aSource.expenses()), Dollars.withAmount(0.70))
+        self.assertEqual(Dollars.sumOfTotals(iter(aSource.expenses())), Dollars.withCents(70))
     
 
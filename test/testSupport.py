@@ -1,7 +1,12 @@
+import os
+import tempfile
 from collections import deque
 from datetime import date
+from itertools import chain
 
-from src.model import FinancialActivity, Dollars
+from src.model import FinancialActivity, Dollars, FinancialActivityFileLineParser
+from src.model import FileRecordSpec, DateFileRecordSpec, TwoAmountColumnsFileRecordSpec
+from src.model_activityEnrichment import ActivityEnrichmentSpecBuilder
 
 class LoadedActivitySource():
 
@@ -35,6 +40,7 @@ class LoadedActivitySource():
         self._name = name
         self._expenses = []
         self._incomes = []
+        self._version = 0
 
     def addExpenseWithDescription(self, aDescription):
         self.addExpenseWithDescriptionAndDollarsAmount(aDescription,1)
@@ -86,13 +92,27 @@ class LoadedActivitySource():
 
     def addExpense(self, anExpense):
         self._expenses.append(anExpense)
+        self._version = self._version + 1
 
     def addIncome(self, anIncome):
         self._incomes.append(anIncome)
+        self._version = self._version + 1
+
+    def version(self):
+        return self._version
 
     def expenses(self):
         return self._expenses
 
+    def iterActivities(self):
+        return chain(self._expenses, self._incomes)
+
+    def iterExpenses(self):
+        return iter(self._expenses)
+
+    def iterIncomes(self):
+        return iter(self._incomes)
+
     def incomes(self):
         return self._incomes
 
@@ -104,6 +124,7 @@ class TestFile():
     def __init__(self):
         self._content = ''
         self._lines = deque()
+        self._timesRead = 0
     
     def write(self, newContent):
          self._content = self._content + newContent
@@ -114,6 +135,13 @@ class TestFile():
     
     def readlines(self):
         return self._content.splitlines()
+
+    def __iter__(self):
+        self._timesRead = self._timesRead + 1
+        return iter(self.readlines())
+
+    def timesRead(self):
+        return self._timesRead
     
     def readLine(self):
         return self.contentLines().popleft()
@@ -126,4 +154,68 @@ class TestFile():
         def contentLines(self):
         if not self._lines:
             self._lines
-        self.contentLines()"""
\ No newline at end of file
+        self.contentLines()"""
+
+
+class TemporaryExportFile():
+
+    @classmethod
+    def withLines(cls, aTestCase, lines):
+        exportFile = cls.withContent(aTestCase, '')
+        exportFile.writeLines(lines)
+        return exportFile
+
+    @classmethod
+    def withContent(cls, aTestCase, content):
+        fileDescriptor, aPath = tempfile.mkstemp(suffix='.csv')
+        os.close(fileDescriptor)
+        aTestCase.addCleanup(cls.removeIfPresent, aPath)
+        exportFile = cls(aPath)
+        exportFile.write(content)
+        return exportFile
+
+    @classmethod
+    def removeIfPresent(cls, aPath):
+        if os.path.exists(aPath): os.remove(aPath)
+
+    @classmethod
+    def debitAndCreditRecordSpec(cls):
+        return cls.recordSpecWithAmountSpec(TwoAmountColumnsFileRecordSpec.forColumns(expenseColumn = 'Debit', incomeColumn = 'Credit'))
+
+    @classmethod
+    def recordSpecWithAmountSpec(cls, amountSpec):
+        dateSpec = DateFileRecordSpec.withSeparatorAndSequence(column = 'Date', separator = '-', sequence=['Month','Day','Year'])
+        return FileRecordSpec.withSpecs(descriptionColumn = 'Description', amountSpec = amountSpec, dateSpec = dateSpec)
+
+    @classmethod
+    def lineParser(cls):
+        return FinancialActivityFileLineParser.commaSeparatedValues()
+
+    @classmethod
+    def emptyEnrichmentSpec(cls):
+        return ActivityEnrichmentSpecBuilder().fullSpec()
+
+    def __init__(self, aPath):
+        self._path = aPath
+
+    def path(self):
+        return self._path
+
+    def write(self, content):
+        with open(self._path, 'wb') as aFile:
+            aFile.write(content if isinstance(content, bytes) else content.encode('utf-8'))
+
+    def writeLines(self, lines):
+        self.write(''.join(aLine + '\n' for aLine in lines))
+
+    def appendText(self, text):
+        with open(self._path, 'a') as aFile: aFile.write(text)
+
+    def appendLines(self, lines):
+        for aLine in lines: self.appendText(aLine + '\n')
+
+    def replaceWithLines(self, lines):
+        replacementPath = self._path + '.new'
+        with open(replacementPath, 'w') as replacement:
+            for aLine in lines: replacement.write(aLine + '\n')
+        os.replace(replacementPath, self._path)